@@ -26,6 +26,7 @@ class FarmerProfile(models.Model):
     specialty = models.CharField(max_length=255)
     description = models.TextField()
     farm_image = CloudinaryField('farm_images', blank=True, null=True)
+    farm_image_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     farm = models.OneToOneField(Farm, on_delete=models.CASCADE, related_name='farmer_profile', null=True, blank=True)
     about = models.TextField(blank=True, null=True)
     sustainability = models.TextField(blank=True, null=True)
@@ -0,0 +1,41 @@
+# accounts/websocket.py
+from urllib.parse import parse_qs
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+
+def user_for_token(raw_token):
+    """
+    The access token's user, or AnonymousUser. The token is checked here,
+    but the user is only fetched when first used, from sync code, so a
+    consumer can do it in the same database call as its own queries.
+    """
+    authentication = JWTAuthentication()
+    try:
+        validated = authentication.get_validated_token(raw_token)
+    except (InvalidToken, TokenError):
+        return AnonymousUser()
+
+    def get_user():
+        try:
+            return authentication.get_user(validated)
+        except (AuthenticationFailed, InvalidToken):
+            return AnonymousUser()
+    return SimpleLazyObject(get_user)
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Sets scope['user'] from the access token in the socket's ?token=
+    parameter, since browsers can't send an Authorization header when
+    opening a WebSocket.
+    """
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        scope['user'] = user_for_token(token[0]) if token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
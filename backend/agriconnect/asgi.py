@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Calculate paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+
+# Add both the project root and backend directory to Python path
+sys.path.append(BASE_DIR)
+sys.path.append(BACKEND_DIR)
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriconnect.settings')
+
+from django.core.asgi import get_asgi_application
+# Sets Django up before the consumers import models
+django_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import OriginValidator
+from django.conf import settings
+from accounts.websocket import JWTAuthMiddleware
+from orders.routing import websocket_urlpatterns
+
+application = ProtocolTypeRouter({
+    'http': django_application,
+    # Sockets are opened by the frontend, from the origins CORS lets in
+    'websocket': OriginValidator(
+        JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+        settings.CORS_ALLOWED_ORIGINS,
+    ),
+})
+
+# Warm the in-process search suggestion index before the first request
+from django.db import DatabaseError
+from farms.suggest import load_suggestion_index
+try:
+    load_suggestion_index()
+except DatabaseError:
+    pass  # Loaded on first use instead
@@ -0,0 +1,26 @@
+# agriconnect/channel_layers.py
+import time
+from channels import layers
+
+
+class InMemoryChannelLayer(layers.InMemoryChannelLayer):
+    """
+    channels' in-memory layer, sweeping for expired messages and group
+    members at most once every ``clean_interval`` seconds. The stock layer
+    sweeps every channel and group on each receive and group send, so
+    pushing to n sockets costs n sweeps of n channels; at a few thousand
+    sockets a push takes seconds. Messages live for ``expiry`` (60s), so a
+    sweep a second late changes nothing.
+    """
+
+    def __init__(self, clean_interval=1, **kwargs):
+        super().__init__(**kwargs)
+        self.clean_interval = clean_interval
+        self.cleaned_at = 0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self.cleaned_at < self.clean_interval:
+            return
+        self.cleaned_at = now
+        super()._clean_expired()
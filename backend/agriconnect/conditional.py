@@ -0,0 +1,57 @@
+# agriconnect/conditional.py
+"""
+Conditional GET (ETag) for list endpoints.
+
+The ETag comes from one aggregate query over the rows a list would
+serialize: how many there are, and the newest ``updated_at`` among them
+and the related rows the list embeds. Any insert, edit or delete changes
+one of the two. A request whose If-None-Match still matches gets a 304
+before anything is serialized.
+
+There is no Last-Modified: a delete leaves the newest ``updated_at`` as it
+was, so a client revalidating with If-Modified-Since alone would keep a
+list that still shows the deleted row.
+"""
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+
+def list_validators(queryset, related=()):
+    """The ETag for the rows of ``queryset``; ``related`` names embedded relations."""
+    fields = ['updated_at', *(f'{name}__updated_at' for name in related)]
+    aggregates = queryset.order_by().aggregate(
+        count=Count('pk'),
+        **{f'latest_{index}': Max(field) for index, field in enumerate(fields)},
+    )
+    count = aggregates.pop('count')
+    last_modified = max((value for value in aggregates.values() if value is not None), default=None)
+    stamp = int(last_modified.timestamp() * 1_000_000) if last_modified else 0
+    return quote_etag(f'{count}-{stamp}')
+
+
+def not_modified(request, etag):
+    """A 304 response if the client's copy is current, else None."""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_validators(response, etag)
+    return response
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    # Cache, but check back every time, so clients never show a stale list
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalListMixin:
+    """Conditional GET for a generic list view; ``conditional_related`` as in list_validators()."""
+    conditional_related = ()
+
+    def list(self, request, *args, **kwargs):
+        etag = list_validators(self.filter_queryset(self.get_queryset()), self.conditional_related)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        return set_validators(super().list(request, *args, **kwargs), etag)
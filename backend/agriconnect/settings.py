@@ -27,6 +27,8 @@ ALLOWED_HOSTS = [
 
 # Application definition (keep this the same)
 INSTALLED_APPS = [
+    # ASGI runserver, for the order tracking sockets
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -34,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -88,6 +91,21 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'agriconnect.wsgi.application'
+ASGI_APPLICATION = 'agriconnect.asgi.application'
+
+# Channel layer for the order tracking sockets, see orders/push.py. In memory
+# unless REDIS_URL is set, which only reaches sockets held by the same process
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'agriconnect.channel_layers.InMemoryChannelLayer'},
+    }
 
 # Database - Supabase PostgreSQL (updated)
 DATABASES = {
@@ -104,6 +122,39 @@ DATABASES = {
     }
 }
 
+# Caches (local memory, per process, except "shared")
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Seen by every process: Redis when REDIS_URL is set. Holds the search
+    # cache version, so a change made in one process retires every process's pages
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'search-results',
+        'TIMEOUT': int(os.getenv('SEARCH_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+# How long a pending order holds its stock, see orders/stock.py
+STOCK_RESERVATION_MINUTES = int(os.getenv('STOCK_RESERVATION_MINUTES', 30))
+# Order numbers each process takes from the database at a time, see orders/numbers.py
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', 100))
+# GPS pings older than this are folded into their order's route, see orders/tracks.py
+TRACK_COMPACT_AFTER_HOURS = int(os.getenv('TRACK_COMPACT_AFTER_HOURS', 24))
+# How far a compacted route may stray from the pings it replaces
+TRACK_TOLERANCE_METRES = float(os.getenv('TRACK_TOLERANCE_METRES', 5))
+
 # Authentication
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -147,6 +198,14 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Where thumbnails are stored: next to the originals on Cloudinary when it is configured,
+# since the local filesystem is neither served nor kept in production
+THUMBNAIL_STORAGE = os.getenv('THUMBNAIL_STORAGE', (
+    'agriconnect.thumbnails.CloudinaryThumbnailStorage' if os.getenv('CLOUDINARY_URL')
+    else 'django.core.files.storage.FileSystemStorage'
+))
+# Background threads rendering image thumbnails; 0 renders them inline
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,239 @@
+# agriconnect/thumbnails.py
+"""
+Thumbnails for uploaded images.
+
+Originals are uploaded to Cloudinary by CloudinaryField. When a model is
+saved with a new upload, the file is first copied to an anonymous temporary
+file, which the OS reclaims once it is closed or dropped, so a rolled back
+save leaves nothing behind. Once the transaction commits, a background
+worker renders every width in THUMBNAIL_WIDTHS as WebP and JPEG with Pillow.
+Each rendering is saved through THUMBNAIL_STORAGE next to the original's
+public id (``products/abc123/320.webp``): on Cloudinary with the originals
+in production, on the local filesystem in development. The URLs go into the
+row's
+``<field>_thumbnails`` JSON column as ``{width: {format: url}}``, so
+serializers return a stored lookup table instead of building URLs.
+"""
+import io
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import cloudinary
+import cloudinary.uploader
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connections, transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (640, 320, 160)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# (model, image field) pairs with thumbnails, filled in by register()
+registered = []
+# Sent with the model as sender and the row's pk once its thumbnails are recorded
+thumbnails_rendered = Signal()
+
+_executor = None
+
+
+def thumbnail_field(field_name):
+    return f'{field_name}_thumbnails'
+
+
+def thumbnail_name(public_id, width, extension):
+    return f'{public_id}/{width}.{extension}'
+
+
+class CloudinaryThumbnailStorage(Storage):
+    """
+    Write-only storage that uploads thumbnails to Cloudinary under their name
+    minus the extension as public id. Uploads overwrite and invalidate the
+    CDN copy, so a re-rendered thumbnail keeps its URL.
+    """
+
+    def _split(self, name):
+        public_id, extension = os.path.splitext(name)
+        return public_id, extension.lstrip('.')
+
+    def _save(self, name, content):
+        public_id, extension = self._split(name)
+        cloudinary.uploader.upload(
+            content, public_id=public_id, format=extension, resource_type='image',
+            overwrite=True, invalidate=True,
+        )
+        return name
+
+    def _open(self, name, mode='rb'):
+        raise NotImplementedError('Thumbnails are read through their URL')
+
+    def exists(self, name):
+        return False  # Uploads overwrite, so every name is available
+
+    def delete(self, name):
+        cloudinary.uploader.destroy(self._split(name)[0], resource_type='image', invalidate=True)
+
+    def url(self, name):
+        public_id, extension = self._split(name)
+        return cloudinary.CloudinaryImage(public_id).build_url(format=extension, secure=True)
+
+
+def thumbnail_storage():
+    return import_string(settings.THUMBNAIL_STORAGE)()
+
+
+def _flatten(image):
+    """RGB copy of an image with transparency, on a white background (JPEG has no alpha)."""
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render_thumbnails(source, public_id, storage=None):
+    """
+    Render and store every size and format for an image file. Returns the
+    ``{width: {format: url}}`` lookup table. Widths are rendered largest
+    first, each scaled down from the previous one. Images are never scaled
+    up.
+    """
+    storage = storage or thumbnail_storage()
+    thumbnails = {}
+    with Image.open(source) as original:
+        # Lets the JPEG decoder skip detail the largest thumbnail can't show
+        original.draft('RGB', (THUMBNAIL_WIDTHS[0], THUMBNAIL_WIDTHS[0]))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    for width in sorted(THUMBNAIL_WIDTHS, reverse=True):
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        urls = {}
+        for extension, (image_format, options) in THUMBNAIL_FORMATS.items():
+            frame = _flatten(image) if image_format == 'JPEG' and has_alpha else image
+            buffer = io.BytesIO()
+            frame.save(buffer, image_format, **options)
+            name = thumbnail_name(public_id, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            urls[extension] = storage.url(storage.save(name, ContentFile(buffer.getvalue())))
+        thumbnails[str(width)] = urls
+    return thumbnails
+
+
+def delete_thumbnails(public_id, storage=None):
+    storage = storage or thumbnail_storage()
+    for width in THUMBNAIL_WIDTHS:
+        for extension in THUMBNAIL_FORMATS:
+            storage.delete(thumbnail_name(public_id, width, extension))  # A no-op for missing files
+
+
+def absolute_thumbnails(thumbnails, request):
+    """The lookup table with storage-relative URLs made absolute, like DRF's ImageField does."""
+    if not thumbnails or request is None:
+        return thumbnails or {}
+    return {
+        width: {extension: request.build_absolute_uri(url) for extension, url in urls.items()}
+        for width, urls in thumbnails.items()
+    }
+
+
+def generate_thumbnails(model_label, pk, field_name, stored, public_id, source):
+    """
+    Worker job: render thumbnails for one row's image and record them. The
+    row is only updated if it still holds the image they were made from.
+    The source file is always closed.
+    """
+    model = apps.get_model(model_label)
+    try:
+        thumbnails = render_thumbnails(source, public_id)
+        current = model._default_manager.filter(pk=pk, **{field_name: stored})
+        if current.update(**{thumbnail_field(field_name): thumbnails}):
+            thumbnails_rendered.send(sender=model, pk=pk)
+        else:
+            delete_thumbnails(public_id)  # Replaced or deleted while rendering
+    except Exception:
+        logger.exception('Thumbnails failed for %s %s', model_label, pk)
+    finally:
+        source.close()
+
+
+def _run_in_worker(job, *args):
+    try:
+        job(*args)
+    finally:
+        connections.close_all()  # The worker thread's own connections
+
+
+def submit(job, *args):
+    """Run ``job`` on the background worker, or inline with THUMBNAIL_WORKERS = 0."""
+    global _executor
+    workers = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+    if workers <= 0:
+        job(*args)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+    _executor.submit(_run_in_worker, job, *args)
+
+
+def _spool(upload):
+    """
+    Copy an upload to a temporary file the worker can read after the request
+    is gone. The file is unlinked from the start, so it needs no cleanup if
+    the save fails or rolls back and the job never runs.
+    """
+    if hasattr(upload, 'seekable') and upload.seekable():
+        upload.seek(0)
+    spooled = tempfile.TemporaryFile(prefix='thumbnail-')
+    shutil.copyfileobj(upload, spooled)
+    spooled.seek(0)
+    upload.seek(0)
+    return spooled
+
+
+def register(model, field_name):
+    """Keep ``<field_name>_thumbnails`` on ``model`` in step with uploads to ``field_name``."""
+    attname = model._meta.get_field(field_name).attname
+    thumbnails_attname = thumbnail_field(field_name)
+    registered.append((model, field_name))
+
+    def before_save(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and field_name not in update_fields:
+            return
+        value = getattr(instance, attname)
+        if isinstance(value, UploadedFile):
+            instance._thumbnail_sources = {**getattr(instance, '_thumbnail_sources', {}), field_name: _spool(value)}
+        # Thumbnails of the previous image are stale either way
+        if isinstance(value, UploadedFile) or not value:
+            setattr(instance, thumbnails_attname, {})
+
+    def after_save(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and field_name not in update_fields:
+            return
+        if update_fields is not None and thumbnails_attname not in update_fields:
+            sender._default_manager.filter(pk=instance.pk).update(
+                **{thumbnails_attname: getattr(instance, thumbnails_attname)}
+            )
+        source = getattr(instance, '_thumbnail_sources', {}).pop(field_name, None)
+        if source is None:
+            return
+        image = getattr(instance, attname)
+        stored = sender._meta.get_field(field_name).get_prep_value(image)
+        transaction.on_commit(lambda: submit(
+            generate_thumbnails, sender._meta.label, instance.pk, field_name, stored, image.public_id, source,
+        ))
+
+    pre_save.connect(before_save, sender=model, weak=False, dispatch_uid=f'thumbnails-{model._meta.label}-{field_name}')
+    post_save.connect(after_save, sender=model, weak=False, dispatch_uid=f'thumbnails-{model._meta.label}-{field_name}')
@@ -3,7 +3,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from farms.views import SearchView
+from farms.views import SearchView, SearchSuggestView, SearchCacheStatsView
 from . import views
 from .healthchecks import health_check
 from .views import check_migrations
@@ -18,6 +18,8 @@ urlpatterns = [
     path('api/subscriptions/', include('subscriptions.urls')),
     path('api/farm/', include('analytics.urls')),   
     path('api/search/', SearchView.as_view(), name='search'),
+    path('api/search/suggest/', SearchSuggestView.as_view(), name='search-suggest'),
+    path('api/search/cache-stats/', SearchCacheStatsView.as_view(), name='search-cache-stats'),
     path('health/', health_check),
     path('check-migrations/', check_migrations),
-]
\ No newline at end of file
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
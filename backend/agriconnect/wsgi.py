@@ -12,4 +12,12 @@ sys.path.append(BACKEND_DIR)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agriconnect.settings')
 
 from django.core.wsgi import get_wsgi_application
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Warm the in-process search suggestion index before the first request
+from django.db import DatabaseError
+from farms.suggest import load_suggestion_index
+try:
+    load_suggestion_index()
+except DatabaseError:
+    pass  # Loaded on first use instead
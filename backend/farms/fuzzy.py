@@ -0,0 +1,211 @@
+# farms/fuzzy.py
+"""
+Typo-tolerant name search over farms and products.
+
+On PostgreSQL with pg_trgm installed this uses word similarity backed by the
+GIN trigram indexes from farms/migrations/0004_trigram_index.py. Anywhere
+else it falls back to an in-process trigram inverted index that is built on
+first use and kept current by the signals in farms/signals.py.
+"""
+import re
+import threading
+from collections import Counter, defaultdict
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import FloatField, IntegerField, Value
+from django.db.models.functions import Cast
+from products.models import Product
+from .models import Farm
+from .search import SearchHit, after_hit
+
+SIMILARITY_CUTOFF = 0.3
+MAX_QUERY_WORDS = 8
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+def word_trigrams(word):
+    # Padded the way pg_trgm does it: two spaces in front, one behind
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Two-level inverted index: trigrams point at distinct words, words at the
+    distinct normalized names containing them, and names at the (kind, id)
+    pairs that carry them. A catalog's vocabulary is far smaller than the
+    catalog, so a lookup only has to score words, never every name.
+
+    A name scores the mean, over the query words, of the best Jaccard trigram
+    similarity of any of its words; query words with nothing above the cutoff
+    count as a miss.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._gram_words = defaultdict(set)
+            self._word_gram_counts = {}
+            self._word_names = defaultdict(set)
+            self._name_owners = defaultdict(set)
+            self._names = {}
+            self.ready = False
+
+    def add(self, kind, pk, name):
+        with self._lock:
+            self.remove(kind, pk)
+            normalized = ' '.join(words(name))
+            if not normalized:
+                return
+            if normalized not in self._name_owners:
+                for word in set(normalized.split()):
+                    if word not in self._word_names:
+                        grams = word_trigrams(word)
+                        for gram in grams:
+                            self._gram_words[gram].add(word)
+                        self._word_gram_counts[word] = len(grams)
+                    self._word_names[word].add(normalized)
+            self._name_owners[normalized].add((kind, pk))
+            self._names[(kind, pk)] = normalized
+
+    def remove(self, kind, pk):
+        with self._lock:
+            normalized = self._names.pop((kind, pk), None)
+            if normalized is None:
+                return
+            owners = self._name_owners[normalized]
+            owners.discard((kind, pk))
+            if owners:
+                return
+            del self._name_owners[normalized]
+            for word in set(normalized.split()):
+                names = self._word_names[word]
+                names.discard(normalized)
+                if names:
+                    continue
+                del self._word_names[word]
+                del self._word_gram_counts[word]
+                for gram in word_trigrams(word):
+                    postings = self._gram_words[gram]
+                    postings.discard(word)
+                    if not postings:
+                        del self._gram_words[gram]
+
+    def _similar_words(self, word, cutoff):
+        grams = word_trigrams(word)
+        overlaps = Counter()
+        for gram in grams:
+            overlaps.update(self._gram_words.get(gram, ()))
+
+        similar = {}
+        for candidate, overlap in overlaps.items():
+            score = overlap / (len(grams) + self._word_gram_counts[candidate] - overlap)
+            if score >= cutoff:
+                similar[candidate] = score
+        return similar
+
+    def search(self, query, limit, cutoff=SIMILARITY_CUTOFF, after=None):
+        """
+        (similarity, kind, id) for the best matches ordered by similarity, then
+        kind, then id, starting after the ``after`` triple when given.
+        """
+        query_words = list(dict.fromkeys(words(query)))[:MAX_QUERY_WORDS]
+        if not query_words:
+            return []
+
+        with self._lock:
+            totals = defaultdict(float)
+            for query_word in query_words:
+                best = {}
+                for word, score in self._similar_words(query_word, cutoff).items():
+                    for name in self._word_names[word]:
+                        if score > best.get(name, 0):
+                            best[name] = score
+                for name, score in best.items():
+                    totals[name] += score
+
+            ranked_names = sorted(
+                ((total / len(query_words), name) for name, total in totals.items()
+                 if total / len(query_words) >= cutoff),
+                reverse=True,
+            )
+            after_key = (-after[0], after[1], after[2]) if after else None
+            matches = []
+            for score, name in ranked_names:
+                # Names come best first, so once a page is full only ties can still place
+                if len(matches) >= limit and score < matches[limit - 1][0]:
+                    break
+                for kind, pk in self._name_owners[name]:
+                    if after_key is None or (-score, kind, pk) > after_key:
+                        matches.append((score, kind, pk))
+
+        matches.sort(key=lambda match: (-match[0], match[1], match[2]))
+        return matches[:limit]
+
+
+trigram_index = TrigramIndex()
+
+
+def load_trigram_index():
+    with trigram_index._lock:
+        if trigram_index.ready:
+            return trigram_index
+        for pk, name in Farm.objects.values_list('id', 'name').iterator():
+            trigram_index.add('farm', pk, name)
+        for pk, name in Product.objects.values_list('id', 'name').iterator():
+            trigram_index.add('product', pk, name)
+        trigram_index.ready = True
+    return trigram_index
+
+
+_pg_trgm_installed = {}
+
+
+def uses_pg_trgm():
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _pg_trgm_installed:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _pg_trgm_installed[connection.alias] = cursor.fetchone() is not None
+    return _pg_trgm_installed[connection.alias]
+
+
+def fuzzy_matches(query, limit, cutoff=SIMILARITY_CUTOFF, after=None):
+    """
+    Farms and products whose names resemble ``query``, in SearchHit.sort_key
+    order, starting after the ``after`` hit.
+    """
+    if not words(query):
+        return []
+    if uses_pg_trgm():
+        return _postgres_matches(query, limit, cutoff, after)
+    return [
+        SearchHit(kind, pk, False, score)
+        for score, kind, pk in load_trigram_index().search(
+            query, limit, cutoff, after=after and (after.rank, after.kind, after.id)
+        )
+    ]
+
+
+def _postgres_matches(query, limit, cutoff, after):
+    def similar(model, kind):
+        # name %> query is the index-assisted form of word_similarity(query, name) >= threshold
+        return model.objects.filter(name__trigram_word_similar=query).annotate(
+            kind=Value(kind),
+            exact=Value(0, output_field=IntegerField()),
+            rank=Cast(TrigramWordSimilarity(query, 'name'), FloatField()),
+        ).filter(after_hit(after)).values_list('kind', 'id', 'exact', 'rank')
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL pg_trgm.word_similarity_threshold = %s', [cutoff])
+        rows = list(similar(Farm, 'farm').union(similar(Product, 'product'), all=True).order_by('-rank', 'kind', 'id')[:limit])
+    return [SearchHit(kind, pk, False, rank) for kind, pk, _, rank in rows]
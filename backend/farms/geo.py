@@ -0,0 +1,232 @@
+# farms/geo.py
+"""
+Offline geocoding and "farms near me" lookups.
+
+Farm locations are free text, so they are matched against a built-in list
+of Kenyan towns and counties (farms/data/places.csv), with every distinct
+farm location remembered in GeocodedLocation. Each geocoded farm also stores the
+geohash of its coordinates. A radius or nearest-neighbour query only reads
+farms in a block of geohash cells around the point, as indexed range
+scans on that column, and measures exact distances for those candidates.
+"""
+import csv
+import math
+import os
+from functools import lru_cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from .fuzzy import words
+from .models import GeocodedLocation
+
+GEOHASH_PRECISION = 9
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+PLACES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'places.csv')
+# Longest place name in the list, in words
+MAX_PLACE_WORDS = 3
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude degrees, longitude degrees) covered by one geohash cell."""
+    total_bits = 5 * precision
+    return 180.0 / 2 ** (total_bits // 2), 360.0 / 2 ** ((total_bits + 1) // 2)
+
+
+def cell_size_km(latitude, precision):
+    """(north-south km, east-west km) of a geohash cell at ``latitude``."""
+    lat_degrees, lng_degrees = cell_size(precision)
+    return lat_degrees * KM_PER_DEGREE, lng_degrees * KM_PER_DEGREE * math.cos(math.radians(latitude))
+
+
+def cell_reach_km(latitude, precision):
+    """Distance from a point that the 3x3 cells around it are guaranteed to cover."""
+    return min(cell_size_km(latitude, precision))
+
+
+def neighbourhood(latitude, longitude, precision, radius_km=0):
+    """
+    The geohash cell holding the point and the cells around it: the eight
+    next to it, or as many rings along each axis as it takes to cover
+    ``radius_km`` in that direction.
+    """
+    lat_degrees, lng_degrees = cell_size(precision)
+    lat_km, lng_km = cell_size_km(latitude, precision)
+    lat_steps = max(1, math.ceil(radius_km / lat_km))
+    lng_steps = max(1, math.ceil(radius_km / lng_km)) if lng_km else 1
+    cells = set()
+    for lat_step in range(-lat_steps, lat_steps + 1):
+        for lng_step in range(-lng_steps, lng_steps + 1):
+            lat = min(max(latitude + lat_step * lat_degrees, -90.0), 90.0)
+            lng = (longitude + lng_step * lng_degrees + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(lat, lng, precision))
+    return cells
+
+
+def cells_filter(cells):
+    # Ranges rather than LIKE prefixes, so both SQLite and PostgreSQL use the index
+    q = Q(pk__in=[])
+    for cell in cells:
+        q |= Q(geohash__gte=cell, geohash__lt=cell + '{')
+    return q
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def precision_for_radius(latitude, radius_km):
+    """
+    Finest precision whose cells are at least ``radius_km`` across; 0 means
+    no cell filter. Cells are up to twice as long as they are high, so the
+    short side can need a second ring (see neighbourhood()): for 20 km that
+    is 15 cells of about 20 x 39 km rather than 9 of 156 x 156 km.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if max(cell_size_km(latitude, precision)) >= radius_km:
+            return precision
+    return 0
+
+
+def check_point(latitude, longitude):
+    # NaN fails every distance comparison, which would widen a search to every farm
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        raise ValueError('Coordinates must be finite numbers')
+
+
+def normalize_location(location):
+    return ' '.join(words(location or ''))[:255]
+
+
+@lru_cache(maxsize=1)
+def places():
+    with open(PLACES_FILE, newline='', encoding='utf-8') as places_file:
+        return {
+            normalize_location(row['name']): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(places_file)
+        }
+
+
+def lookup_place(normalized):
+    """
+    Coordinates of the place named in a normalized location string, or None.
+    Longer names win ("homa bay" over "bay"), then the leftmost one, since
+    addresses are usually written most specific first.
+    """
+    tokens = normalized.split()
+    known = places()
+    for size in range(min(MAX_PLACE_WORDS, len(tokens)), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            coordinates = known.get(' '.join(tokens[start:start + size]))
+            if coordinates:
+                return coordinates
+    return None
+
+
+def _remembered(query):
+    return GeocodedLocation.objects.filter(query=query).values_list('latitude', 'longitude').first()
+
+
+def locate(location):
+    """
+    Read-only geocode() for request input: uses remembered strings but never
+    adds to them, so anonymous searches can't grow GeocodedLocation.
+    """
+    query = normalize_location(location)
+    if not query:
+        return None
+    cached = _remembered(query)
+    if cached is None:
+        return lookup_place(query)
+    return cached if cached[0] is not None else None
+
+
+def geocode(location):
+    """(latitude, longitude) for a free-text location, or None if it can't be placed."""
+    query = normalize_location(location)
+    if not query:
+        return None
+    cached = _remembered(query)
+    if cached is None:
+        coordinates = lookup_place(query)
+        try:
+            with transaction.atomic():
+                GeocodedLocation.objects.create(
+                    query=query,
+                    latitude=coordinates and coordinates[0],
+                    longitude=coordinates and coordinates[1],
+                )
+        except IntegrityError:
+            pass  # Cached by a concurrent save
+        return coordinates
+    return cached if cached[0] is not None else None
+
+
+def coordinate_fields(location):
+    """Farm field values for a location string."""
+    coordinates = geocode(location)
+    if coordinates is None:
+        return {'latitude': None, 'longitude': None, 'geohash': ''}
+    latitude, longitude = coordinates
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': encode_geohash(latitude, longitude)}
+
+
+def _candidates(queryset, latitude, longitude, precision, radius_km=0):
+    if precision:
+        queryset = queryset.filter(cells_filter(neighbourhood(latitude, longitude, precision, radius_km)))
+    else:
+        queryset = queryset.exclude(geohash='')
+    return [
+        (distance_km(latitude, longitude, farm.latitude, farm.longitude), farm)
+        for farm in queryset
+    ]
+
+
+def farms_within(queryset, latitude, longitude, radius_km):
+    """[(distance in km, farm)] for farms within ``radius_km``, nearest first."""
+    check_point(latitude, longitude)
+    if not math.isfinite(radius_km):
+        raise ValueError('radius_km must be a finite number')
+    precision = precision_for_radius(latitude, radius_km)
+    candidates = _candidates(queryset, latitude, longitude, precision, radius_km)
+    return sorted((match for match in candidates if match[0] <= radius_km), key=lambda match: (match[0], match[1].pk))
+
+
+def nearest_farms(queryset, latitude, longitude, k, start_precision=6):
+    """
+    [(distance in km, farm)] for the ``k`` nearest farms. Starts with a
+    small block of cells and widens it until the k-th candidate is within
+    the distance the block is guaranteed to cover.
+    """
+    check_point(latitude, longitude)
+    for precision in range(start_precision, -1, -1):
+        candidates = sorted(
+            _candidates(queryset, latitude, longitude, precision),
+            key=lambda match: (match[0], match[1].pk),
+        )
+        if precision == 0 or (len(candidates) >= k and candidates[k - 1][0] <= cell_reach_km(latitude, precision)):
+            return candidates[:k]
+    return []
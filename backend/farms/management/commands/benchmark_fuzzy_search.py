@@ -0,0 +1,51 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from farms.fuzzy import TrigramIndex
+
+PRODUCE = [
+    'tomatoes', 'avocado', 'maize', 'sukuma wiki', 'spinach', 'cabbage', 'kales', 'onions', 'potatoes',
+    'carrots', 'mangoes', 'bananas', 'pineapple', 'passion fruit', 'watermelon', 'beans', 'green grams',
+    'sorghum', 'millet', 'cassava', 'sweet potatoes', 'arrow roots', 'milk', 'eggs', 'honey', 'coffee',
+    'tea leaves', 'macadamia', 'groundnuts', 'capsicum', 'garlic', 'ginger', 'dhania', 'managu', 'terere',
+]
+QUALIFIERS = ['fresh', 'organic', 'grade a', 'grade b', 'local', 'hybrid', 'dried', 'premium', 'farm', 'red', 'green']
+TYPOS = ['tomatoe', 'avacado', 'maiz', 'sukuma wikki', 'spinnach', 'cabage', 'potatos', 'mangos', 'banana', 'ginjer']
+
+
+class Command(BaseCommand):
+    help = 'Time fuzzy name lookups against an in-process trigram index of synthetic product names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=100_000)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--budget-ms', type=float, default=50.0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        index = TrigramIndex()
+
+        started = time.perf_counter()
+        for pk in range(options['names']):
+            name = f"{rng.choice(QUALIFIERS)} {rng.choice(PRODUCE)} {rng.randint(1, 500)}"
+            index.add('product', pk, name)
+        self.stdout.write(f"Indexed {options['names']} names in {time.perf_counter() - started:.2f}s")
+
+        timings = []
+        for _ in range(options['rounds']):
+            for query in TYPOS:
+                started = time.perf_counter()
+                index.search(query, options['limit'])
+                timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{len(timings)} queries: median {statistics.median(timings):.2f}ms, "
+            f"p95 {p95:.2f}ms, max {timings[-1]:.2f}ms"
+        )
+        if p95 > options['budget_ms']:
+            raise CommandError(f"p95 {p95:.2f}ms is over the {options['budget_ms']}ms budget")
+        self.stdout.write(self.style.SUCCESS('Within budget'))
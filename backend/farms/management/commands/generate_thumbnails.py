@@ -0,0 +1,32 @@
+import io
+from urllib.request import urlopen
+from django.core.management.base import BaseCommand
+from agriconnect.thumbnails import generate_thumbnails, registered, thumbnail_field
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnails for images uploaded before the thumbnail pipeline, or all with --all'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render images that already have thumbnails')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for each original')
+
+    def handle(self, *args, **options):
+        for model, field_name in registered:
+            rows = model._default_manager.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            if not options['all']:
+                rows = rows.filter(**{thumbnail_field(field_name): {}})
+
+            rendered = 0
+            for pk, image in rows.values_list('pk', field_name).iterator():
+                # values_list() still applies the field's from_db_value
+                stored = model._meta.get_field(field_name).get_prep_value(image)
+                try:
+                    with urlopen(image.build_url(secure=True), timeout=options['timeout']) as response:
+                        source = io.BytesIO(response.read())
+                except OSError as exc:
+                    self.stderr.write(f'{model._meta.label} {pk}: could not fetch the original ({exc})')
+                    continue
+                generate_thumbnails(model._meta.label, pk, field_name, stored, image.public_id, source=source)
+                rendered += 1
+            self.stdout.write(f'{model._meta.label}.{field_name}: rendered thumbnails for {rendered} images')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from farms.geo import coordinate_fields
+from farms.models import Farm
+
+
+class Command(BaseCommand):
+    help = 'Fill in farm coordinates and geohashes from their location strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-geocode farms that already have coordinates')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        farms = Farm.objects.only('id', 'location')
+        if not options['all']:
+            farms = farms.filter(latitude__isnull=True)
+
+        # Farms share a handful of location strings, so each is looked up once
+        fields_by_location, batch, placed, total = {}, [], 0, 0
+        fields, now = ['latitude', 'longitude', 'geohash', 'updated_at'], timezone.now()
+        for farm in farms.iterator(chunk_size=options['batch_size']):
+            if farm.location not in fields_by_location:
+                fields_by_location[farm.location] = coordinate_fields(farm.location)
+            for field, value in fields_by_location[farm.location].items():
+                setattr(farm, field, value)
+            farm.updated_at = now
+            placed += farm.latitude is not None
+            total += 1
+            batch.append(farm)
+            if len(batch) >= options['batch_size']:
+                Farm.objects.bulk_update(batch, fields)
+                batch = []
+        if batch:
+            Farm.objects.bulk_update(batch, fields)
+
+        self.stdout.write(f'Geocoded {placed} of {total} farms')
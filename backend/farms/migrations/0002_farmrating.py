@@ -0,0 +1,83 @@
+# Generated by Django 5.1.1 on 2026-10-18 01:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_ratings(apps, schema_editor):
+    Farm = apps.get_model('farms', 'Farm')
+    FarmRating = apps.get_model('farms', 'FarmRating')
+
+    for farm in Farm.objects.iterator():
+        votes = {}
+        for entry in farm.ratings or []:
+            if not isinstance(entry, dict) or not entry.get('rating'):
+                continue
+            if entry.get('user_identifier'):
+                rater = entry['user_identifier']
+            elif entry.get('user_id') is not None:
+                rater = f"user_{entry['user_id']}"
+            else:
+                continue
+            votes.setdefault(rater, float(entry['rating']))
+        if not votes:
+            continue
+
+        FarmRating.objects.bulk_create(
+            FarmRating(farm=farm, rater=rater, rating=rating) for rater, rating in votes.items()
+        )
+        farm.rating_sum = sum(votes.values())
+        farm.rating_count = len(votes)
+        farm.rating = farm.rating_sum / farm.rating_count
+        farm.save(update_fields=['rating_sum', 'rating_count', 'rating'])
+
+
+def restore_ratings(apps, schema_editor):
+    Farm = apps.get_model('farms', 'Farm')
+    FarmRating = apps.get_model('farms', 'FarmRating')
+
+    for farm in Farm.objects.filter(rating_count__gt=0).iterator():
+        farm.ratings = [
+            {'user_identifier': rater, 'rating': rating}
+            for rater, rating in FarmRating.objects.filter(farm=farm).values_list('rater', 'rating')
+        ]
+        farm.save(update_fields=['ratings'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FarmRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rater', models.CharField(max_length=64)),
+                ('rating', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='farm_ratings', to='farms.farm')),
+            ],
+            options={
+                'unique_together': {('farm', 'rater')},
+            },
+        ),
+        migrations.RunPython(backfill_ratings, restore_ratings),
+        migrations.RemoveField(
+            model_name='farm',
+            name='ratings',
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.1.1 on 2026-10-18 01:46
+
+import django.contrib.postgres.search
+from django.db import migrations
+from ._sqlite_search import FARM_TRIGGERS, PRODUCT_TRIGGERS
+
+
+POSTGRES_FORWARD = [
+    """
+    CREATE FUNCTION farms_farm_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.location, '') || ' ' || coalesce(NEW.specialty, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '') || ' ' || coalesce(NEW.about, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER farms_farm_search_vector
+    BEFORE INSERT OR UPDATE OF name, location, specialty, description, about ON farms_farm
+    FOR EACH ROW EXECUTE PROCEDURE farms_farm_search_vector()
+    """,
+    """
+    CREATE FUNCTION products_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.category, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER products_product_search_vector
+    BEFORE INSERT OR UPDATE OF name, category ON products_product
+    FOR EACH ROW EXECUTE PROCEDURE products_product_search_vector()
+    """,
+    "UPDATE farms_farm SET name = name",
+    "UPDATE products_product SET name = name",
+    "CREATE INDEX farms_farm_search_vector_gin ON farms_farm USING gin (search_vector)",
+    "CREATE INDEX products_product_search_vector_gin ON products_product USING gin (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS products_product_search_vector_gin",
+    "DROP INDEX IF EXISTS farms_farm_search_vector_gin",
+    "DROP TRIGGER IF EXISTS products_product_search_vector ON products_product",
+    "DROP FUNCTION IF EXISTS products_product_search_vector()",
+    "DROP TRIGGER IF EXISTS farms_farm_search_vector ON farms_farm",
+    "DROP FUNCTION IF EXISTS farms_farm_search_vector()",
+]
+
+# Farms are stored at rowid id * 2 and products at id * 2 + 1 so one FTS5
+# table can rank both kinds in a single query.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE search_index USING fts5(
+        name, tags, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    *FARM_TRIGGERS,
+    *PRODUCT_TRIGGERS,
+    """
+    INSERT INTO search_index (rowid, name, tags, body)
+    SELECT id * 2, name, location || ' ' || specialty, description || ' ' || coalesce(about, '')
+    FROM farms_farm
+    """,
+    """
+    INSERT INTO search_index (rowid, name, tags, body)
+    SELECT id * 2 + 1, name, category, '' FROM products_product
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS products_product_search_delete",
+    "DROP TRIGGER IF EXISTS products_product_search_update",
+    "DROP TRIGGER IF EXISTS products_product_search_insert",
+    "DROP TRIGGER IF EXISTS farms_farm_search_delete",
+    "DROP TRIGGER IF EXISTS farms_farm_search_update",
+    "DROP TRIGGER IF EXISTS farms_farm_search_insert",
+    "DROP TABLE IF EXISTS search_index",
+]
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0002_farmrating'),
+        ('products', '0002_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_statements({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_statements({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
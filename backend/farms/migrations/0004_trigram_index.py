@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:05
+
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = [
+    ('farms_farm_name_trgm', 'farms_farm'),
+    ('products_product_name_trgm', 'products_product'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            # Fuzzy search falls back to the in-process index, see farms/fuzzy.py
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index, table in TRIGRAM_INDEXES:
+        schema_editor.execute(f'CREATE INDEX {index} ON {table} USING gin (name gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index, table in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
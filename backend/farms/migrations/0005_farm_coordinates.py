@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:11
+
+from django.db import migrations, models
+from ._sqlite_search import restore_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0004_trigram_index'),
+    ]
+
+    restore_search_triggers = restore_triggers('farms_farm')
+
+    operations = [
+        restore_search_triggers[0],
+        migrations.CreateModel(
+            name='GeocodedLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255, unique=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='farm',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        restore_search_triggers[1],
+    ]
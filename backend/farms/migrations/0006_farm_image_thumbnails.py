@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:50
+
+from django.db import migrations, models
+from ._sqlite_search import restore_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0005_farm_coordinates'),
+    ]
+
+    restore_search_triggers = restore_triggers('farms_farm')
+
+    operations = [
+        restore_search_triggers[0],
+        migrations.AddField(
+            model_name='farm',
+            name='image_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        restore_search_triggers[1],
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:24
+
+import django.utils.timezone
+from django.db import migrations, models
+from ._sqlite_search import restore_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('farms', '0006_farm_image_thumbnails'),
+    ]
+
+    restore_search_triggers = restore_triggers('farms_farm')
+
+    operations = [
+        restore_search_triggers[0],
+        migrations.AddField(
+            model_name='farm',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        restore_search_triggers[1],
+    ]
@@ -0,0 +1,76 @@
+# farms/migrations/_sqlite_search.py
+"""
+SQLite triggers that keep the FTS5 ``search_index`` table from
+0003_search_index in sync with farms and products.
+
+SQLite can't alter most columns in place, so Django rebuilds the table for
+AddField, AlterField and RemoveField, and the rebuild drops the table's
+triggers. Migrations that touch farms_farm or products_product on SQLite
+re-create them with restore_triggers().
+"""
+from django.db import migrations
+
+FARM_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS farms_farm_search_insert AFTER INSERT ON farms_farm BEGIN
+        INSERT INTO search_index (rowid, name, tags, body) VALUES (
+            new.id * 2, new.name, new.location || ' ' || new.specialty,
+            new.description || ' ' || coalesce(new.about, '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS farms_farm_search_update
+    AFTER UPDATE OF name, location, specialty, description, about ON farms_farm BEGIN
+        UPDATE search_index SET
+            name = new.name,
+            tags = new.location || ' ' || new.specialty,
+            body = new.description || ' ' || coalesce(new.about, '')
+        WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS farms_farm_search_delete AFTER DELETE ON farms_farm BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+]
+
+PRODUCT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_search_insert AFTER INSERT ON products_product BEGIN
+        INSERT INTO search_index (rowid, name, tags, body) VALUES (new.id * 2 + 1, new.name, new.category, '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_search_update
+    AFTER UPDATE OF name, category ON products_product BEGIN
+        UPDATE search_index SET name = new.name, tags = new.category WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_product_search_delete AFTER DELETE ON products_product BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+TRIGGERS = {'farms_farm': FARM_TRIGGERS, 'products_product': PRODUCT_TRIGGERS}
+
+
+def restore_triggers(*tables):
+    """
+    Operations to wrap around a migration's table rebuilds: the first goes
+    at the start (for unapplying), the second at the end (for applying).
+    """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for table in tables:
+            for statement in TRIGGERS[table]:
+                schema_editor.execute(statement)
+
+    return [
+        migrations.RunPython(migrations.RunPython.noop, run),
+        migrations.RunPython(run, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 # farms/models.py
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, When
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 
 class Farm(models.Model):
@@ -8,12 +11,139 @@ class Farm(models.Model):
     location = models.CharField(max_length=255)
     description = models.TextField()
     image = CloudinaryField('farm_images', null=True, blank=True)
+    # {width: {format: url}}, filled in after upload, see agriconnect/thumbnails.py
+    image_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     farmer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='farms')
     specialty = models.CharField(max_length=255, default="Agriculture")
     rating = models.FloatField(default=0)
-    ratings = models.JSONField(default=list)
+    rating_sum = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
     about = models.TextField(blank=True, null=True)
     sustainability = models.TextField(blank=True, null=True)
+    # Maintained by a database trigger on PostgreSQL, see farms/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Geocoded from location when the farm is saved, see farms/geo.py
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False, db_index=True)
+    # Conditional GET validators for listings, see agriconnect/conditional.py
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'location' in update_fields:
+            from .geo import coordinate_fields
+
+            for field, value in coordinate_fields(self.location).items():
+                setattr(self, field, value)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'latitude', 'longitude', 'geohash'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def rating_delta(sum_delta, count_delta):
+        """
+        Update kwargs that shift the running rating aggregates in the database.
+        All right-hand sides read the pre-update column values, so the average
+        is computed from the same row state the deltas are applied to.
+        """
+        new_sum = F('rating_sum') + sum_delta
+        new_count = F('rating_count') + count_delta
+        return {
+            'updated_at': timezone.now(),
+            'rating_sum': new_sum,
+            'rating_count': new_count,
+            'rating': Case(
+                When(rating_count__gt=-count_delta, then=new_sum / new_count),
+                default=0.0,
+                output_field=models.FloatField(),
+            ),
+        }
+
+
+class RatingConflict(Exception):
+    """Raised when a rater's vote keeps changing underneath a concurrent write."""
+
+
+class FarmRatingManager(models.Manager):
+    # Only requests from the same rater race on one FarmRating row, so a
+    # couple of optimistic retries is plenty before giving up
+    write_attempts = 5
+
+    def _current(self, farm_id, rater):
+        return self.filter(farm_id=farm_id, rater=rater).values_list('rating', flat=True).first()
+
+    def set_rating(self, farm_id, rater, rating):
+        """
+        Add or replace the rater's vote and shift the farm aggregates by the difference.
+        The vote row is only written if it still holds the value the delta was
+        computed from, and the farm row is updated with relative expressions, so
+        concurrent votes never overwrite each other.
+        """
+        for _ in range(self.write_attempts):
+            previous = self._current(farm_id, rater)
+            try:
+                with transaction.atomic():
+                    if previous is None:
+                        # The (farm, rater) unique constraint rejects a racing first vote
+                        self.create(farm_id=farm_id, rater=rater, rating=rating)
+                        delta = Farm.rating_delta(rating, 1)
+                    elif self.filter(farm_id=farm_id, rater=rater, rating=previous).update(
+                        rating=rating, updated_at=timezone.now()
+                    ):
+                        delta = Farm.rating_delta(rating - previous, 0)
+                    else:
+                        continue
+                    Farm.objects.filter(pk=farm_id).update(**delta)
+                return previous
+            except IntegrityError:
+                continue
+        raise RatingConflict(f"Could not record rating for farm {farm_id}")
+
+    def remove_rating(self, farm_id, rater):
+        """Drop the rater's vote, if any, and return the rating that was removed."""
+        for _ in range(self.write_attempts):
+            previous = self._current(farm_id, rater)
+            if previous is None:
+                return None
+            with transaction.atomic():
+                deleted = self.filter(farm_id=farm_id, rater=rater, rating=previous).delete()[0]
+                if deleted:
+                    Farm.objects.filter(pk=farm_id).update(**Farm.rating_delta(-previous, -1))
+                    return previous
+        raise RatingConflict(f"Could not remove rating for farm {farm_id}")
+
+
+class FarmRating(models.Model):
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='farm_ratings')
+    # "user_<id>" for signed-in users, "anon_<session key>" for anonymous visitors
+    rater = models.CharField(max_length=64)
+    rating = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FarmRatingManager()
+
+    class Meta:
+        unique_together = ('farm', 'rater')
+
+    def __str__(self):
+        return f"{self.rater} rated {self.farm_id}: {self.rating}"
+
+
+class GeocodedLocation(models.Model):
+    """
+    Coordinates for a normalized location string. Lookups miss at most once
+    per distinct string (misses are stored with null coordinates), and rows
+    can be corrected by hand to override the built-in place list.
+    """
+    query = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.query
@@ -0,0 +1,153 @@
+# farms/search.py
+"""
+Ranked full-text search over farms and products.
+
+PostgreSQL keeps a weighted ``search_vector`` column on farms_farm and
+products_product (filled by triggers, GIN indexed). SQLite keeps an FTS5
+``search_index`` table in sync with triggers instead, with farms at rowid
+``id * 2`` and products at ``id * 2 + 1``. Both are created by
+farms/migrations/0003_search_index.py.
+"""
+import base64
+import json
+import re
+from typing import NamedTuple
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from products.models import Product
+from .models import Farm
+
+TERM_RE = re.compile(r'\w+')
+MAX_TERMS = 8
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    id: int
+    exact: bool
+    rank: float
+
+    def sort_key(self):
+        """Result order: exact name matches, then rank, then farms before products, then id."""
+        return (not self.exact, -self.rank, self.kind, self.id)
+
+
+def encode_cursor(mode, hit):
+    payload = json.dumps([mode, int(hit.exact), hit.rank, hit.kind, hit.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token):
+    """(mode, last hit of the previous page); raises ValueError for a malformed cursor."""
+    try:
+        mode, exact, rank, kind, pk = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if kind not in ('farm', 'product'):
+            raise ValueError(kind)
+        return mode, SearchHit(kind, int(pk), bool(exact), float(rank))
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def after_hit(after):
+    """Keyset filter for rows that sort after ``after`` (needs exact/rank/kind annotations)."""
+    if after is None:
+        return Q()
+    exact = int(after.exact)
+    return (
+        Q(exact__lt=exact)
+        | Q(exact=exact, rank__lt=after.rank)
+        | Q(exact=exact, rank=after.rank, kind__gt=after.kind)
+        | Q(exact=exact, rank=after.rank, kind=after.kind, id__gt=after.id)
+    )
+
+
+def search_terms(query):
+    return TERM_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def ranked_matches(query, limit, after=None):
+    """
+    Farms and products matching every term of ``query`` (as a prefix), in
+    SearchHit.sort_key order, starting after the ``after`` hit.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'postgresql':
+        return _postgres_matches(query, terms, limit, after)
+    return _sqlite_matches(query, terms, limit, after)
+
+
+def prefix_query(terms):
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), config='simple', search_type='raw')
+
+
+def prefix_match(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def product_filter(query):
+    """Q matching products whose name or category has every term of ``query`` as a prefix."""
+    terms = search_terms(query)
+    if not terms:
+        return Q()
+    if connection.vendor == 'postgresql':
+        return Q(search_vector=prefix_query(terms))
+    return Q(id__in=RawSQL(
+        'SELECT rowid / 2 FROM search_index WHERE search_index MATCH %s AND rowid %% 2 = 1',
+        [prefix_match(terms)],
+    ))
+
+
+def _postgres_matches(query, terms, limit, after):
+    search_query = prefix_query(terms)
+
+    def ranked(model, kind):
+        return model.objects.filter(search_vector=search_query).annotate(
+            kind=Value(kind),
+            exact=Case(When(name__iexact=query, then=Value(1)), default=Value(0), output_field=IntegerField()),
+            # ts_rank() is a real; as a double it survives the round trip through a cursor
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+        ).filter(after_hit(after)).values_list('kind', 'id', 'exact', 'rank')
+
+    rows = ranked(Farm, 'farm').union(ranked(Product, 'product'), all=True).order_by('-exact', '-rank', 'kind', 'id')[:limit]
+    return [SearchHit(kind, pk, bool(exact), rank) for kind, pk, exact, rank in rows]
+
+
+def _sqlite_matches(query, terms, limit, after):
+    match = prefix_match(terms)
+    keyset, keyset_params = '', []
+    if after is not None:
+        # Same order as SearchHit.sort_key: rowid % 2 is 0 for farms, 1 for products
+        keyset = """
+            WHERE exact < %s OR (exact = %s AND (rank < %s OR (rank = %s AND (
+                rowid %% 2 > %s OR (rowid %% 2 = %s AND rowid > %s)
+            ))))
+        """
+        kind_bit = int(after.kind == 'product')
+        exact = int(after.exact)
+        keyset_params = [exact, exact, after.rank, after.rank, kind_bit, kind_bit, after.id * 2 + kind_bit]
+
+    with connection.cursor() as cursor:
+        # bm25() is lower-is-better; name/tags/body are weighted like the PostgreSQL A/B/C weights
+        cursor.execute(
+            f"""
+            SELECT rowid, exact, rank FROM (
+                SELECT rowid, lower(name) = lower(%s) AS exact, -bm25(search_index, 10.0, 4.0, 1.0) AS rank
+                FROM search_index
+                WHERE search_index MATCH %s
+            )
+            {keyset}
+            ORDER BY exact DESC, rank DESC, rowid %% 2, rowid
+            LIMIT %s
+            """,
+            [query, match, *keyset_params, limit],
+        )
+        rows = cursor.fetchall()
+    return [
+        SearchHit('product' if rowid % 2 else 'farm', rowid // 2, bool(exact), rank)
+        for rowid, exact, rank in rows
+    ]
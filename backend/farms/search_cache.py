@@ -0,0 +1,90 @@
+# farms/search_cache.py
+"""
+Cache for /api/search/ pages.
+
+Pages are stored in the "search" cache (local memory unless settings say
+otherwise) under keys that embed a catalog version. Saving or deleting a
+farm or product bumps that version (see farms/signals.py), so every page
+cached before the change stops being addressable at once and ages out.
+
+The version lives in the "shared" cache (Redis in production), so a bump
+from one gunicorn worker or background job reaches the pages every other
+worker holds in its own memory.
+"""
+import hashlib
+import json
+import threading
+import time
+from django.core.cache import caches
+
+VERSION_KEY = 'search:version'
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+class SearchCache:
+    def __init__(self, alias='search', version_alias='shared'):
+        self.alias = alias
+        self.version_alias = version_alias
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_cache(self):
+        return caches[self.version_alias]
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def version(self):
+        version = self.version_cache.get(VERSION_KEY)
+        if version is None:
+            # Seeded from the clock so an evicted version never revives older pages
+            self.version_cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = self.version_cache.get(VERSION_KEY)
+        return version
+
+    def bump(self):
+        try:
+            self.version_cache.incr(VERSION_KEY)
+        except ValueError:
+            self.version_cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+    def key(self, **params):
+        """Versioned key for one page; the version is read before the page is computed."""
+        params['q'] = normalize_query(params.get('q', ''))
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f'search:{self.version()}:{digest}'
+
+    def get(self, key):
+        page = self.cache.get(key)
+        with self._lock:
+            if page is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return page
+
+    def set(self, key, page):
+        self.cache.set(key, page)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'version': self.version_cache.get(VERSION_KEY),
+            }
+
+
+search_cache = SearchCache()
@@ -1,17 +1,20 @@
 from rest_framework import serializers
+from agriconnect.thumbnails import absolute_thumbnails
 from .models import Farm
 from accounts.models import FarmerProfile
 
 class FarmSerializer(serializers.ModelSerializer):
     rating = serializers.SerializerMethodField()
     farm_image = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
+    farm_image_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = Farm
         fields = [
-            'id', 'name', 'location', 'description', 'image', 
-            'farmer', 'specialty', 'farm_image', 'rating',
-            'about', 'sustainability'
+            'id', 'name', 'location', 'description', 'image', 'thumbnails',
+            'farmer', 'specialty', 'farm_image', 'farm_image_thumbnails', 'rating',
+            'about', 'sustainability', 'latitude', 'longitude'
         ]
 
     def get_rating(self, obj):
@@ -21,4 +24,13 @@ class FarmSerializer(serializers.ModelSerializer):
         farmer_profile = obj.farmer.farmer_profile if hasattr(obj.farmer, 'farmer_profile') else None
         if farmer_profile and farmer_profile.farm_image:
             return farmer_profile.farm_image.url
-        return None
\ No newline at end of file
+        return None
+
+    def get_thumbnails(self, obj):
+        return absolute_thumbnails(obj.image_thumbnails, self.context.get('request'))
+
+    def get_farm_image_thumbnails(self, obj):
+        farmer_profile = obj.farmer.farmer_profile if hasattr(obj.farmer, 'farmer_profile') else None
+        if farmer_profile and farmer_profile.farm_image:
+            return absolute_thumbnails(farmer_profile.farm_image_thumbnails, self.context.get('request'))
+        return {}
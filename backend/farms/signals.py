@@ -0,0 +1,82 @@
+# farms/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from accounts.models import FarmerProfile
+from agriconnect import thumbnails
+from products.models import Product
+from .fuzzy import trigram_index
+from .models import Farm
+from .search_cache import search_cache
+from .suggest import farm_terms, product_terms, suggestion_index
+
+# Fields that show up in search results; saves limited to other fields
+# (stock levels, prices) leave the indexes and cached pages alone
+SEARCHED_FIELDS = {
+    Farm: {'name', 'location', 'specialty', 'description', 'about', 'image', 'farmer'},
+    Product: {'name', 'category', 'image', 'farm'},
+}
+
+
+def invalidate_search_cache():
+    # Once now for reads later in this transaction, and again on commit for
+    # pages other requests cached from the rows as they were before it
+    search_cache.bump()
+    transaction.on_commit(search_cache.bump)
+
+
+@receiver(post_save, sender=Farm)
+@receiver(post_save, sender=Product)
+def index_name(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SEARCHED_FIELDS[sender].intersection(update_fields):
+        return
+    invalidate_search_cache()
+    index_instance(sender, instance)
+
+
+def index_instance(sender, instance):
+    kind = 'farm' if sender is Farm else 'product'
+    if trigram_index.ready:
+        trigram_index.add(kind, instance.pk, instance.name)
+    if suggestion_index.ready:
+        terms = farm_terms(instance) if sender is Farm else product_terms(instance)
+        suggestion_index.set_source((kind, instance.pk), terms)
+
+
+def index_products(products):
+    """What the save signals do, for products written with bulk_create/bulk_update."""
+    invalidate_search_cache()
+    for product in products:
+        index_instance(Product, product)
+
+
+@receiver(post_delete, sender=Farm)
+@receiver(post_delete, sender=Product)
+def unindex_name(sender, instance, **kwargs):
+    invalidate_search_cache()
+    kind = 'farm' if sender is Farm else 'product'
+    if trigram_index.ready:
+        trigram_index.remove(kind, instance.pk)
+    if suggestion_index.ready:
+        suggestion_index.remove_source((kind, instance.pk))
+
+
+@receiver(post_save, sender=FarmerProfile)
+def touch_farms(sender, instance, **kwargs):
+    # Farm listings embed the farmer's profile image
+    Farm.objects.filter(farmer_id=instance.user_id).update(updated_at=timezone.now())
+
+
+@receiver(thumbnails.thumbnails_rendered)
+def touch_rendered(sender, pk, **kwargs):
+    # Thumbnails are written with update(), which leaves auto_now alone
+    if sender is FarmerProfile:
+        Farm.objects.filter(farmer__farmer_profile=pk).update(updated_at=timezone.now())
+    else:
+        sender.objects.filter(pk=pk).update(updated_at=timezone.now())
+
+
+thumbnails.register(Farm, 'image')
+thumbnails.register(Product, 'image')
+thumbnails.register(FarmerProfile, 'farm_image')
@@ -0,0 +1,150 @@
+# farms/suggest.py
+"""
+Search-as-you-type suggestions from an in-process prefix index.
+
+Farm names, product names and product categories are kept in one sorted
+array and looked up with bisect. The index is loaded when the web process
+starts (see agriconnect/wsgi.py), or on first use, and kept current by the
+signals in farms/signals.py.
+"""
+import threading
+from bisect import bisect_left, insort
+from itertools import chain
+from products.models import Product
+from .fuzzy import words
+from .models import Farm
+
+# Only the first few words of a name can start a match ("hass avocado" is
+# found by "hass" and "avocado"), and long names are cut, which keeps the
+# index to a small multiple of the number of distinct terms
+MAX_WORD_STARTS = 4
+MAX_TERM_LENGTH = 64
+# How many prefix matches are ranked per lookup. A known limit: a prefix
+# matching more entries than this (typically one or two letters) ranks only
+# the first SCAN_LIMIT of them in alphabetical order, so a widely used term
+# late in the alphabet can be missed until the prefix gets longer
+SCAN_LIMIT = 200
+
+
+def normalize(text):
+    return ' '.join(words(text))[:MAX_TERM_LENGTH]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # Sorted (searchable suffix, kind, term) tuples
+            self._entries = []
+            # (kind, term) -> [display text, number of rows using it]
+            self._terms = {}
+            # (model kind, pk) -> the (kind, term) pairs that row contributed
+            self._sources = {}
+            self.ready = False
+
+    def _suffixes(self, term):
+        term_words = term.split()
+        return {' '.join(term_words[i:]) for i in range(min(len(term_words), MAX_WORD_STARTS))}
+
+    def _add_term(self, kind, text, pending=None):
+        """Count a use of ``text``; new entries go to ``pending`` if given, to be sorted in later."""
+        term = normalize(text)
+        if not term:
+            return None
+        key = (kind, term)
+        if key in self._terms:
+            self._terms[key][1] += 1
+        else:
+            self._terms[key] = [text.strip()[:MAX_TERM_LENGTH], 1]
+            for suffix in self._suffixes(term):
+                if pending is None:
+                    insort(self._entries, (suffix, kind, term))
+                else:
+                    pending.append((suffix, kind, term))
+        return key
+
+    def _remove_term(self, key):
+        entry = self._terms[key]
+        entry[1] -= 1
+        if entry[1]:
+            return
+        del self._terms[key]
+        kind, term = key
+        for suffix in self._suffixes(term):
+            position = bisect_left(self._entries, (suffix, kind, term))
+            if position < len(self._entries) and self._entries[position] == (suffix, kind, term):
+                del self._entries[position]
+
+    def set_source(self, source, terms):
+        """Replace whatever ``source`` (a ("farm"|"product", pk) pair) contributed with ``terms``."""
+        with self._lock:
+            self.remove_source(source)
+            keys = [self._add_term(kind, text) for kind, text in terms if text]
+            self._sources[source] = [key for key in keys if key]
+
+    def load(self, sources):
+        """
+        Add many ``(source, terms)`` at once. Their entries are sorted in
+        with one sort at the end, where inserting each one would move the
+        rest of the list every time.
+        """
+        with self._lock:
+            pending = []
+            for source, terms in sources:
+                self.remove_source(source)
+                keys = [self._add_term(kind, text, pending) for kind, text in terms if text]
+                self._sources[source] = [key for key in keys if key]
+            self._entries.extend(pending)
+            self._entries.sort()
+
+    def remove_source(self, source):
+        with self._lock:
+            for key in self._sources.pop(source, []):
+                self._remove_term(key)
+
+    def suggest(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            matches = {}
+            position = bisect_left(self._entries, (prefix,))
+            end = min(position + SCAN_LIMIT, len(self._entries))
+            while position < end:
+                suffix, kind, term = self._entries[position]
+                if not suffix.startswith(prefix):
+                    break
+                matches[(kind, term)] = self._terms[(kind, term)]
+                position += 1
+
+            # Most widely used first, then the shortest completion
+            ranked = sorted(matches.items(), key=lambda item: (-item[1][1], len(item[0][1]), item[0][1]))
+            return [{'text': display, 'type': kind} for (kind, _), (display, _) in ranked[:limit]]
+
+
+def farm_terms(farm):
+    return [('farm', farm.name)]
+
+
+def product_terms(product):
+    return [('product', product.name), ('category', product.category)]
+
+
+suggestion_index = PrefixIndex()
+
+
+def load_suggestion_index():
+    with suggestion_index._lock:
+        if suggestion_index.ready:
+            return suggestion_index
+        suggestion_index.load(chain(
+            ((('farm', farm.pk), farm_terms(farm)) for farm in Farm.objects.only('id', 'name').iterator()),
+            ((('product', product.pk), product_terms(product))
+             for product in Product.objects.only('id', 'name', 'category').iterator()),
+        ))
+        suggestion_index.ready = True
+    return suggestion_index
@@ -1,3 +1,462 @@
-from django.test import TestCase
+import random
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from accounts.models import User
+from products.models import Product
+from .fuzzy import TrigramIndex, trigram_index
+from .geo import distance_km, encode_geohash, farms_within, nearest_farms, neighbourhood, precision_for_radius
+from .models import Farm, FarmRating, GeocodedLocation
+from .search_cache import SearchCache, search_cache
+from .suggest import PrefixIndex, suggestion_index
 
-# Create your tests here.
+
+class FarmTestMixin:
+    """
+    Creates self.farmer, who owns self.farm ('Green Acres' in Nakuru), and
+    a buyer, self.customer, before each test.
+    """
+    def setUp(self):
+        super().setUp()
+        self.farmer = User.objects.create_user(username='farmer', email='farmer@example.com', password='pass12345', user_type='farmer')
+        self.farm = Farm.objects.create(name='Green Acres', location='Nakuru', description='Mixed farm', farmer=self.farmer)
+        self.customer = User.objects.create_user(username='buyer', email='buyer@example.com', password='pass12345')
+
+
+class FarmRatingTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def rate_as(self, user, rating):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/farms/{self.farm.id}/rate/', {'rating': rating}, format='json')
+
+    def test_rate_keeps_running_aggregates(self):
+        users = [
+            User.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com', password='pass12345')
+            for i in range(3)
+        ]
+        self.rate_as(users[0], 5)
+        self.rate_as(users[1], 3)
+        response = self.rate_as(users[2], 4)
+        self.assertEqual(response.data, {'averageRating': 4.0, 'totalRatings': 3})
+
+        # Changing a vote shifts the sum without adding to the count
+        response = self.rate_as(users[0], 1)
+        self.assertAlmostEqual(response.data['averageRating'], 8 / 3)
+        self.assertEqual(response.data['totalRatings'], 3)
+
+        response = self.rate_as(users[1], 0)
+        self.assertEqual(response.data, {'averageRating': 2.5, 'totalRatings': 2})
+
+        self.farm.refresh_from_db()
+        self.assertEqual((self.farm.rating_sum, self.farm.rating_count), (5.0, 2))
+        self.assertEqual(FarmRating.objects.filter(farm=self.farm).count(), 2)
+
+    def test_submit_rating_toggles_vote(self):
+        self.client.force_authenticate(self.customer)
+        url = f'/api/farms/{self.farm.id}/submit-rating/'
+
+        response = self.client.post(url, {'rating': 4}, format='json')
+        self.assertEqual(response.data, {'rating': 4.0, 'total_ratings': 1, 'action': 'added'})
+
+        response = self.client.post(url, {'rating': 2}, format='json')
+        self.assertEqual(response.data, {'rating': 0.0, 'total_ratings': 0, 'action': 'removed'})
+
+    def test_invalid_rating_is_rejected(self):
+        self.assertEqual(self.rate_as(self.customer, 7).status_code, 400)
+        self.assertEqual(self.rate_as(self.customer, 'five').status_code, 400)
+
+    def test_rating_reads_cost_one_query_regardless_of_volume(self):
+        FarmRating.objects.bulk_create(
+            FarmRating(farm=self.farm, rater=f'anon_{i}', rating=3) for i in range(200)
+        )
+        Farm.objects.filter(pk=self.farm.pk).update(rating=3, rating_sum=600, rating_count=200)
+        FarmRating.objects.set_rating(self.farm.id, f'user_{self.customer.id}', 5)
+        self.client.force_authenticate(self.customer)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/farms/{self.farm.id}/rating-info/')
+        self.assertEqual(response.data['totalRatings'], 201)
+        self.assertEqual(response.data['userRating'], 5)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/farms/{self.farm.id}/user-rating/')
+        self.assertEqual(response.data, {'userRating': 5})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/farms/{self.farm.id}/get-rating/')
+        self.assertEqual(response.data['total_ratings'], 201)
+
+    def test_batch_rating_info_uses_one_query(self):
+        other = Farm.objects.create(name='Hill Top', location='Nyeri', description='Tea', farmer=self.farmer)
+        FarmRating.objects.set_rating(self.farm.id, f'user_{self.customer.id}', 4)
+        FarmRating.objects.set_rating(other.id, 'anon_someone', 2)
+        self.client.force_authenticate(self.customer)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/farms/rating-info/?ids={self.farm.id},{other.id},999')
+        self.assertEqual(response.data, {
+            self.farm.id: {'averageRating': 4.0, 'totalRatings': 1, 'userRating': 4.0},
+            other.id: {'averageRating': 2.0, 'totalRatings': 1, 'userRating': None},
+        })
+
+        self.assertEqual(self.client.get('/api/farms/rating-info/?ids=1,x').status_code, 400)
+
+
+    def test_farm_list_is_revalidated_after_a_rating(self):
+        first = self.client.get('/api/farms/')
+        self.assertEqual(first['Cache-Control'], 'no-cache')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/farms/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.rate_as(self.customer, 4)
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/farms/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['rating'], 4.0)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        trigram_index.clear()
+        search_cache.cache.clear()
+        search_cache.reset_stats()
+        farmer = User.objects.create_user(username='farmer', email='farmer@example.com', password='pass12345', user_type='farmer')
+        self.farm = Farm.objects.create(name='Tomato Valley', location='Naivasha', description='Greenhouse vegetables', farmer=farmer)
+        self.dairy = Farm.objects.create(name='Sunrise Dairy', location='Kiambu', description='Fresh milk and tomatoes', farmer=farmer)
+        self.tomatoes = Product.objects.create(name='Tomatoes', category='Vegetables', farm=self.farm)
+        self.milk = Product.objects.create(name='Milk', category='Dairy', farm=self.dairy)
+
+    def search(self, query, **params):
+        return self.client.get('/api/search/', {'q': query, **params}).json()['results']
+
+    def all_pages(self, query, **params):
+        page = self.client.get('/api/search/', {'q': query, **params}).json()
+        results = page['results']
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            results += page['results']
+        return results
+
+    def test_prefix_terms_match_across_farms_and_products(self):
+        self.assertCountEqual(
+            [(r['type'], r['id']) for r in self.search('tomato')],
+            [('farm', self.farm.id), ('farm', self.dairy.id), ('product', self.tomatoes.id)],
+        )
+        self.assertCountEqual(
+            [(r['type'], r['id']) for r in self.search('dairy milk')],
+            [('farm', self.dairy.id), ('product', self.milk.id)],
+        )
+        self.assertEqual(self.search('kiambu'), [{
+            'id': self.dairy.id, 'name': 'Sunrise Dairy', 'type': 'farm', 'image': None,
+            'match_type': 'partial', 'location': 'Kiambu',
+        }])
+
+    def test_exact_name_match_ranks_first(self):
+        results = self.search('milk')
+        self.assertEqual((results[0]['type'], results[0]['match_type']), ('product', 'exact'))
+        self.assertEqual(results[0]['farm_name'], 'Sunrise Dairy')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.milk.name = 'Yoghurt'
+        self.milk.save()
+        self.assertEqual(self.search('milk')[0]['type'], 'farm')
+        self.assertEqual(self.search('yoghurt')[0]['id'], self.milk.id)
+
+        self.farm.delete()
+        self.assertEqual(self.search('valley'), [])
+
+    def test_query_count_does_not_grow_with_matches(self):
+        Product.objects.bulk_create(
+            Product(name=f'Tomato grade {i}', category='Vegetables', farm=self.farm) for i in range(40)
+        )
+        with self.assertNumQueries(3):
+            results = self.search('tomato', page_size=50)
+        self.assertEqual(len(results), 43)
+
+    def test_cursor_pages_cover_every_match_once_in_order(self):
+        Product.objects.bulk_create(
+            Product(name=f'Tomato grade {i}', category='Vegetables', farm=self.farm) for i in range(40)
+        )
+        first_page = self.client.get('/api/search/', {'q': 'tomato', 'page_size': 10}).json()
+        self.assertEqual(len(first_page['results']), 10)
+        self.assertIn('cursor=', first_page['next'])
+
+        paged = [(r['type'], r['id']) for r in self.all_pages('tomato', page_size=10)]
+        unpaged = [(r['type'], r['id']) for r in self.search('tomato', page_size=50)]
+        self.assertEqual(len(paged), 43)
+        self.assertEqual(paged, unpaged)
+
+        fuzzy_paged = [(r['type'], r['id']) for r in self.all_pages('tomatos', mode='fuzzy', page_size=7)]
+        self.assertEqual(fuzzy_paged, [(r['type'], r['id']) for r in self.search('tomatos', mode='fuzzy', page_size=50)])
+        self.assertEqual(len(fuzzy_paged), len(set(fuzzy_paged)))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/search/', {'q': 'tomato', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_misspelled_query_falls_back_to_fuzzy_matches(self):
+        avocado = Product.objects.create(name='Hass Avocado', category='Fruit', farm=self.farm)
+        results = self.search('avacado')
+        self.assertEqual([(r['type'], r['id'], r['match_type']) for r in results], [('product', avocado.id, 'fuzzy')])
+
+        names = [r['name'] for r in self.search('tomatos')]
+        self.assertIn('Tomatoes', names)
+        self.assertIn('Tomato Valley', names)
+        self.assertEqual(self.search('xyzzy'), [])
+
+    def test_fuzzy_mode_follows_saves_and_deletes(self):
+        self.assertEqual(self.search('milc', mode='fuzzy')[0]['id'], self.milk.id)
+        self.milk.delete()
+        self.assertEqual(self.search('milc', mode='fuzzy'), [])
+        self.tomatoes.name = 'Sukuma Wiki'
+        self.tomatoes.save()
+        self.assertEqual(self.search('sukuma wikki', mode='fuzzy')[0]['id'], self.tomatoes.id)
+
+    def test_repeated_queries_are_served_from_cache(self):
+        first = self.search('Tomato')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search('  tomato '), first)
+        self.assertEqual((search_cache.hits, search_cache.misses), (1, 1))
+
+        # Stock changes don't touch search results, renames do
+        self.tomatoes.quantity = 5
+        self.tomatoes.save(update_fields=['quantity'])
+        with self.assertNumQueries(0):
+            self.search('tomato')
+        self.tomatoes.name = 'Cherry Tomatoes'
+        self.tomatoes.save()
+        self.assertIn('Cherry Tomatoes', [r['name'] for r in self.search('tomato')])
+        self.assertEqual((search_cache.hits, search_cache.misses), (2, 2))
+
+    def test_changes_retire_pages_cached_by_other_workers(self):
+        # Another worker's pages live in its own memory; only the version is shared
+        worker = SearchCache(alias='default')
+        key = worker.key(q='tomato')
+        worker.set(key, ['stale page'])
+        self.tomatoes.name = 'Cherry Tomatoes'
+        self.tomatoes.save()
+        self.assertNotEqual(worker.key(q='tomato'), key)
+        self.assertIsNone(worker.get(worker.key(q='tomato')))
+
+    def test_cache_stats_are_admin_only(self):
+        self.search('milk')
+        self.search('milk')
+        self.assertEqual(self.client.get('/api/search/cache-stats/').status_code, 401)
+
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        client = APIClient()
+        client.force_authenticate(admin)
+        stats = client.get('/api/search/cache-stats/').json()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+
+class TrigramIndexTests(TestCase):
+    def test_ranks_by_similarity_and_applies_cutoff(self):
+        index = TrigramIndex()
+        index.add('product', 1, 'Tomatoes')
+        index.add('product', 2, 'Cherry Tomato')
+        index.add('product', 3, 'Potatoes')
+        index.add('farm', 4, 'Tomatoes')
+
+        matches = index.search('tomatoe', limit=10)
+        self.assertEqual([(kind, pk) for _, kind, pk in matches][:3], [('farm', 4), ('product', 1), ('product', 2)])
+        self.assertTrue(all(score >= 0.3 for score, _, _ in matches))
+        self.assertEqual(index.search('tomatoe', limit=10, cutoff=0.9), [])
+
+        index.remove('farm', 4)
+        index.remove('product', 1)
+        self.assertEqual([pk for _, _, pk in index.search('tomatoes', limit=10)][:1], [2])
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        suggestion_index.clear()
+        farmer = User.objects.create_user(username='farmer', email='farmer@example.com', password='pass12345', user_type='farmer')
+        self.farm = Farm.objects.create(name='Tomato Valley', location='Naivasha', description='Vegetables', farmer=farmer)
+        self.other = Farm.objects.create(name='Hill Top', location='Nyeri', description='Fruit', farmer=farmer)
+        Product.objects.create(name='Tomatoes', category='Vegetables', farm=self.farm)
+        Product.objects.create(name='Tomatoes', category='Vegetables', farm=self.other)
+        self.avocado = Product.objects.create(name='Hass Avocado', category='Fruit', farm=self.other)
+
+    def suggest(self, query, **params):
+        return self.client.get('/api/search/suggest/', {'q': query, **params}).json()
+
+    def test_prefix_matches_any_word_and_ranks_by_usage(self):
+        self.assertEqual(self.suggest('tom'), [
+            {'text': 'Tomatoes', 'type': 'product'},
+            {'text': 'Tomato Valley', 'type': 'farm'},
+        ])
+        self.assertEqual(self.suggest('avo'), [{'text': 'Hass Avocado', 'type': 'product'}])
+        self.assertEqual(self.suggest('veg'), [{'text': 'Vegetables', 'type': 'category'}])
+        self.assertEqual(len(self.suggest('t', limit=1)), 1)
+        self.assertEqual(self.suggest(''), [])
+
+    def test_lookups_are_served_from_memory(self):
+        self.suggest('tom')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('hill'), [{'text': 'Hill Top', 'type': 'farm'}])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.suggest('tom')
+        self.avocado.name = 'Fuerte Avocado'
+        self.avocado.category = 'Fruits'
+        self.avocado.save()
+        self.assertEqual(self.suggest('avo'), [{'text': 'Fuerte Avocado', 'type': 'product'}])
+        self.assertEqual(self.suggest('fruits'), [{'text': 'Fruits', 'type': 'category'}])
+
+        self.other.delete()
+        self.assertEqual(self.suggest('avo'), [])
+        self.assertEqual(self.suggest('hill'), [])
+        # One "Tomatoes" product is left, so the term stays
+        self.assertEqual(self.suggest('tomatoes'), [{'text': 'Tomatoes', 'type': 'product'}])
+
+    def test_bulk_load_matches_adding_rows_one_at_a_time(self):
+        sources = [
+            (('product', pk), [('product', f'{name} {pk}'), ('category', category)])
+            for pk, (name, category) in enumerate([('Sukuma Wiki', 'Greens'), ('Kale', 'Greens'), ('Hass Avocado', 'Fruit')] * 50)
+        ]
+        loaded, added = PrefixIndex(), PrefixIndex()
+        loaded.load(sources)
+        for source, terms in sources:
+            added.set_source(source, terms)
+        self.assertEqual(loaded._entries, added._entries)
+        self.assertEqual(loaded._terms, added._terms)
+        self.assertEqual(loaded.suggest('gre', 5), [{'text': 'Greens', 'type': 'category'}])
+
+
+class FarmsNearTests(TestCase):
+    def setUp(self):
+        self.farmer = User.objects.create_user(username='farmer', email='farmer@example.com', password='pass12345', user_type='farmer')
+
+    def farm(self, name, location):
+        return Farm.objects.create(name=name, location=location, description='Farm', farmer=self.farmer)
+
+    def test_locations_are_geocoded_offline_and_cached(self):
+        farm = self.farm('Lake Farm', 'Naivasha, Nakuru County')
+        self.assertEqual((farm.latitude, farm.longitude), (-0.7167, 36.4333))
+        self.assertEqual(farm.geohash, encode_geohash(-0.7167, 36.4333))
+
+        with self.assertNumQueries(2):  # Cache lookup, then the insert
+            self.farm('Second Farm', 'naivasha,  Nakuru county')
+        self.assertEqual(GeocodedLocation.objects.count(), 1)
+
+        unknown = self.farm('Nowhere Farm', 'Somewhere remote')
+        self.assertEqual((unknown.latitude, unknown.geohash), (None, ''))
+
+        # Cached rows can be corrected by hand
+        GeocodedLocation.objects.filter(query='somewhere remote').update(latitude=1.0, longitude=36.0)
+        unknown.save(update_fields=['location'])
+        unknown.refresh_from_db()
+        self.assertEqual((unknown.latitude, unknown.longitude), (1.0, 36.0))
+
+    def test_endpoint_finds_farms_by_radius_and_nearest(self):
+        naivasha = self.farm('Lake Farm', 'Naivasha')
+        nakuru = self.farm('Rift Farm', 'Nakuru Town')
+        self.farm('Coast Farm', 'Mombasa')
+
+        response = self.client.get('/api/farms/near/', {'location': 'Naivasha', 'radius_km': 100})
+        self.assertEqual([farm['id'] for farm in response.json()], [naivasha.id, nakuru.id])
+        self.assertEqual(response.json()[0]['distance_km'], 0)
+
+        response = self.client.get('/api/farms/near/', {'lat': -0.30, 'lng': 36.08, 'k': 2})
+        self.assertEqual([farm['id'] for farm in response.json()], [nakuru.id, naivasha.id])
+
+        self.assertEqual(self.client.get('/api/farms/near/', {'location': 'Atlantis'}).status_code, 400)
+        response = self.client.get('/api/farms/near/', {'location': 'Outside Naivasha', 'radius_km': 1})
+        self.assertEqual([farm['id'] for farm in response.json()], [naivasha.id])
+        # Searches only read remembered locations, the three farms' are all there is
+        self.assertEqual(GeocodedLocation.objects.count(), 3)
+        self.assertEqual(self.client.get('/api/farms/near/', {'lat': 'north', 'lng': 1}).status_code, 400)
+        for radius in ('nan', 'inf', '-inf'):
+            response = self.client.get('/api/farms/near/', {'location': 'Naivasha', 'radius_km': radius})
+            self.assertEqual(response.status_code, 400)
+
+    def test_radius_picks_the_finest_cells_that_are_wide_enough(self):
+        # Precision 4 cells are about 20 x 39 km near the equator, precision 3 about 156 km square
+        self.assertEqual(precision_for_radius(-0.7, 20), 4)
+        self.assertEqual(len(neighbourhood(-0.7, 36.4, 4, 20)), 15)
+        self.assertEqual(precision_for_radius(-0.7, 40), 3)
+        with self.assertRaises(ValueError):
+            farms_within(Farm.objects.all(), -0.7, 36.4, float('nan'))
+        with self.assertRaises(ValueError):
+            nearest_farms(Farm.objects.all(), float('nan'), 36.4, 3)
+
+    def test_cell_lookups_match_a_full_scan(self):
+        rng = random.Random(7)
+        farms = Farm.objects.bulk_create(
+            Farm(name=f'Farm {i}', location='', description='Farm', farmer=self.farmer) for i in range(300)
+        )
+        for farm in farms:
+            farm.latitude, farm.longitude = rng.uniform(-4.7, 4.6), rng.uniform(33.9, 41.9)
+            farm.geohash = encode_geohash(farm.latitude, farm.longitude)
+        Farm.objects.bulk_update(farms, ['latitude', 'longitude', 'geohash'])
+
+        queryset = Farm.objects.all()
+        for _ in range(20):
+            latitude, longitude = rng.uniform(-4.7, 4.6), rng.uniform(33.9, 41.9)
+            everything = sorted(
+                (distance_km(latitude, longitude, farm.latitude, farm.longitude), farm.pk) for farm in farms
+            )
+            radius = rng.choice([5, 20, 25, 80, 300])
+            self.assertEqual(
+                [farm.pk for _, farm in farms_within(queryset, latitude, longitude, radius)],
+                [pk for distance, pk in everything if distance <= radius],
+            )
+            k = rng.choice([1, 5, 20])
+            self.assertEqual(
+                [farm.pk for _, farm in nearest_farms(queryset, latitude, longitude, k)],
+                [pk for _, pk in everything[:k]],
+            )
+
+
+class ConcurrentRatingTests(FarmTestMixin, TransactionTestCase):
+    workers = 16
+
+    def setUp(self):
+        super().setUp()
+        User.objects.bulk_create(
+            User(username=f'voter{i}', email=f'voter{i}@example.com') for i in range(2000)
+        )
+        self.voters = list(User.objects.filter(username__startswith='voter'))
+
+    def vote_in_parallel(self, votes):
+        def post(vote):
+            user, rating = vote
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                return client.post(f'/api/farms/{self.farm.id}/rate/', {'rating': rating}, format='json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(post, votes))
+
+    def test_parallel_votes_are_all_counted(self):
+        votes = [(user, i % 5 + 1) for i, user in enumerate(self.voters)]
+        random.shuffle(votes)
+        statuses = self.vote_in_parallel(votes)
+
+        self.assertEqual(set(statuses), {200})
+        self.farm.refresh_from_db()
+        self.assertEqual(self.farm.rating_count, 2000)
+        self.assertEqual(self.farm.rating_sum, 6000)
+        self.assertEqual(self.farm.rating, 3.0)
+
+    def test_parallel_vote_changes_and_removals_stay_consistent(self):
+        # A small pool of raters so the same (farm, rater) row is contended
+        votes = [(random.choice(self.voters[:100]), random.randint(0, 5)) for _ in range(1000)]
+        statuses = self.vote_in_parallel(votes)
+
+        self.assertEqual(set(statuses), {200})
+        self.farm.refresh_from_db()
+        stored = FarmRating.objects.filter(farm=self.farm).aggregate(total=Sum('rating'), count=Count('id'))
+        self.assertEqual(self.farm.rating_count, stored['count'])
+        self.assertEqual(self.farm.rating_sum, stored['total'] or 0)
+        if stored['count']:
+            self.assertAlmostEqual(self.farm.rating, stored['total'] / stored['count'])
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import FarmList, FarmDetail, FarmCreateView, MyFarmView, FarmProductsView, SubmitRatingView, GetRatingView, UserRatingView, RatingInfoView, RateView
+from .views import FarmList, FarmDetail, FarmCreateView, MyFarmView, FarmProductsView, SubmitRatingView, GetRatingView, UserRatingView, RatingInfoView, RateView, BatchRatingInfoView, FarmsNearView
 
 urlpatterns = [
     path('', FarmList.as_view()),
@@ -7,6 +7,8 @@ urlpatterns = [
     path('<int:pk>/', FarmDetail.as_view()),
     path('create/', FarmCreateView.as_view(), name='farm-create'),
     path('<int:pk>/products/', FarmProductsView.as_view(), name='farm-products'),
+    path('rating-info/', BatchRatingInfoView.as_view(), name='batch-rating-info'),
+    path('near/', FarmsNearView.as_view(), name='farms-near'),
     path('<int:farm_id>/submit-rating/', SubmitRatingView.as_view(), name='submit-rating'),
     path('<int:farm_id>/get-rating/', GetRatingView.as_view(), name='get-rating'),
     path('<int:farm_id>/user-rating/', UserRatingView.as_view(), name='user-rating'),
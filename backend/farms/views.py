@@ -1,19 +1,27 @@
+import math
 from rest_framework import generics, permissions
+from agriconnect.conditional import ConditionalListMixin
 from rest_framework.permissions import IsAuthenticated
-from .models import Farm
+from .models import Farm, FarmRating, RatingConflict
 from .serializers import FarmSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from products.models import Product
 from products.serializers import ProductSerializer
+from products.views import ProductListMixin
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.contrib.sessions.models import Session
 from django.utils import timezone
 from rest_framework.permissions import AllowAny
 from farms.models import Farm
-from django.db.models import Q
-from django.contrib.postgres.search import SearchVector
+from django.db.models import FloatField, OuterRef, Subquery, Value
+from .search import decode_cursor, encode_cursor, ranked_matches
+from .fuzzy import fuzzy_matches
+from .suggest import load_suggestion_index
+from .search_cache import normalize_query, search_cache
+from .geo import farms_within, locate, nearest_farms
 
 class MyFarmView(APIView):
     def get(self, request):
@@ -35,7 +43,7 @@ class MyFarmView(APIView):
         except AttributeError:
             return Response({'detail': 'User does not have a farmer profile.'}, status=status.HTTP_404_NOT_FOUND)
         
-class FarmList(generics.ListCreateAPIView):
+class FarmList(ConditionalListMixin, generics.ListCreateAPIView):
     queryset = Farm.objects.all()
     serializer_class = FarmSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -58,175 +66,269 @@ class FarmCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         serializer.save(farmer=self.request.user)
 
-class FarmProductsView(generics.ListAPIView):
+class FarmProductsView(ProductListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
 
     def get_queryset(self):
         farm_id = self.kwargs['pk']  # Get the farm ID from the URL
         return Product.objects.filter(farm_id=farm_id)
     
+def get_rater(request, create_session=False):
+    """Identify who is rating: the signed-in user, or the anonymous session."""
+    if request.user.is_authenticated:
+        return f"user_{request.user.id}"
+    if not request.session.session_key:
+        if not create_session:
+            return None
+        request.session.create()
+    return f"anon_{request.session.session_key}"
+
+def parse_rating(value):
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if 0 <= rating <= 5 else None
+
+def with_user_rating(queryset, rater):
+    """Annotate farms with the rater's own vote via an indexed (farm, rater) subquery."""
+    if rater is None:
+        return queryset.annotate(user_rating=Value(None, output_field=FloatField()))
+    return queryset.annotate(user_rating=Subquery(
+        FarmRating.objects.filter(farm=OuterRef('pk'), rater=rater).values('rating')[:1]
+    ))
+
 class SubmitRatingView(APIView):
     def post(self, request, farm_id):
-        farm = get_object_or_404(Farm, id=farm_id)
-        rating = request.data.get('rating')
+        farm = get_object_or_404(Farm.objects.only('id'), id=farm_id)
+        rating = parse_rating(request.data.get('rating'))
 
         # Validate rating
-        if not (0 <= rating <= 5):
+        if rating is None:
             return Response(
                 {'error': 'Rating must be between 1 and 5'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get user identifier
-        if request.user.is_authenticated:
-            user_identifier = f"user_{request.user.id}"
-        else:
-            if not request.session.session_key:
-                request.session.create()
-            user_identifier = f"anon_{request.session.session_key}"
-
-        # Initialize ratings if None
-        if farm.ratings is None:
-            farm.ratings = []
-
-        # Find existing rating
-        existing_rating_index = next(
-            (i for i, r in enumerate(farm.ratings) 
-             if isinstance(r, dict) and r.get('user_identifier') == user_identifier),
-            None
-        )
+        rater = get_rater(request, create_session=True)
 
-        # Handle rating submission/removal
-        if existing_rating_index is not None:
-            # User already rated - remove their rating
-            removed_rating = farm.ratings.pop(existing_rating_index)
-            action = 'removed'
-        elif rating > 0:
-            # New rating - add it
-            farm.ratings.append({
-                'user_identifier': user_identifier,
-                'rating': rating,
-                'timestamp': timezone.now().isoformat()
-            })
-            action = 'added'
-
-        # Recalculate average
-        if farm.ratings:
-            valid_ratings = [r['rating'] for r in farm.ratings if isinstance(r, dict) and r.get('rating', 0) > 0]
-            farm.rating = sum(valid_ratings) / len(valid_ratings) if valid_ratings else 0
-            total_ratings = len(valid_ratings)
-        else:
-            farm.rating = 0
-            total_ratings = 0
+        # A second vote from the same rater toggles their rating off
+        try:
+            if FarmRating.objects.remove_rating(farm.id, rater) is not None:
+                action = 'removed'
+            elif rating > 0:
+                FarmRating.objects.set_rating(farm.id, rater, rating)
+                action = 'added'
+            else:
+                action = 'unchanged'
+        except RatingConflict:
+            return Response(
+                {'error': 'Your rating changed while saving, please try again'},
+                status=status.HTTP_409_CONFLICT
+            )
 
-        farm.save()
+        farm.refresh_from_db(fields=['rating', 'rating_count'])
 
         return Response({
             'rating': farm.rating,
-            'total_ratings': total_ratings,
+            'total_ratings': farm.rating_count,
             'action': action
         }, status=status.HTTP_200_OK)
 
 class UserRatingView(APIView):
     def get(self, request, farm_id):
-        farm = get_object_or_404(Farm, id=farm_id)
-        
-        if request.user.is_authenticated:
-            user_identifier = f"user_{request.user.id}"
-        else:
-            if not request.session.session_key:
-                return Response({'userRating': None})
-            user_identifier = f"anon_{request.session.session_key}"
-
-        user_rating = next(
-            (r for r in farm.ratings 
-             if r['user_identifier'] == user_identifier),
-            None
-        )
+        rater = get_rater(request)
+        if rater is None:
+            return Response({'userRating': None})
+
+        farm = get_object_or_404(with_user_rating(Farm.objects.only('id'), rater), id=farm_id)
         
         return Response({
-            'userRating': user_rating['rating'] if user_rating else None
+            'userRating': farm.user_rating
         }, status=status.HTTP_200_OK)
 
 class GetRatingView(APIView):
     def get(self, request, farm_id):
-        farm = get_object_or_404(Farm, id=farm_id)
-        return Response({'rating': farm.rating, 'total_ratings': len(farm.ratings)}, status=status.HTTP_200_OK)
+        farm = get_object_or_404(Farm.objects.only('rating', 'rating_count'), id=farm_id)
+        return Response({'rating': farm.rating, 'total_ratings': farm.rating_count}, status=status.HTTP_200_OK)
     
 class RatingInfoView(APIView):
     permission_classes = [AllowAny]
     
     def get(self, request, farm_id):
-        farm = get_object_or_404(Farm, id=farm_id)
-        user_rating = None
-        
-        if request.user.is_authenticated:
-            user_rating = next(
-                (r['rating'] for r in farm.ratings if r.get('user_id') == request.user.id),
-                None
-            )
+        farm = get_object_or_404(
+            with_user_rating(Farm.objects.only('rating', 'rating_count'), get_rater(request)),
+            id=farm_id
+        )
         
         return Response({
             'averageRating': farm.rating,
-            'totalRatings': len(farm.ratings),
-            'userRating': user_rating
+            'totalRatings': farm.rating_count,
+            'userRating': farm.user_rating
+        })
+
+class BatchRatingInfoView(APIView):
+    """Rating info for many farm cards at once: /api/farms/rating-info/?ids=1,2,3"""
+    permission_classes = [AllowAny]
+    max_farms = 100
+
+    def get(self, request):
+        try:
+            farm_ids = {int(farm_id) for farm_id in request.query_params.get('ids', '').split(',') if farm_id.strip()}
+        except ValueError:
+            return Response({'error': 'ids must be a comma separated list of farm ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(farm_ids) > self.max_farms:
+            return Response(
+                {'error': f'At most {self.max_farms} farms can be requested at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        farms = with_user_rating(
+            Farm.objects.filter(id__in=farm_ids).only('rating', 'rating_count'),
+            get_rater(request)
+        )
+
+        return Response({
+            farm.id: {
+                'averageRating': farm.rating,
+                'totalRatings': farm.rating_count,
+                'userRating': farm.user_rating
+            }
+            for farm in farms
         })
 
 class RateView(APIView):
     
     
     def post(self, request, farm_id):
-        farm = get_object_or_404(Farm, id=farm_id)
-        rating = request.data.get('rating')
+        farm = get_object_or_404(Farm.objects.only('id'), id=farm_id)
+        rating = parse_rating(request.data.get('rating'))
         
-        if not (0 <= rating <= 5):
+        if rating is None:
             return Response(
                 {'error': 'Rating must be between 1 and 5'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Find existing user rating
-        user_rating_index = next(
-            (i for i, r in enumerate(farm.ratings) if r.get('user_id') == request.user.id),
-            None
-        )
-        
-        if rating == 0:  # Remove rating
-            if user_rating_index is not None:
-                farm.ratings.pop(user_rating_index)
-        else:  # Add/update rating
-            rating_data = {
-                'user_id': request.user.id,
-                'rating': rating
-            }
-            
-            if user_rating_index is not None:
-                farm.ratings[user_rating_index] = rating_data
-            else:
-                farm.ratings.append(rating_data)
-        
-        # Recalculate average
-        if farm.ratings:
-            farm.rating = sum(r['rating'] for r in farm.ratings) / len(farm.ratings)
-        else:
-            farm.rating = 0
+        rater = get_rater(request, create_session=True)
+
+        try:
+            if rating == 0:  # Remove rating
+                FarmRating.objects.remove_rating(farm.id, rater)
+            else:  # Add/update rating
+                FarmRating.objects.set_rating(farm.id, rater, rating)
+        except RatingConflict:
+            return Response(
+                {'error': 'Your rating changed while saving, please try again'},
+                status=status.HTTP_409_CONFLICT
+            )
         
-        farm.save()
+        farm.refresh_from_db(fields=['rating', 'rating_count'])
         
         return Response({
             'averageRating': farm.rating,
-            'totalRatings': len(farm.ratings)
+            'totalRatings': farm.rating_count
         })
 
+class FarmsNearView(APIView):
+    """
+    Farms within ``radius_km`` of a point (default 20), or the ``k`` nearest.
+    The point is ``lat``/``lng``, or a place name in ``location``.
+    """
+    permission_classes = [permissions.AllowAny]
+    default_radius_km = 20
+    max_radius_km = 500
+    max_k = 50
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            if 'lat' in params or 'lng' in params:
+                latitude, longitude = float(params['lat']), float(params['lng'])
+                if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                    raise ValueError
+            else:
+                coordinates = locate(params.get('location', ''))
+                if coordinates is None:
+                    return Response({'error': 'Unknown location'}, status=status.HTTP_400_BAD_REQUEST)
+                latitude, longitude = coordinates
+            k = int(params['k']) if 'k' in params else None
+            radius_km = float(params.get('radius_km', self.default_radius_km))
+            if not math.isfinite(radius_km):
+                raise ValueError
+        except (KeyError, ValueError):
+            return Response({'error': 'Invalid coordinates or search size'}, status=status.HTTP_400_BAD_REQUEST)
+
+        farms = Farm.objects.select_related('farmer__farmer_profile')
+        if k is not None:
+            matches = nearest_farms(farms, latitude, longitude, min(max(k, 1), self.max_k))
+        else:
+            matches = farms_within(farms, latitude, longitude, min(max(radius_km, 0), self.max_radius_km))
+
+        results = []
+        for distance, farm in matches:
+            data = FarmSerializer(farm, context={'request': request}).data
+            data['distance_km'] = round(distance, 2)
+            results.append(data)
+        return Response(results)
+
+class SearchSuggestView(APIView):
+    permission_classes = [permissions.AllowAny]
+    default_limit = 8
+    max_limit = 20
+
+    def get(self, request):
+        try:
+            limit = min(int(request.GET.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        return Response(load_suggestion_index().suggest(request.GET.get('q', ''), max(limit, 1)))
+
+class SearchCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(search_cache.stats())
+
 class SearchView(APIView):
     permission_classes = [permissions.AllowAny]
+    default_page_size = 20
+    max_page_size = 50
 
     def get(self, request):
-        query = request.GET.get('q', '').strip()
+        query = normalize_query(request.GET.get('q', ''))
         
         if not query:
-            return Response([])
+            return Response({'results': [], 'next': None})
+
+        try:
+            page_size = min(int(request.GET.get('page_size', self.default_page_size)), self.max_page_size)
+        except ValueError:
+            page_size = self.default_page_size
+        page_size = max(page_size, 1)
+
+        # Pages continue after the last hit of the previous page (no OFFSET scans)
+        mode, after = request.GET.get('mode', 'text'), None
+        if request.GET.get('cursor'):
+            try:
+                mode, after = decode_cursor(request.GET['cursor'])
+            except ValueError:
+                return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Popular queries are served from the search cache until the catalog changes
+        cache_key = search_cache.key(q=query, mode=mode, cursor=request.GET.get('cursor'), page_size=page_size)
+        page = search_cache.get(cache_key)
+        if page is None:
+            page = self.search_page(query, mode, after, page_size)
+            search_cache.set(cache_key, page)
+
+        next_url = None
+        if page['cursor']:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', page['cursor'])
+        return Response({'results': page['results'], 'next': next_url})
+
+    def search_page(self, query, mode, after, page_size):
         def get_farm_image(farm):
             """Get image URL with proper fallbacks"""
             if farm.image:  # First try direct farm image
@@ -246,70 +348,50 @@ class SearchView(APIView):
                 return product.image.url
             return None
         
-        # Get all matches
-        exact_farms = Farm.objects.select_related('farmer__farmer_profile').filter(
-            name__iexact=query
+        # One ranked index query across farms and products, then load the hits.
+        # Misspelled queries find nothing there, so fall back to name similarity.
+        hits = [] if mode == 'fuzzy' else ranked_matches(query, page_size + 1, after)
+        if not hits and after is None:
+            mode = 'fuzzy'
+        if mode == 'fuzzy':
+            hits = fuzzy_matches(query, page_size + 1, after=after)
+
+        cursor = None
+        if len(hits) > page_size:
+            hits = hits[:page_size]
+            cursor = encode_cursor(mode, hits[-1])
+
+        farms = Farm.objects.select_related('farmer__farmer_profile').in_bulk(
+            [hit.id for hit in hits if hit.kind == 'farm']
         )
-        
-        exact_products = Product.objects.select_related('farm').filter(
-            name__iexact=query
+        products = Product.objects.select_related('farm').in_bulk(
+            [hit.id for hit in hits if hit.kind == 'product']
         )
         
-        partial_farms = Farm.objects.select_related('farmer__farmer_profile').filter(
-            Q(name__icontains=query) |
-            Q(location__icontains=query) |
-            Q(description__icontains=query) |
-            Q(about__icontains=query)
-        ).exclude(id__in=[f.id for f in exact_farms])
-        
-        partial_products = Product.objects.select_related('farm').filter(
-            Q(name__icontains=query) |
-            Q(category__icontains=query)
-        ).exclude(id__in=[p.id for p in exact_products])
-        
         # Build results
         results = []
         
-        # Process farms
-        for farm in exact_farms:
-            results.append({
-                'id': farm.id,
-                'name': farm.name,
-                'type': 'farm',
-                'image': get_farm_image(farm),
-                'match_type': 'exact',
-                'location': farm.location
-            })
-        
-        for farm in partial_farms:
-            results.append({
-                'id': farm.id,
-                'name': farm.name,
-                'type': 'farm',
-                'image': get_farm_image(farm),
-                'match_type': 'partial',
-                'location': farm.location
-            })
-        
-        # Process products
-        for product in exact_products:
-            results.append({
-                'id': product.id,
-                'name': product.name,
-                'type': 'product',
-                'image': get_product_image(product),
-                'match_type': 'exact',
-                'farm_name': product.farm.name if product.farm else None
-            })
-        
-        for product in partial_products:
-            results.append({
-                'id': product.id,
-                'name': product.name,
-                'type': 'product',
-                'image': get_product_image(product),
-                'match_type': 'partial',
-                'farm_name': product.farm.name if product.farm else None
-            })
+        for hit in hits:
+            match_type = 'fuzzy' if mode == 'fuzzy' else 'exact' if hit.exact else 'partial'
+            if hit.kind == 'farm' and hit.id in farms:
+                farm = farms[hit.id]
+                results.append({
+                    'id': farm.id,
+                    'name': farm.name,
+                    'type': 'farm',
+                    'image': get_farm_image(farm),
+                    'match_type': match_type,
+                    'location': farm.location
+                })
+            elif hit.kind == 'product' and hit.id in products:
+                product = products[hit.id]
+                results.append({
+                    'id': product.id,
+                    'name': product.name,
+                    'type': 'product',
+                    'image': get_product_image(product),
+                    'match_type': match_type,
+                    'farm_name': product.farm.name if product.farm else None
+                })
         
-        return Response(results)
\ No newline at end of file
+        return {'results': results, 'cursor': cursor}
\ No newline at end of file
@@ -0,0 +1,67 @@
+# orders/consumers.py
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.db.models import Q
+from .models import Order
+from .push import group_name
+from .serializers import TrackingUpdateSerializer
+from .tracks import track
+
+# Route points a socket starts with, see orders/tracks.py
+SNAPSHOT_RESOLUTION = 500
+
+
+class OrderTrackingConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/orders/<order_id>/tracking/ for the order's customer and farmer.
+
+    On connect the socket gets the order's status, timeline and route (see
+    orders/tracks.py), then every new TrackingUpdate and status change as
+    it is committed (see orders/push.py). Permissions are checked once,
+    when it connects.
+    """
+
+    group = None
+    accepted = False
+
+    async def connect(self):
+        order_id = int(self.scope['url_route']['kwargs']['order_id'])
+        # Joined before the snapshot is read, so nothing written in between is missed;
+        # an update can arrive twice, and clients go by its id
+        self.group = group_name(order_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        snapshot = await self.snapshot(self.scope['user'], order_id)
+        if snapshot is None:
+            # Rejects the handshake; disconnect() leaves the group
+            await self.close()
+            return
+        await self.accept()
+        self.accepted = True
+        await self.send_json(snapshot)
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def order_push(self, event):
+        if self.accepted:
+            await self.send_json(event['message'])
+
+    @database_sync_to_async
+    def snapshot(self, user, order_id):
+        """The order's status and tracking history, or None if ``user`` may not watch it."""
+        if not user.is_authenticated:
+            return None
+        order_status = (
+            Order.objects.filter(Q(customer=user) | Q(farm__farmer=user), pk=order_id)
+            .values_list('status', flat=True).first()
+        )
+        if order_status is None:
+            return None
+        updates, route = track(order_id, SNAPSHOT_RESOLUTION)
+        return {
+            'type': 'snapshot',
+            'status': order_status,
+            'updates': TrackingUpdateSerializer(updates, many=True).data,
+            'route': route,
+        }
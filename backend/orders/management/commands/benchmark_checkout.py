@@ -0,0 +1,104 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from accounts.models import User
+from farms.models import Farm
+from orders.models import Order, OrderItem, StockReservation
+from orders.stock import InsufficientStock, reservation_expiry, reserve
+from products.models import Product
+
+
+def take_stock_locking(order, product_id, quantity):
+    """The naive alternative: lock the product row, check, then write it back."""
+    StockReservation.objects.create(order=order, product_id=product_id, quantity=quantity, expires_at=reservation_expiry())
+    product = Product.objects.select_for_update().get(pk=product_id)
+    if product.quantity < quantity:
+        raise InsufficientStock(product_id)
+    product.quantity -= quantity
+    product.save(update_fields=['quantity', 'updated_at'])
+
+
+def take_stock_conditional(order, product_id, quantity):
+    reserve(order, [(product_id, quantity)])
+
+
+STRATEGIES = {'conditional': take_stock_conditional, 'locking': take_stock_locking}
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent checkouts against one hot product and report throughput and overselling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategy', choices=[*STRATEGIES, 'both'], default='both')
+        parser.add_argument('--stock', type=int, default=500)
+        parser.add_argument('--checkouts', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--quantity', type=int, default=1, help='Units per checkout')
+
+    def handle(self, *args, **options):
+        strategies = list(STRATEGIES) if options['strategy'] == 'both' else [options['strategy']]
+        tag = uuid.uuid4().hex[:8]
+        customer = User.objects.create_user(username=f'bench-{tag}', email=f'bench-{tag}@example.com')
+        farm = Farm.objects.create(name=f'Benchmark {tag}', location='Nakuru', description='Benchmark', farmer=customer)
+        try:
+            for strategy in strategies:
+                self.run(strategy, farm, customer, options)
+        finally:
+            Order.objects.filter(farm=farm).delete()
+            farm.delete()
+            customer.delete()
+
+    def run(self, strategy, farm, customer, options):
+        take_stock = STRATEGIES[strategy]
+        product = Product.objects.create(name='Hot item', farm=farm, price=Decimal('10'), quantity=options['stock'])
+        quantity = options['quantity']
+        start = threading.Barrier(options['workers'])
+
+        def checkout(i):
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    order = Order.objects.create(
+                        customer=customer, farm=farm,
+                        shipping_address='-', payment_method='bench',
+                        subtotal=product.price * quantity, shipping_cost=0, tax=0, total=product.price * quantity,
+                    )
+                    OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+                    take_stock(order, product.pk, quantity)
+                sold = True
+            except InsufficientStock:
+                sold = False
+            return sold, (time.perf_counter() - started) * 1000
+
+        def worker(chunk):
+            try:
+                connection.ensure_connection()
+                start.wait()
+                return [checkout(i) for i in chunk]
+            finally:
+                connection.close()
+
+        chunks = [range(i, options['checkouts'], options['workers']) for i in range(options['workers'])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = [result for chunk in pool.map(worker, chunks) for result in chunk]
+        elapsed = time.perf_counter() - started
+
+        sold = sum(1 for ok, _ in results if ok)
+        timings = sorted(ms for _, ms in results)
+        product.refresh_from_db()
+        self.stdout.write(
+            f"{strategy}: {len(results)} checkouts by {options['workers']} workers in {elapsed:.2f}s "
+            f"({len(results) / elapsed:.0f}/s), {sold} sold, {len(results) - sold} rejected, "
+            f"median {statistics.median(timings):.1f}ms, p95 {timings[int(len(timings) * 0.95) - 1]:.1f}ms"
+        )
+        expected_left = options['stock'] - sold * quantity
+        if product.quantity != expected_left or product.quantity < 0 or sold < min(len(results), options['stock'] // quantity):
+            raise CommandError(f'{strategy}: stock is {product.quantity} after selling {sold}, expected {expected_left}')
+        Order.objects.filter(items__product=product).delete()
+        product.delete()
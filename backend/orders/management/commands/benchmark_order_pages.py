@@ -0,0 +1,149 @@
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from accounts.models import FarmerProfile, User
+from farms.models import Farm
+from orders.models import Order
+from orders.views import FarmOrdersView, OrderListCreateView
+from products.pagination import encode_cursor
+
+FARM_NAME = 'Order page benchmark'
+STATUSES = [status for status, _ in Order.STATUS_CHOICES]
+
+
+@contextmanager
+def explicit_created_at():
+    """Let bulk_create() store the seed's own created_at instead of now()."""
+    field = Order._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Seed a farm with many orders and time order list pages at increasing cursor depths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--customers', type=int, default=10)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--max-ratio', type=float, default=3.0,
+                            help='Fail if the deepest page is this many times slower than the first')
+        parser.add_argument('--clean', action='store_true', help='Delete the seeded orders afterwards')
+
+    def handle(self, *args, **options):
+        farmer, customers, farm = self.seed(options)
+        factory = APIRequestFactory()
+        page_size = options['page_size']
+
+        lists = [
+            ('farm orders', FarmOrdersView, farmer, Order.objects.filter(farm=farm), {}),
+            ('farm orders, summary', FarmOrdersView, farmer, Order.objects.filter(farm=farm), {'view': 'summary'}),
+            ('farm orders, shipped', FarmOrdersView, farmer, Order.objects.filter(farm=farm, status='shipped'),
+             {'status': 'shipped'}),
+            ("farmer's orders, summary", OrderListCreateView, farmer, Order.objects.filter(farm=farm), {'view': 'summary'}),
+            ('customer orders', OrderListCreateView, customers[0], Order.objects.filter(customer=customers[0]), {}),
+        ]
+        try:
+            worst = 1.0
+            for label, view_class, user, queryset, params in lists:
+                view = view_class.as_view()
+                keys = queryset.order_by('-created_at', '-id').values_list('created_at', 'id')
+                total = queryset.count()
+                timings = {}
+                for depth in self.depths(total, page_size):
+                    query = {**params, 'page_size': page_size}
+                    if depth > 1:
+                        created_at, pk = keys[(depth - 1) * page_size - 1]
+                        query['cursor'] = encode_cursor('-created_at', created_at, pk)
+                    timings[depth] = self.time(lambda: self.get(factory, view, user, query), options['rounds'])
+                    # What OFFSET pagination would pay to reach the same page
+                    offset = (depth - 1) * page_size
+                    offset_ms = self.time(lambda: list(keys[offset:offset + page_size]), options['rounds'])
+                    self.stdout.write(
+                        f'{label}: page {depth} of {-(-total // page_size)}: {timings[depth]:.1f}ms '
+                        f'(OFFSET {offset}: {offset_ms:.1f}ms)'
+                    )
+                worst = max(worst, timings[max(timings)] / timings[1])
+        finally:
+            if options['clean']:
+                Order.objects.filter(farm=farm).delete()
+                farm.delete()
+                User.objects.filter(pk__in=[farmer.pk, *(customer.pk for customer in customers)]).delete()
+
+        if worst > options['max_ratio']:
+            raise CommandError(f"The deepest page is {worst:.1f}x slower than the first (limit {options['max_ratio']}x)")
+        self.stdout.write(self.style.SUCCESS(f'Page latency is flat: deepest page within {worst:.1f}x of the first'))
+
+    def seed(self, options):
+        """The benchmark farm, its farmer and customers, topped up to --orders orders."""
+        farmer, _ = User.objects.get_or_create(
+            username='order-bench-farmer', defaults={'email': 'order-bench-farmer@example.com', 'user_type': 'farmer'},
+        )
+        farm, _ = Farm.objects.get_or_create(
+            name=FARM_NAME, farmer=farmer, defaults={'location': 'Nakuru', 'description': 'Benchmark'},
+        )
+        FarmerProfile.objects.get_or_create(user=farmer, defaults={'location': 'Nakuru', 'specialty': '-', 'farm': farm})
+        customers = [
+            User.objects.get_or_create(username=f'order-bench-{i}', defaults={'email': f'order-bench-{i}@example.com'})[0]
+            for i in range(options['customers'])
+        ]
+
+        existing = Order.objects.filter(farm=farm).count()
+        wanted = options['orders']
+        if existing >= wanted:
+            self.stdout.write(f'Reusing {existing} seeded orders')
+            return farmer, customers, farm
+
+        # A year of orders, oldest first, cycling through customers and statuses
+        started = time.perf_counter()
+        now = timezone.now()
+        step = timedelta(days=365) / wanted
+        with explicit_created_at():
+            for start in range(existing, wanted, options['batch_size']):
+                Order.objects.bulk_create(
+                    Order(
+                        order_number=f'BENCH-{farm.pk}-{i}', customer=customers[i % len(customers)], farm=farm,
+                        status=STATUSES[i % len(STATUSES)], created_at=now - step * (wanted - i),
+                        shipping_address='-', payment_method='bench', subtotal=Decimal('10'),
+                        shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('10'),
+                    )
+                    for i in range(start, min(start + options['batch_size'], wanted))
+                )
+        self.stdout.write(f'Seeded {wanted - existing} orders in {time.perf_counter() - started:.1f}s')
+        return farmer, customers, farm
+
+    def depths(self, total, page_size):
+        """Page 1, then every power of ten up to the last page."""
+        last = -(-total // page_size)
+        depth, depths = 10, [1]
+        while depth < last:
+            depths.append(depth)
+            depth *= 10
+        return depths + ([last] if last > 1 else [])
+
+    def get(self, factory, view, user, query):
+        request = factory.get('/api/orders/', query, HTTP_HOST='localhost')
+        force_authenticate(request, user)
+        response = view(request)
+        response.render()
+        if response.status_code != 200:
+            raise CommandError(f'{response.status_code}: {response.content[:200]}')
+
+    def time(self, call, rounds):
+        """Median wall time of ``call`` in milliseconds."""
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,108 @@
+import asyncio
+import resource
+import statistics
+import time
+import uuid
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import User
+from agriconnect.asgi import application
+from farms.models import Farm
+from orders import push
+from orders.models import Order, TrackingUpdate
+from orders.numbers import bulk_create_with_numbers
+
+ORIGIN = [(b'origin', b'http://localhost:5173')]
+
+
+def rss_kb():
+    """Peak resident memory of this process, in KB (Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = 'Hold many order tracking sockets in one process and time pushing updates to all of them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=100, help='Orders the subscribers are spread over')
+        parser.add_argument('--rounds', type=int, default=5, help='Updates pushed to every order')
+        parser.add_argument('--connect-batch', type=int, default=500, help='Sockets opened at once')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for a message')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        customer = User.objects.create_user(username=f'socket-bench-{tag}', email=f'socket-bench-{tag}@example.com')
+        farm = Farm.objects.create(name=f'Socket benchmark {tag}', location='Nakuru', description='Benchmark', farmer=customer)
+        with transaction.atomic():
+            orders = bulk_create_with_numbers([
+                Order(
+                    customer=customer, farm=farm, shipping_address='-', payment_method='bench',
+                    subtotal=Decimal('10'), shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('10'),
+                )
+                for _ in range(options['orders'])
+            ])
+        try:
+            async_to_sync(self.run)(customer, [order.pk for order in orders], options)
+        finally:
+            Order.objects.filter(farm=farm).delete()
+            farm.delete()
+            customer.delete()
+
+    async def run(self, user, order_ids, options):
+        token = str(AccessToken.for_user(user))
+        sockets = [
+            WebsocketCommunicator(application, f'/ws/orders/{order_ids[i % len(order_ids)]}/tracking/?token={token}',
+                                  headers=ORIGIN)
+            for i in range(options['subscribers'])
+        ]
+        timeout = options['timeout']
+
+        async def subscribe(socket):
+            connected, _ = await socket.connect(timeout=timeout)
+            if not connected:
+                raise CommandError('A subscriber was turned away')
+            await socket.receive_json_from(timeout=timeout)
+
+        memory_before = rss_kb()
+        started = time.perf_counter()
+        batch = options['connect_batch']
+        for start in range(0, len(sockets), batch):
+            await asyncio.gather(*(subscribe(socket) for socket in sockets[start:start + batch]))
+        connect_time = time.perf_counter() - started
+        per_socket = (rss_kb() - memory_before) / len(sockets)
+        self.stdout.write(
+            f'{len(sockets)} subscribers on {len(order_ids)} orders connected in {connect_time:.2f}s '
+            f'({len(sockets) / connect_time:.0f}/s), ~{per_socket:.1f} KB each'
+        )
+
+        try:
+            timings = []
+            for round_number in range(options['rounds']):
+                await database_sync_to_async(self.write_updates)(user, order_ids, round_number)
+                started = time.perf_counter()
+                # Pushes go out on commit, so the clock starts when the write returns
+                await asyncio.gather(*(socket.receive_json_from(timeout=timeout) for socket in sockets))
+                timings.append((time.perf_counter() - started) * 1000)
+            fan_out = statistics.median(timings)
+            self.stdout.write(
+                f'An update to each of {len(order_ids)} orders reached all {len(sockets)} subscribers in '
+                f'{fan_out:.0f}ms median, {max(timings):.0f}ms worst ({len(sockets) / fan_out * 1000:.0f} messages/s)'
+            )
+            self.stdout.write('In process, without a server: socket buffers and network time are not counted')
+        finally:
+            await asyncio.gather(*(socket.disconnect() for socket in sockets))
+
+    def write_updates(self, user, order_ids, round_number):
+        """One TrackingUpdate per order, pushed once committed, as TrackingUpdateView does."""
+        with transaction.atomic():
+            updates = TrackingUpdate.objects.bulk_create(
+                TrackingUpdate(order_id=pk, status='pending', notes=f'Round {round_number}', updated_by=user)
+                for pk in order_ids
+            )
+            push.push(push.tracking_messages(updates))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from orders.tracks import compact_tracks
+
+
+class Command(BaseCommand):
+    help = "Fold old GPS pings into their orders' simplified routes and delete them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Orders per transaction')
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep compacting every this many seconds instead of once (e.g. as a worker process)')
+
+    def handle(self, *args, **options):
+        while True:
+            compacted = compact_tracks(batch_size=options['batch_size'])
+            self.stdout.write(f'Compacted {compacted} GPS pings into routes')
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from orders.stock import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Cancel pending orders whose stock reservations expired and give the stock back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep sweeping every this many seconds instead of once (e.g. as a worker process)')
+
+    def handle(self, *args, **options):
+        while True:
+            cancelled = release_expired(batch_size=options['batch_size'])
+            self.stdout.write(f'Released stock for {cancelled} expired orders')
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_number_block'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackingRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('polyline', models.TextField()),
+                ('points', models.PositiveIntegerField()),
+                ('pings', models.PositiveIntegerField()),
+                ('ends_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='trackingupdate',
+            index=models.Index(fields=['order', 'timestamp'], name='tracking_order_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='trackingroute',
+            name='order',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='route', to='orders.order'),
+        ),
+    ]
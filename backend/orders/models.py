@@ -1,9 +1,8 @@
 from django.db import models
 from django.conf import settings
-from django.utils import timezone
-import uuid
 from products.models import Product
 from farms.models import Farm
+from .numbers import next_order_number, save_with_number
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -14,6 +13,15 @@ class Order(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    # The statuses each status may move to, see orders/transitions.py
+    TRANSITIONS = {
+        'pending': {'processing', 'verified', 'cancelled'},
+        'processing': {'verified', 'shipped', 'cancelled'},
+        'verified': {'processing', 'shipped', 'cancelled'},
+        'shipped': {'completed'},
+        'completed': set(),
+        'cancelled': set(),
+    }
     
     customer = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -37,13 +45,28 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     verified_at = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        # Cursor pagination keys for order lists (see orders/views.py): a farm's
+        # orders, with or without the status filter, and a customer's orders
+        indexes = [
+            models.Index(fields=['farm', 'status', 'created_at', 'id'], name='order_farm_status_idx'),
+            models.Index(fields=['farm', 'created_at', 'id'], name='order_farm_created_idx'),
+            models.Index(fields=['customer', 'created_at', 'id'], name='order_customer_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.order_number}"
     
+    @staticmethod
+    def new_order_number():
+        """The next number from this process's block, see orders/numbers.py."""
+        return next_order_number()
+    
     def save(self, *args, **kwargs):
-        if not self.order_number:
-            self.order_number = f"ORD-{timezone.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:6].upper()}"
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # Numbers new orders, retrying if an allocated number is already taken
+        save_with_number(self, lambda: super(Order, self).save(*args, **kwargs))
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -74,6 +97,53 @@ class TrackingUpdate(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # An order's updates in time order, and those since its route's end
+            models.Index(fields=['order', 'timestamp'], name='tracking_order_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tracking update for {self.order} at {self.timestamp}"
+
+class TrackingRoute(models.Model):
+    """
+    An order's GPS pings up to ``ends_at``, simplified and stored as an
+    encoded polyline, see orders/tracks.py.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='route')
+    polyline = models.TextField()
+    points = models.PositiveIntegerField()
+    # Pings folded into it, before simplifying
+    pings = models.PositiveIntegerField()
+    ends_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Route of order {self.order_id}: {self.points} points"
+
+class StockReservation(models.Model):
+    """
+    Stock taken off Product.quantity for a pending order, see orders/stock.py.
+    Deleted when the order moves on (the stock is sold) or given back when
+    the order is cancelled or the reservation expires.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('order', 'product')
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held for order {self.order_id}"
+
+class OrderNumberBlock(models.Model):
+    """
+    The highest order number handed out so far on a day. Processes take
+    blocks of numbers from it, see orders/numbers.py.
+    """
+    day = models.DateField(unique=True)
+    last = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return f"Tracking update for {self.order} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.day}: {self.last}"
@@ -0,0 +1,145 @@
+# orders/numbers.py
+"""
+Order numbers: ``ORD-YYYYMMDD-NNNNNN``, sequential within each day.
+
+Each process takes a block of ORDER_NUMBER_BLOCK_SIZE numbers at a time
+by adding to the day's OrderNumberBlock row, in one upsert. It then hands
+them out from memory, so placing an order costs no extra round trip and
+no two processes share a number. Threads share their process's block. A
+forked worker drops the block it inherited, since its parent keeps using
+it.
+
+Order creation draws its numbers before opening its transaction, so a
+block is committed, and the day's row unlocked, as soon as it is taken. A
+block taken inside a transaction that rolls back (a checkout short of
+stock) would be handed out again. For that, when an allocated number
+collides on the unique order_number, the rest of its block is dropped and
+the insert is retried with a number from a new block (see
+save_with_number() and bulk_create_with_numbers()).
+"""
+import os
+import re
+import threading
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+# Tries before a collision is raised as an IntegrityError after all
+ATTEMPTS = 3
+NUMBER_PATTERN = re.compile(r'ORD-\d{8}-\d{6,}')
+
+
+def format_number(day, number):
+    return f'ORD-{day:%Y%m%d}-{number:06d}'
+
+
+def allocate_block(day, size):
+    """Take the next ``size`` numbers of ``day`` with one upsert. Returns (first, last)."""
+    from .models import OrderNumberBlock
+
+    table, day_column, last = map(connection.ops.quote_name, (OrderNumberBlock._meta.db_table, 'day', 'last'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({day_column}, {last}) VALUES (%s, %s) '
+            f'ON CONFLICT ({day_column}) DO UPDATE SET {last} = {table}.{last} + excluded.{last} RETURNING {last}',
+            [day, size],
+        )
+        taken = cursor.fetchone()[0]
+    return taken - size + 1, taken
+
+
+class OrderNumberAllocator:
+    """
+    This process's block. The lock only guards the in-memory counters: it is
+    never held across a query, as a thread waiting on the database while
+    holding it could wait on a transaction whose thread waits on the lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.day = None
+        self.next = self.last = 0
+        # Blocks taken and dropped, for benchmarks
+        self.blocks = self.discards = 0
+
+    def discard(self):
+        """Drop the rest of the current block, e.g. after one of its numbers collided."""
+        with self.lock:
+            self.next = self.last + 1
+            self.discards += 1
+
+    def next_number(self):
+        today = timezone.now().date()
+        with self.lock:
+            if today == self.day and self.next <= self.last:
+                number = self.next
+                self.next += 1
+                return format_number(today, number)
+
+        first, last = allocate_block(today, settings.ORDER_NUMBER_BLOCK_SIZE)
+        with self.lock:
+            # If another thread took a block meanwhile, the rest of that one is skipped
+            self.day, self.next, self.last = today, first + 1, last
+            self.blocks += 1
+        return format_number(today, first)
+
+
+allocator = OrderNumberAllocator()
+os.register_at_fork(after_in_child=allocator.reset)
+
+
+def next_order_number():
+    return allocator.next_number()
+
+
+def is_allocated(order_number):
+    """Whether ``order_number`` came from the allocator, so it may be swapped for a fresh one."""
+    return bool(NUMBER_PATTERN.fullmatch(order_number or ''))
+
+
+def save_with_number(order, save):
+    """
+    Run ``save()`` for a new order, numbering it first if it has no number.
+    If an allocated number collides with an existing order, the rest of its
+    block is dropped and the save is retried with a number from a new block.
+    """
+    from .models import Order
+
+    if not order.order_number:
+        order.order_number = next_order_number()
+    for attempt in range(ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            if (attempt == ATTEMPTS - 1 or not is_allocated(order.order_number)
+                    or not Order.objects.filter(order_number=order.order_number).exists()):
+                raise
+            allocator.discard()
+            order.order_number = next_order_number()
+
+
+def bulk_create_with_numbers(orders):
+    """bulk_create() new ``orders``, renumbering and retrying the allocated numbers that collide."""
+    from .models import Order
+
+    for order in orders:
+        if not order.order_number:
+            order.order_number = next_order_number()
+    for attempt in range(ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return Order.objects.bulk_create(orders)
+        except IntegrityError:
+            taken = set(Order.objects.filter(
+                order_number__in=[order.order_number for order in orders if is_allocated(order.order_number)],
+            ).values_list('order_number', flat=True))
+            if attempt == ATTEMPTS - 1 or not taken:
+                raise
+            allocator.discard()
+            for order in orders:
+                if order.order_number in taken:
+                    order.order_number = next_order_number()
@@ -0,0 +1,48 @@
+# orders/push.py
+"""
+Pushes order changes to the customers and farmers watching them over
+WebSockets (see orders/consumers.py), instead of their polling the
+tracking list.
+
+Every order has a channel layer group. A push is sent only once the
+transaction writing the change commits, so subscribers never see a
+change that rolls back. All of a commit's messages go out in one trip
+to the channel layer, however many orders it touched.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def group_name(order_id):
+    return f'order-tracking-{order_id}'
+
+
+def tracking_messages(updates):
+    """``(order_id, message)`` for each new TrackingUpdate, serialized in one pass."""
+    from .serializers import TrackingUpdateSerializer
+
+    data = TrackingUpdateSerializer(updates, many=True).data
+    return [
+        (update.order_id, {'type': 'tracking', 'status': update.status, 'update': dict(row)})
+        for update, row in zip(updates, data)
+    ]
+
+
+def status_message(order_status):
+    """The message for a status change without a tracking update, e.g. a swept order."""
+    return {'type': 'status', 'status': order_status}
+
+
+async def send_all(layer, messages):
+    for order_id, message in messages:
+        await layer.group_send(group_name(order_id), {'type': 'order.push', 'message': message})
+
+
+def push(messages):
+    """Send ``(order_id, message)`` pairs to each order's subscribers once the current transaction commits."""
+    messages = list(messages)
+    layer = get_channel_layer()
+    if layer is None or not messages:
+        return
+    transaction.on_commit(lambda: async_to_sync(send_all)(layer, messages))
@@ -0,0 +1,7 @@
+# orders/routing.py
+from django.urls import path
+from .consumers import OrderTrackingConsumer
+
+websocket_urlpatterns = [
+    path('ws/orders/<int:order_id>/tracking/', OrderTrackingConsumer.as_asgi()),
+]
@@ -6,6 +6,11 @@ from products.serializers import ProductSerializer
 from farms.serializers import FarmSerializer
 from farms.models import Farm
 from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from .numbers import bulk_create_with_numbers
+from .stock import reserve, reserve_orders
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -46,8 +51,93 @@ class OrderSerializer(serializers.ModelSerializer):
             'subtotal', 'shipping_cost', 'tax', 'total', 'status'
         ]
 
+    # Everything the nested serializers read: the customer's and the farmer's
+    # profiles, and each item's product and its farm
+    @classmethod
+    def plan(cls, queryset):
+        return queryset.select_related(
+            'customer__farmer_profile', 'farm__farmer__farmer_profile',
+        ).prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product__farm').order_by('id')),
+        )
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order lists without the nested items, products and profiles: one query per page."""
+    customer = serializers.SerializerMethodField()
+    farm = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'customer', 'farm', 'status', 'created_at',
+            'updated_at', 'verified_at', 'shipping_address', 'payment_method',
+            'total', 'item_count'
+        ]
+        read_only_fields = fields
+
+    @classmethod
+    def plan(cls, queryset):
+        return queryset.select_related('customer', 'farm').only(
+            *(field for field in cls.Meta.fields if field not in ('customer', 'farm', 'item_count')),
+            'customer__id', 'customer__first_name', 'customer__last_name', 'customer__email',
+            'farm__id', 'farm__name',
+        ).annotate(item_count=Coalesce(Subquery(
+            # Counted per order on the page, not by grouping every order before paginating
+            OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order').annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ), 0))
+
+    def get_customer(self, obj):
+        customer = obj.customer
+        return {'id': customer.id, 'first_name': customer.first_name, 'last_name': customer.last_name, 'email': customer.email}
+
+    def get_farm(self, obj):
+        return {'id': obj.farm.id, 'name': obj.farm.name}
+
+class OrderLineSerializer(serializers.Serializer):
+    """A cart line as posted; products are looked up for the whole cart at once."""
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+def cart_lines(items):
+    """
+    Validated cart lines as ``{'product', 'quantity'}`` dicts, one per
+    product, with every product loaded in a single query.
+    """
+    if not items:
+        raise serializers.ValidationError("At least one item is required")
+    
+    quantities = {}
+    for item in items:
+        quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    products = Product.objects.only('id', 'farm_id', 'price').in_bulk(quantities)
+    
+    if len(products) != len(quantities):
+        raise serializers.ValidationError("Some products don't exist")
+    
+    return [
+        {'product': products[product_id], 'quantity': quantity}
+        for product_id, quantity in quantities.items()
+    ]
+
+
+def order_totals(lines):
+    """subtotal, shipping_cost, tax and total for one farm's order."""
+    subtotal = sum(
+        line['quantity'] * line['product'].price
+        for line in lines
+    )
+    shipping_cost = Decimal('5.99')
+    tax_rate = Decimal('0.08')
+    tax = subtotal * tax_rate
+    return {'subtotal': subtotal, 'shipping_cost': shipping_cost, 'tax': tax, 'total': subtotal + shipping_cost + tax}
+
+
 class CreateOrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True, required=True)
+    items = OrderLineSerializer(many=True, required=True, write_only=True)
     farm_id = serializers.PrimaryKeyRelatedField(
         queryset=Farm.objects.all(),
         source='farm',
@@ -67,54 +157,106 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         if not farm:
             raise serializers.ValidationError("Farm is required")
         
-        if not items:
-            raise serializers.ValidationError("At least one item is required")
-        
-        product_ids = [item.get('product').id for item in items if item.get('product')]
-        products = Product.objects.filter(id__in=product_ids)
-        
-        if products.count() != len(product_ids):
-            raise serializers.ValidationError("Some products don't exist")
-        
-        for product in products:
-            if product.farm != farm:
+        lines = cart_lines(items)
+        for line in lines:
+            if line['product'].farm_id != farm.id:
                 raise serializers.ValidationError(
-                    f"Product {product.id} doesn't belong to farm {farm.id}"
+                    f"Product {line['product'].id} doesn't belong to farm {farm.id}"
                 )
         
+        data['items'] = lines
         return data
     
     def create(self, validated_data):
         request = self.context.get('request')
         items_data = validated_data.pop('items')
         
-        subtotal = sum(
-            Decimal(str(item['quantity'])) * Decimal(str(item['product'].price))
-            for item in items_data
-        )
-        shipping_cost = Decimal('5.99')
-        tax_rate = Decimal('0.08')
-        tax = subtotal * tax_rate
-        total = subtotal + shipping_cost + tax
-        
-        order = Order.objects.create(
+        # Numbered before the transaction, so a rollback can't undo taking a block
+        order = Order(
             customer=request.user,
-            subtotal=subtotal,
-            shipping_cost=shipping_cost,
-            tax=tax,
-            total=total,
+            order_number=Order.new_order_number(),
+            **order_totals(items_data),
             **validated_data
         )
         
-        for item_data in items_data:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data['product'],
-                quantity=item_data['quantity'],
-                price=item_data['product'].price
+        with transaction.atomic():
+            order.save()
+
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item['product'],
+                    quantity=item['quantity'],
+                    price=item['product'].price
+                )
+                for item in items_data
+            ])
+
+            # Last, so the product rows are only locked until the commit
+            reserve(order, [(item['product'].id, item['quantity']) for item in items_data])
+
+        return order
+    
+class CartCheckoutSerializer(serializers.Serializer):
+    """
+    A cart with products from any number of farms, placed as one order per
+    farm. The orders, their items and the stock reservations are each
+    written with one bulk insert, in a single transaction.
+    """
+    shipping_address = serializers.CharField()
+    payment_method = serializers.CharField(max_length=100)
+    items = OrderLineSerializer(many=True, required=True)
+    
+    def validate_items(self, items):
+        return cart_lines(items)
+    
+    def create(self, validated_data):
+        request = self.context.get('request')
+        by_farm = {}
+        for line in validated_data['items']:
+            by_farm.setdefault(line['product'].farm_id, []).append(line)
+        
+        orders = [
+            Order(
+                customer=request.user,
+                farm_id=farm_id,
+                order_number=Order.new_order_number(),
+                shipping_address=validated_data['shipping_address'],
+                payment_method=validated_data['payment_method'],
+                **order_totals(lines)
             )
+            for farm_id, lines in sorted(by_farm.items())
+        ]
         
-        return order
+        with transaction.atomic():
+            bulk_create_with_numbers(orders)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=line['product'],
+                    quantity=line['quantity'],
+                    price=line['product'].price
+                )
+                for order in orders
+                for line in by_farm[order.farm_id]
+            ])
+            # Last, so the product rows are only locked until the commit
+            reserve_orders([
+                (order, [(line['product'].id, line['quantity']) for line in by_farm[order.farm_id]])
+                for order in orders
+            ])
+        
+        return orders
+    
+class BulkStatusSerializer(serializers.Serializer):
+    """Orders to move to one status, see orders/transitions.py."""
+    order_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    location = serializers.CharField(max_length=255, required=False)
+    notes = serializers.CharField(required=False)
+    
+    def validate_order_ids(self, order_ids):
+        return list(dict.fromkeys(order_ids))
     
 class TrackingUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,131 @@
+# orders/stock.py
+"""
+Stock reservations for order placement.
+
+A checkout takes stock for the whole cart, every farm's order in it, with
+one conditional UPDATE: ``quantity = quantity - n WHERE quantity >= n``,
+with n picked per product by a CASE. If the statement doesn't update
+every product in the cart, one of them is out of stock, and the cart rolls
+back. The statement's subquery locks the cart's rows in product id order
+(``ORDER BY id FOR UPDATE``), so two carts sharing products always lock
+them in the same order and can't deadlock. The UPDATE is the last
+statement before the commit, so the rows stay locked for as short a time
+as possible.
+
+The stock taken is recorded as StockReservation rows that expire. Moving
+the order on (paid, processing, ...) confirms them: the rows go and the
+stock stays sold. Cancelling the order releases them. The sweep
+(release_expired(), run by ``manage.py release_reservations``) cancels
+pending orders whose reservations ran out and gives their stock back,
+telling any sockets watching those orders (see orders/push.py).
+"""
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.utils import timezone
+from products.models import Product
+from . import push
+from .models import Order, StockReservation
+
+
+class InsufficientStock(Exception):
+    """A cart line asks for more than the product has left."""
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+        super().__init__(f'Not enough stock for product {product_id}' if product_id else 'Not enough stock')
+
+
+def reservation_expiry(now=None):
+    return (now or timezone.now()) + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+
+
+def reserve(order, lines, now=None):
+    """
+    Take stock for ``lines`` (product id, quantity) pairs and record it as
+    reserved for ``order``. Raises InsufficientStock, with nothing taken,
+    if any product is short.
+    """
+    reserve_orders([(order, lines)], now)
+
+
+def reserve_orders(carts, now=None):
+    """
+    reserve() for several (order, lines) pairs at once, as a multi-farm
+    checkout places them: one statement takes the stock for all of them.
+    """
+    now = now or timezone.now()
+    held = {}
+    wanted = Counter()
+    for order, lines in carts:
+        for product_id, quantity in lines:
+            held[order.pk, product_id] = held.get((order.pk, product_id), 0) + quantity
+            wanted[product_id] += quantity
+    needed = Case(
+        *(When(pk=product_id, then=Value(float(quantity))) for product_id, quantity in wanted.items()),
+        output_field=FloatField(),
+    )
+
+    try:
+        with transaction.atomic():
+            StockReservation.objects.bulk_create([
+                StockReservation(order_id=order_id, product_id=product_id, quantity=quantity, expires_at=reservation_expiry(now))
+                for (order_id, product_id), quantity in held.items()
+            ])
+            locked = Product.objects.filter(pk__in=wanted).order_by('pk').select_for_update().values('pk')
+            taken = Product.objects.filter(pk__in=locked, quantity__gte=needed).update(
+                quantity=F('quantity') - needed, updated_at=now,
+            )
+            if taken != len(wanted):
+                raise InsufficientStock(None)
+    except InsufficientStock:
+        # Rolled back; now find which product was short, for the error
+        left = dict(Product.objects.filter(pk__in=wanted).values_list('pk', 'quantity'))
+        raise InsufficientStock(next(
+            (product_id for product_id, quantity in sorted(wanted.items()) if left.get(product_id, 0) < quantity),
+            None,
+        )) from None
+
+
+def confirm(order_ids):
+    """The orders' reserved stock is sold: drop the reservations, keep the stock taken."""
+    StockReservation.objects.filter(order_id__in=order_ids).delete()
+
+
+def release(order_ids, now=None):
+    """Give the orders' reserved stock back to their products."""
+    now = now or timezone.now()
+    reservations = StockReservation.objects.filter(order_id__in=order_ids)
+    with transaction.atomic():
+        totals = reservations.values('product_id').annotate(total=Sum('quantity')).order_by('product_id')
+        for row in totals:
+            Product.objects.filter(pk=row['product_id']).update(
+                quantity=F('quantity') + row['total'], updated_at=now,
+            )
+        reservations.delete()
+
+
+def release_expired(now=None, batch_size=500):
+    """
+    Cancel pending orders whose reservations have expired and release their
+    stock, a batch per transaction. Orders another sweep holds are skipped.
+    Returns the number of orders cancelled.
+    """
+    now = now or timezone.now()
+    cancelled = 0
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.filter(expires_at__lte=now).values('order_id')
+            order_ids = list(
+                Order.objects.filter(status='pending', pk__in=expired)
+                .order_by('pk').select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                return cancelled
+            Order.objects.filter(pk__in=order_ids).update(status='cancelled', updated_at=now)
+            release(order_ids, now)
+            push.push((order_id, push.status_message('cancelled')) for order_id in order_ids)
+        cancelled += len(order_ids)
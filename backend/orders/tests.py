@@ -1,3 +1,648 @@
-from django.test import TestCase
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from datetime import datetime, timedelta
+from decimal import Decimal
+import numpy as np
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import FarmerProfile, User
+from farms.models import Farm
+from products.models import Product
+from agriconnect.asgi import application
+from .models import Order, OrderItem, OrderNumberBlock, StockReservation, TrackingRoute, TrackingUpdate
+from .numbers import allocator, bulk_create_with_numbers, format_number, next_order_number
+from .stock import release_expired, reserve
+from .tracks import compact_tracks, decode_polyline, encode_polyline, simplify
+from .transitions import transition
 
-# Create your tests here.
+
+class FarmTestMixin:
+    """
+    Creates self.farmer, who owns self.farm ('Green Acres' in Nakuru), and
+    a buyer, self.customer, before each test. ``farmer_profile`` adds the
+    FarmerProfile linking farmer and farm; ``customer_fields`` are passed
+    on to the buyer.
+    """
+    farmer_profile = False
+    customer_fields = {}
+
+    def setUp(self):
+        super().setUp()
+        self.farmer = User.objects.create_user(username='farmer', email='farmer@example.com', password='pass12345', user_type='farmer')
+        self.farm = Farm.objects.create(name='Green Acres', location='Nakuru', description='Mixed farm', farmer=self.farmer)
+        if self.farmer_profile:
+            FarmerProfile.objects.create(user=self.farmer, location='Nakuru', specialty='Mixed', farm=self.farm)
+        self.customer = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass12345', **self.customer_fields,
+        )
+
+
+class StockReservationTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.milk = Product.objects.create(name='Milk', farm=self.farm, price=Decimal('50'), quantity=10)
+        self.eggs = Product.objects.create(name='Eggs', farm=self.farm, price=Decimal('15'), quantity=3)
+        self.client = APIClient()
+
+    def place(self, *lines):
+        self.client.force_authenticate(self.customer)
+        return self.client.post('/api/orders/', {
+            'farm_id': self.farm.id, 'shipping_address': 'Nakuru', 'payment_method': 'mpesa',
+            'items': [{'product_id': product.id, 'quantity': quantity} for product, quantity in lines],
+        }, format='json')
+
+    def stock(self):
+        return list(Product.objects.order_by('id').values_list('quantity', flat=True))
+
+    def test_checkout_reserves_the_whole_cart_or_nothing(self):
+        response = self.place((self.milk, 4), (self.eggs, 2))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.stock(), [6, 1])
+        reservations = StockReservation.objects.filter(order_id=response.data['id'])
+        self.assertEqual(sorted(reservations.values_list('product_id', 'quantity')), [(self.milk.id, 4), (self.eggs.id, 2)])
+        self.assertTrue(all(r.expires_at > timezone.now() for r in reservations))
+
+        # Eggs are short, so the milk isn't taken either and no order is left behind
+        response = self.place((self.milk, 1), (self.eggs, 2))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['product_id'], self.eggs.id)
+        self.assertEqual(self.stock(), [6, 1])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_status_changes_confirm_or_release_stock(self):
+        sold = self.place((self.milk, 4)).data['id']
+        cancelled = self.place((self.milk, 3)).data['id']
+        self.client.force_authenticate(self.farmer)
+
+        self.client.get(f'/api/orders/{sold}/verify-payment/')
+        self.assertFalse(StockReservation.objects.filter(order_id=sold).exists())
+        self.client.patch(f'/api/orders/{cancelled}/status/', {'status': 'cancelled'}, format='json')
+        self.assertFalse(StockReservation.objects.filter(order_id=cancelled).exists())
+        self.assertEqual(self.stock(), [6, 3])
+
+    def test_sweep_cancels_expired_orders_and_returns_their_stock(self):
+        expired = self.place((self.milk, 4), (self.eggs, 3)).data['id']
+        current = self.place((self.milk, 2)).data['id']
+        StockReservation.objects.filter(order_id=expired).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        call_command('release_reservations', stdout=io.StringIO())
+        self.assertEqual(self.stock(), [8, 3])
+        self.assertEqual(Order.objects.get(id=expired).status, 'cancelled')
+        self.assertEqual(Order.objects.get(id=current).status, 'pending')
+        self.assertEqual(release_expired(), 0)
+
+        # Its stock is gone, so the late payment can't be verified
+        self.client.force_authenticate(self.farmer)
+        self.assertEqual(self.client.get(f'/api/orders/{expired}/verify-payment/').status_code, 409)
+
+
+class OrderCreationTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Product.objects.bulk_create(
+            Product(name=f'Item {i}', farm=self.farm, price=Decimal('2.50') + i, quantity=100) for i in range(50)
+        )
+        self.products = list(Product.objects.order_by('id'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def place(self, lines):
+        return self.client.post('/api/orders/', {
+            'farm_id': self.farm.id, 'shipping_address': 'Nakuru', 'payment_method': 'mpesa',
+            'items': [{'product_id': product.id, 'quantity': quantity} for product, quantity in lines],
+        }, format='json')
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        with CaptureQueriesContext(connection) as one_line:
+            self.assertEqual(self.place([(self.products[0], 1)]).status_code, 201)
+        with self.assertNumQueries(len(one_line)):
+            response = self.place([(product, 2) for product in self.products])
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(id=response.data['id'])
+        self.assertEqual(order.items.count(), 50)
+        self.assertEqual(order.subtotal, sum((product.price * 2 for product in self.products), Decimal('0')))
+        self.assertEqual(order.total, order.subtotal + order.shipping_cost + order.tax)
+
+    def test_repeated_products_are_merged_and_foreign_products_rejected(self):
+        response = self.place([(self.products[0], 1), (self.products[1], 1), (self.products[0], 2)])
+        self.assertEqual(response.status_code, 201)
+        items = Order.objects.get(id=response.data['id']).items.order_by('product_id')
+        self.assertEqual([item.quantity for item in items], [3, 1])
+
+        other_farm = Farm.objects.create(name='Other', location='Kiambu', description='Farm', farmer=self.customer)
+        foreign = Product.objects.create(name='Foreign', farm=other_farm, price=Decimal('1'), quantity=5)
+        self.assertEqual(self.place([(self.products[0], 1), (foreign, 1)]).status_code, 400)
+        self.assertEqual(self.place([(self.products[0], 0)]).status_code, 400)
+
+
+class CartCheckoutTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.farms = [self.farm] + [
+            Farm.objects.create(name=f'Farm {i}', location='Nakuru', description='Mixed farm', farmer=self.farmer) for i in range(4)
+        ]
+        self.products = [
+            Product.objects.create(name=f'Item {i}', farm=farm, price=Decimal('10') + i, quantity=20)
+            for farm in self.farms for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def checkout(self, lines):
+        return self.client.post('/api/orders/checkout/', {
+            'shipping_address': 'Nakuru', 'payment_method': 'mpesa',
+            'items': [{'product_id': product.id, 'quantity': quantity} for product, quantity in lines],
+        }, format='json')
+
+    def test_cart_is_split_into_one_order_per_farm(self):
+        response = self.checkout([(product, 2) for product in self.products[:9]])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([order['farm_id'] for order in response.data['orders']], [farm.id for farm in self.farms[:3]])
+        self.assertEqual(len({order['order_number'] for order in response.data['orders']}), 3)
+
+        orders = Order.objects.filter(id__in=[order['id'] for order in response.data['orders']])
+        for order in orders:
+            self.assertEqual({item.product.farm_id for item in order.items.all()}, {order.farm_id})
+            self.assertEqual(order.subtotal, Decimal('66'))
+            self.assertEqual(order.total, order.subtotal + order.shipping_cost + order.tax)
+            self.assertEqual(order.stock_reservations.count(), 3)
+        self.assertEqual(Decimal(response.data['total']), sum(order.total for order in orders))
+        self.assertEqual(Product.objects.get(id=self.products[0].id).quantity, 18)
+
+    def test_query_count_does_not_grow_with_farms(self):
+        with CaptureQueriesContext(connection) as one_farm:
+            self.assertEqual(self.checkout([(self.products[0], 1)]).status_code, 201)
+        with self.assertNumQueries(len(one_farm)):
+            response = self.checkout([(product, 1) for product in self.products])
+        self.assertEqual(len(response.data['orders']), 5)
+
+    def test_shortfall_at_one_farm_places_nothing(self):
+        response = self.checkout([(self.products[0], 5), (self.products[-1], 21)])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['product_id'], self.products[-1].id)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(id=self.products[0].id).quantity, 20)
+
+        self.assertEqual(self.client.post('/api/orders/checkout/', {
+            'shipping_address': 'Nakuru', 'payment_method': 'mpesa', 'items': [{'product_id': 0, 'quantity': 1}],
+        }, format='json').status_code, 400)
+        self.assertEqual(self.checkout([]).status_code, 400)
+
+
+class BulkStatusTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.milk = Product.objects.create(name='Milk', farm=self.farm, price=Decimal('50'), quantity=1000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def add_orders(self, count, farm=None):
+        orders = []
+        for _ in range(count):
+            order = Order.objects.create(
+                customer=self.customer, farm=farm or self.farm, shipping_address='Nakuru', payment_method='mpesa',
+                subtotal=Decimal('50'), shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('50'),
+            )
+            reserve(order, [(self.milk.id, 2)])
+            orders.append(order.id)
+        return orders
+
+    def move(self, order_ids, new_status, **fields):
+        return self.client.post('/api/orders/status/', {'order_ids': order_ids, 'status': new_status, **fields}, format='json')
+
+    def test_moves_allowed_orders_and_reports_the_rest(self):
+        pending = self.add_orders(20)
+        cancelled = self.add_orders(1)
+        Order.objects.filter(id__in=cancelled).update(status='cancelled')
+        other_farm = Farm.objects.create(name='Other', location='Kiambu', description='Farm', farmer=self.customer)
+        foreign = self.add_orders(1, farm=other_farm)
+
+        response = self.move([*pending, *cancelled, *foreign, 0], 'verified', notes='Paid by M-Pesa')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], pending)
+        self.assertEqual([r['id'] for r in response.data['rejected']], [*cancelled, *foreign, 0])
+        self.assertIn('from cancelled to verified', response.data['rejected'][0]['detail'])
+
+        verified = Order.objects.filter(id__in=pending)
+        self.assertTrue(all(order.status == 'verified' and order.verified_at for order in verified))
+        self.assertEqual(Order.objects.get(id=foreign[0]).status, 'pending')
+        self.assertEqual(TrackingUpdate.objects.filter(status='verified', notes='Paid by M-Pesa').count(), 20)
+        # Their stock is sold; the foreign order still holds its reservation
+        self.assertFalse(StockReservation.objects.filter(order_id__in=pending).exists())
+        self.assertTrue(StockReservation.objects.filter(order_id__in=foreign).exists())
+
+    def test_transitions_follow_the_state_machine(self):
+        orders = self.add_orders(3)
+        self.assertEqual(self.move(orders, 'shipped').data['updated'], [])
+        self.assertEqual(self.move(orders[:2], 'verified').data['updated'], orders[:2])
+        self.assertEqual(self.move(orders, 'shipped').data['updated'], orders[:2])
+        self.assertEqual(self.move(orders, 'pending').data['updated'], [])
+
+        # Cancelling gives reserved stock back
+        self.assertEqual(self.move(orders, 'cancelled').data['updated'], orders[2:])
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.quantity, 1000 - 4)
+
+        self.assertEqual(self.client.patch(f'/api/orders/{orders[0]}/status/', {'status': 'pending'}, format='json').status_code, 409)
+        self.assertEqual(self.client.patch(f'/api/orders/{orders[0]}/status/', {'status': 'completed'}, format='json').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/orders/{orders[0]}/verify-payment/').status_code, 409)
+        self.assertEqual(self.move([], 'shipped').status_code, 400)
+        self.assertEqual(self.move(orders, 'lost').status_code, 400)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        few, many = self.add_orders(3), self.add_orders(40)
+        with CaptureQueriesContext(connection) as three:
+            self.move(few, 'verified')
+        with self.assertNumQueries(len(three)):
+            response = self.move(many, 'verified')
+        self.assertEqual(len(response.data['updated']), 40)
+        update = next(query['sql'] for query in three.captured_queries if query['sql'].startswith('UPDATE "orders_order"'))
+        self.assertIn('"orders_order"."status" IN', update)
+
+
+class TrackTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = Order.objects.create(
+            customer=self.customer, farm=self.farm, shipping_address='Nairobi', payment_method='mpesa',
+            subtotal=Decimal('50'), shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('50'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def drive(self, start, end, pings, status='shipped'):
+        """GPS pings from ``start`` to ``end``, a metre or so off the straight line."""
+        jitter = np.random.default_rng(len(TrackingUpdate.objects.all())).normal(0, 1e-5, (pings, 2))
+        points = np.linspace(start, end, pings) + jitter
+        TrackingUpdate.objects.bulk_create(
+            TrackingUpdate(order=self.order, status=status, latitude=Decimal(f'{lat:.7f}'), longitude=Decimal(f'{lng:.7f}'))
+            for lat, lng in points
+        )
+
+    def later(self, hours=48):
+        return timezone.now() + timedelta(hours=hours)
+
+    def test_polyline_round_trip(self):
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(points), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertTrue(np.allclose(decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@'), points))
+        self.assertEqual(decode_polyline('').shape, (0, 2))
+
+    def test_simplify_keeps_the_shape_within_tolerance_or_limit(self):
+        # Nakuru to Nairobi with a turn halfway; jitter of about a metre
+        leg = np.linspace((-0.30, 36.07), (-0.30, 36.50), 500)
+        turn = np.linspace((-0.30, 36.50), (-1.28, 36.82), 500)
+        points = np.concatenate((leg, turn)) + np.random.default_rng(0).normal(0, 1e-5, (1000, 2))
+        kept = simplify(points, tolerance=5)
+        self.assertEqual((kept[0], kept[-1]), (0, 999))
+        self.assertLess(len(kept), 20)
+        self.assertTrue(any(495 <= index <= 505 for index in kept))
+        self.assertEqual(len(simplify(points, limit=3)), 3)
+        self.assertEqual(len(simplify(points, limit=50)), 50)
+
+    def test_compaction_folds_old_pings_into_the_route(self):
+        TrackingUpdate.objects.create(order=self.order, status='shipped', notes='Left the farm',
+                                      latitude=Decimal('-0.30'), longitude=Decimal('36.07'))
+        self.drive((-0.30, 36.07), (-0.30, 36.50), 300)
+        self.drive((-0.30, 36.50), (-1.28, 36.82), 300)
+        TrackingUpdate.objects.create(order=self.order, status='completed', latitude=Decimal('-1.28'), longitude=Decimal('36.82'))
+
+        self.assertEqual(compact_tracks(now=timezone.now()), 0)
+        self.assertEqual(compact_tracks(now=self.later()), 600)
+        route = TrackingRoute.objects.get(order=self.order)
+        self.assertEqual((route.pings, TrackingUpdate.objects.count()), (602, 2))
+        self.assertLess(route.points, 20)
+        self.assertTrue(np.allclose(decode_polyline(route.polyline)[[0, -1]], [(-0.30, 36.07), (-1.28, 36.82)]))
+        self.assertEqual(compact_tracks(now=self.later()), 0)
+
+        # Later pings extend the route; the first at the same status isn't kept
+        self.drive((-1.28, 36.82), (-1.29, 36.83), 50, status='completed')
+        self.assertEqual(compact_tracks(now=self.later(96)), 50)
+        route.refresh_from_db()
+        self.assertEqual(route.pings, 652)
+        self.assertTrue(np.allclose(decode_polyline(route.polyline)[-1], (-1.29, 36.83), atol=1e-4))
+        self.assertEqual(TrackingUpdate.objects.count(), 2)
+
+    def test_resolution_bounds_the_route_however_long_the_trip(self):
+        TrackingUpdate.objects.create(order=self.order, status='shipped', notes='Left the farm')
+        self.drive((-0.30, 36.07), (-0.30, 36.50), 400)
+        compact_tracks(now=self.later())
+        self.drive((-0.30, 36.50), (-1.28, 36.82), 400)
+        url = f'/api/orders/{self.order.id}/tracking/'
+
+        # The order, its route, its rows, and the timeline's
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'resolution': 10})
+        self.assertEqual(response.status_code, 200)
+        route = response.data['route']
+        self.assertEqual(len(route), 10)
+        self.assertTrue(np.allclose([route[0], route[-1]], [(-0.30, 36.07), (-1.28, 36.82)], atol=1e-4))
+        # The timeline: the note, and the first ping since compaction, at the same status, isn't in it
+        self.assertEqual([update['notes'] for update in response.data['updates']], ['Left the farm'])
+
+        self.assertEqual(len(self.client.get(url).data), 401)
+        for resolution in ('1', 'lots', '100000'):
+            self.assertEqual(self.client.get(url, {'resolution': resolution}).status_code, 400)
+        self.client.force_authenticate(self.farmer)
+        # Below the limit, every point: the compacted route's and the 400 since
+        route = self.client.get(url, {'resolution': 500}).data['route']
+        self.assertEqual(len(route), TrackingRoute.objects.get(order=self.order).points + 400)
+
+
+class TrackingSocketTests(FarmTestMixin, TransactionTestCase):
+    # Consumers reach the database through database_sync_to_async, which closes
+    # connections between calls, so writes here really commit
+    ORIGIN = [(b'origin', b'http://localhost:5173')]
+
+    def setUp(self):
+        super().setUp()
+        self.stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='pass12345')
+        self.order = Order.objects.create(
+            customer=self.customer, farm=self.farm, shipping_address='Nakuru', payment_method='mpesa',
+            subtotal=Decimal('50'), shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('50'),
+        )
+        TrackingUpdate.objects.create(order=self.order, status='pending', notes='Order placed', updated_by=self.customer)
+
+    def socket(self, user, order_id=None):
+        token = str(AccessToken.for_user(user)) if user else 'nonsense'
+        return WebsocketCommunicator(
+            application, f'/ws/orders/{order_id or self.order.id}/tracking/?token={token}', headers=self.ORIGIN,
+        )
+
+    def committed(self, write):
+        """Run ``write`` in a worker thread and commit it, as a view would."""
+        return database_sync_to_async(write)()
+
+    async def test_subscribers_get_history_then_changes_as_they_commit(self):
+        customer, farmer = self.socket(self.customer), self.socket(self.farmer)
+        for socket in (customer, farmer):
+            connected, _ = await socket.connect()
+            self.assertTrue(connected)
+            snapshot = await socket.receive_json_from()
+            self.assertEqual(snapshot['status'], 'pending')
+            self.assertEqual([update['notes'] for update in snapshot['updates']], ['Order placed'])
+
+        await self.committed(lambda: transition([self.order.id], 'verified', self.farmer, notes='Paid'))
+        for socket in (customer, farmer):
+            message = await socket.receive_json_from()
+            self.assertEqual((message['type'], message['status'], message['update']['notes']), ('tracking', 'verified', 'Paid'))
+
+        def post_update():
+            client = APIClient()
+            client.force_authenticate(self.farmer)
+            return client.post(f'/api/orders/{self.order.id}/tracking/update/', {'status': 'verified', 'location': 'Naivasha'}, format='json')
+        self.assertEqual((await self.committed(post_update)).status_code, 201)
+        self.assertEqual((await customer.receive_json_from())['update']['location'], 'Naivasha')
+
+        # Nothing is pushed for a move that didn't happen
+        await self.committed(lambda: transition([self.order.id], 'pending', self.farmer))
+        self.assertTrue(await customer.receive_nothing())
+        await customer.disconnect()
+        await farmer.disconnect()
+
+    async def test_swept_orders_are_pushed_as_cancelled(self):
+        socket = self.socket(self.customer)
+        await socket.connect()
+        await socket.receive_json_from()
+        await self.committed(lambda: StockReservation.objects.create(
+            order=self.order, product=Product.objects.create(name='Milk', farm=self.farm, price=Decimal('50'), quantity=1),
+            quantity=1, expires_at=timezone.now() - timedelta(minutes=1),
+        ))
+        await self.committed(release_expired)
+        self.assertEqual(await socket.receive_json_from(), {'type': 'status', 'status': 'cancelled'})
+        await socket.disconnect()
+
+    async def test_only_the_customer_and_farmer_may_subscribe(self):
+        for user in (self.stranger, None):
+            connected, _ = await self.socket(user).connect()
+            self.assertFalse(connected)
+        connected, _ = await self.socket(self.customer, order_id=self.order.id + 1).connect()
+        self.assertFalse(connected)
+
+        socket = self.socket(self.customer)
+        socket.scope['headers'] = [(b'origin', b'http://evil.example.com')]
+        connected, _ = await socket.connect()
+        self.assertFalse(connected)
+
+
+@override_settings(ORDER_NUMBER_BLOCK_SIZE=3)
+class OrderNumberTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        allocator.reset()
+        self.today = timezone.now().date()
+
+    def order(self, **fields):
+        return Order(
+            customer=self.farm.farmer, farm=self.farm, shipping_address='Nakuru', payment_method='mpesa',
+            subtotal=Decimal('10'), shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('10'), **fields,
+        )
+
+    def test_numbers_are_sequential_per_day_from_blocks(self):
+        self.assertEqual([next_order_number() for _ in range(7)], [format_number(self.today, n) for n in range(1, 8)])
+        self.assertEqual(allocator.blocks, 3)
+        self.assertEqual(OrderNumberBlock.objects.get(day=self.today).last, 9)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('orders.numbers.timezone.now', return_value=tomorrow):
+            self.assertEqual(next_order_number(), format_number(tomorrow.date(), 1))
+
+    def test_collisions_retry_with_a_new_block(self):
+        next_order_number()
+        # As if the rest of this block had been handed out again after a rollback
+        Order.objects.bulk_create([self.order(order_number=format_number(self.today, n)) for n in (2, 3)])
+
+        order = self.order()
+        order.save()
+        self.assertEqual(order.order_number, format_number(self.today, 4))
+        orders = bulk_create_with_numbers([self.order(order_number=format_number(self.today, 3)), self.order()])
+        self.assertEqual([o.order_number for o in orders], [format_number(self.today, 7), format_number(self.today, 5)])
+        self.assertEqual(allocator.discards, 2)
+
+        # Numbers the allocator didn't hand out are never replaced
+        manual = order.order_number.replace('ORD', 'MAN')
+        self.order(order_number=manual).save()
+        with self.assertRaises(IntegrityError):
+            self.order(order_number=manual).save()
+
+
+class OrderListTests(FarmTestMixin, TestCase):
+    farmer_profile = True
+    # A customer who is also a farmer, so the nested user has a profile to load
+    customer_fields = {'user_type': 'farmer'}
+
+    def setUp(self):
+        super().setUp()
+        FarmerProfile.objects.create(user=self.customer, location='Kiambu', specialty='Dairy')
+        self.products = [
+            Product.objects.create(name=f'Item {i}', farm=self.farm, price=Decimal('10'), quantity=100) for i in range(3)
+        ]
+        self.client = APIClient()
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                customer=self.customer, farm=self.farm, shipping_address='Nakuru', payment_method='mpesa',
+                subtotal=Decimal('30'), shipping_cost=Decimal('5.99'), tax=Decimal('2.40'), total=Decimal('38.39'),
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price=product.price) for product in self.products
+            )
+
+    def assertQueryBudget(self, user, url, budget, **params):
+        self.client.force_authenticate(user)
+        for count in (3, 30):
+            self.add_orders(count - Order.objects.count())
+            with self.assertNumQueries(budget):
+                response = self.client.get(url, params)
+            self.assertEqual(len(response.json()['results']), count)
+        return response.json()['results']
+
+    # The farmer's profile and farm are cached on self.farmer, so the budgets
+    # below are the orders query and the items prefetch, plus the farmer's farm
+    # ids on /api/orders/
+    def test_full_orders(self):
+        orders = self.assertQueryBudget(self.farmer, '/api/orders/', 3)
+        self.assertEqual(len(orders[0]['items']), 3)
+        self.assertEqual(orders[0]['items'][0]['product']['farm']['name'], 'Green Acres')
+        self.assertEqual(orders[0]['customer']['farmer_profile']['location'], 'Kiambu')
+        self.assertEqual(orders[0]['farm']['name'], 'Green Acres')
+
+    def test_farm_orders(self):
+        orders = self.assertQueryBudget(self.farmer, '/api/orders/farm/', 2)
+        self.assertEqual(len(orders[0]['items']), 3)
+
+    def test_summaries(self):
+        orders = self.assertQueryBudget(self.farmer, '/api/orders/', 2, view='summary')
+        self.assertEqual(orders[0]['item_count'], 3)
+        self.assertEqual(orders[0]['customer']['email'], 'buyer@example.com')
+        self.assertNotIn('items', orders[0])
+
+    def test_payments_to_verify(self):
+        orders = self.assertQueryBudget(self.farmer, '/api/orders/payments-to-verify/', 1)
+        self.assertEqual(orders[0]['item_count'], 3)
+        self.assertIn('verified_at', orders[0])
+
+
+class OrderPaginationTests(FarmTestMixin, TestCase):
+    farmer_profile = True
+
+    def setUp(self):
+        super().setUp()
+        statuses = ['pending', 'shipped', 'completed']
+        start = timezone.make_aware(datetime(2026, 9, 1))
+        for i in range(25):
+            order = Order.objects.create(
+                customer=self.customer, farm=self.farm, status=statuses[i % 3], shipping_address='Nakuru',
+                payment_method='mpesa', subtotal=Decimal('10'), shipping_cost=Decimal('0'), tax=Decimal('0'), total=Decimal('10'),
+            )
+            # Pairs of orders share a day, so pages have to break ties on id
+            Order.objects.filter(pk=order.pk).update(created_at=start + timedelta(days=i // 2))
+        self.client = APIClient()
+
+    def all_pages(self, url, **params):
+        page = self.client.get(url, {'page_size': 4, **params}).json()
+        results = page['results']
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            results += page['results']
+        return [order['id'] for order in results]
+
+    def test_pages_follow_created_at_without_gaps(self):
+        newest_first = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.all_pages('/api/orders/'), newest_first)
+        self.assertEqual(self.all_pages('/api/orders/', sort='created_at'), newest_first[::-1])
+        self.client.force_authenticate(self.farmer)
+        self.assertEqual(self.all_pages('/api/orders/farm/', view='summary'), newest_first)
+
+        first = self.client.get('/api/orders/farm/', {'page_size': 4}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        self.assertFalse(any('OFFSET' in query['sql'].upper() for query in queries.captured_queries))
+
+    def test_status_and_date_filters(self):
+        self.client.force_authenticate(self.farmer)
+        results = self.all_pages(
+            '/api/orders/farm/', status=['shipped', 'completed'], created_after='2026-09-03', created_before='2026-09-08T00:00:00Z',
+        )
+        expected = Order.objects.filter(
+            status__in=['shipped', 'completed'], created_at__date__gte='2026-09-03', created_at__date__lt='2026-09-08',
+        )
+        self.assertCountEqual(results, expected.values_list('id', flat=True))
+        self.assertEqual(len(results), 7)
+        # Payments to verify are pending ones unless asked for others
+        self.assertEqual(len(self.all_pages('/api/orders/payments-to-verify/')), 9)
+        self.assertEqual(len(self.all_pages('/api/orders/payments-to-verify/', status='completed')), 8)
+
+    def test_invalid_parameters_are_rejected(self):
+        self.client.force_authenticate(self.farmer)
+        for params in ({'status': 'lost'}, {'created_after': 'yesterday'}, {'created_before': '2026-02-30'},
+                       {'sort': 'total'}, {'cursor': 'bogus'}):
+            self.assertEqual(self.client.get('/api/orders/', params).status_code, 400, params)
+
+    def test_benchmark_runs(self):
+        output = io.StringIO()
+        call_command('benchmark_order_pages', orders=300, page_size=10, rounds=1, max_ratio=100, clean=True, stdout=output)
+        self.assertIn('farm orders: page 30 of 30', output.getvalue())
+        self.assertFalse(Order.objects.filter(farm__name='Order page benchmark').exists())
+
+
+class ConcurrentCheckoutTests(FarmTestMixin, TransactionTestCase):
+    workers = 16
+
+    def setUp(self):
+        super().setUp()
+        self.customers = [
+            User.objects.create_user(username=f'buyer{i}', email=f'buyer{i}@example.com') for i in range(self.workers)
+        ]
+        self.hot = Product.objects.create(name='Avocado', farm=self.farm, price=Decimal('20'), quantity=40)
+        self.cold = Product.objects.create(name='Honey', farm=self.farm, price=Decimal('900'), quantity=1000)
+
+    def test_a_hot_product_is_never_oversold(self):
+        def checkout(i):
+            client = APIClient()
+            client.force_authenticate(self.customers[i % self.workers])
+            # Carts list the products in both orders to exercise the lock ordering
+            lines = [(self.hot, 1), (self.cold, 1)] if i % 2 else [(self.cold, 1), (self.hot, 1)]
+            try:
+                return client.post('/api/orders/', {
+                    'farm_id': self.farm.id, 'shipping_address': 'Nakuru', 'payment_method': 'mpesa',
+                    'items': [{'product_id': product.id, 'quantity': quantity} for product, quantity in lines],
+                }, format='json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = list(pool.map(checkout, range(100)))
+
+        self.assertEqual(statuses.count(201), 40)
+        self.assertEqual(statuses.count(409), 60)
+        self.hot.refresh_from_db()
+        self.cold.refresh_from_db()
+        self.assertEqual((self.hot.quantity, self.cold.quantity), (0, 960))
+        self.assertEqual(Order.objects.count(), 40)
+
+    def test_order_numbers_are_unique_across_threads_and_processes(self):
+        # The parent holds a block when it forks; the workers must not reuse it
+        next_order_number()
+        output = io.StringIO()
+        call_command('benchmark_order_numbers', orders=2000, processes=3, threads=4, batch_size=20, block_size=10, stdout=output)
+        self.assertIn('2000 orders from 3 processes x 4 threads', output.getvalue())
+        self.assertIn('2000 distinct numbers', output.getvalue())
+        self.assertIn('0 collisions retried', output.getvalue())
+
+    def test_benchmark_runs(self):
+        output = io.StringIO()
+        call_command('benchmark_checkout', stock=50, checkouts=80, workers=4, stdout=output)
+        self.assertIn('conditional: 80 checkouts', output.getvalue())
+        self.assertIn('50 sold, 30 rejected', output.getvalue())
@@ -0,0 +1,215 @@
+# orders/tracks.py
+"""
+GPS tracks for orders.
+
+Drivers post a TrackingUpdate with coordinates every few seconds. Past
+the first at each status, those pings only matter as a line on the map.
+Once they are TRACK_COMPACT_AFTER_HOURS old, compact_tracks() folds them
+into the order's TrackingRoute and deletes them. The line is simplified
+with Douglas–Peucker to within TRACK_TOLERANCE_METRES of the original,
+then stored as an encoded polyline (Google's format, to 1e-5 degrees,
+about a metre). Rows that say something are kept as the order's
+timeline: those with notes, without coordinates, or the first at a
+status (see timeline()).
+
+track() gives an order's timeline and its whole route, the compacted
+part and the pings since, simplified to at most ``resolution`` points
+however long the trip was.
+"""
+import heapq
+from datetime import timedelta
+from itertools import groupby
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Order, TrackingRoute, TrackingUpdate
+
+# Polyline units per degree
+PRECISION = 1e5
+METRES_PER_DEGREE = 111_320
+# Enough 5-bit chunks for any zigzagged coordinate delta
+MAX_CHUNKS = 7
+
+
+def encode_polyline(points):
+    """Encode ``(lat, lng)`` points as a polyline."""
+    values = np.round(np.asarray(points, dtype=float).reshape(-1, 2) * PRECISION).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=0).ravel()
+    zigzag = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Each value is written 5 bits at a time, lowest first, with 0x20 set on all but its last chunk
+    shifts = 5 * np.arange(MAX_CHUNKS)
+    chunks = (zigzag[:, None] >> shifts) & 0x1f
+    lengths = np.maximum(1, ((zigzag[:, None] >> shifts) > 0).sum(axis=1))
+    position = np.arange(MAX_CHUNKS)
+    chunks |= np.where(position < (lengths - 1)[:, None], 0x20, 0)
+    return (chunks[position < lengths[:, None]] + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode_polyline(polyline):
+    """The ``(lat, lng)`` points of a polyline, as an (n, 2) array."""
+    chunks = np.frombuffer(polyline.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if not chunks.size:
+        return np.empty((0, 2))
+    last = (chunks & 0x20) == 0
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    value = np.cumsum(np.concatenate(([0], last[:-1])))
+    shifts = 5 * (np.arange(chunks.size) - starts[value])
+    zigzag = np.add.reduceat((chunks & 0x1f) << shifts, starts)
+    deltas = np.where(zigzag & 1, ~(zigzag >> 1), zigzag >> 1)
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / PRECISION
+
+
+def simplify(points, tolerance=0.0, limit=None):
+    """
+    Douglas–Peucker: the indexes of the ``(lat, lng)`` points to keep so
+    the line stays within ``tolerance`` metres of the original, and, with
+    ``limit``, no more than that many. The worst segment is split first,
+    so a limit keeps the points that change the line most.
+    """
+    count = len(points)
+    if count <= 2:
+        return np.arange(count)
+    # Metres on a plane through the track, close enough over a delivery's distances
+    latitude = np.radians(points[:, 0].mean())
+    xy = points[:, ::-1] * METRES_PER_DEGREE * np.array([np.cos(latitude), 1])
+
+    def worst(start, end):
+        """The farthest point between ``start`` and ``end`` from the segment joining them."""
+        a, ab = xy[start], xy[end] - xy[start]
+        ap = xy[start + 1:end] - a
+        length = ab @ ab
+        along = np.clip(ap @ ab / length, 0, 1) if length else np.zeros(len(ap))
+        distances = np.hypot(*(ap - along[:, None] * ab).T)
+        index = int(distances.argmax())
+        return -distances[index], start, end, start + 1 + index
+
+    kept = [0, count - 1]
+    segments = [worst(0, count - 1)]
+    while segments and (limit is None or len(kept) < limit):
+        distance, start, end, index = heapq.heappop(segments)
+        if -distance <= tolerance:
+            break
+        kept.append(index)
+        for piece in ((start, index), (index, end)):
+            if piece[1] - piece[0] > 1:
+                heapq.heappush(segments, worst(*piece))
+    return np.sort(kept)
+
+
+def timeline(rows, status=None):
+    """
+    The ids among an order's ``(id, status, latitude, longitude, notes, ...)``
+    rows, in time order, to keep as updates; the rest are pings. ``status``
+    is the order's status before the first row.
+    """
+    kept = set()
+    for pk, row_status, latitude, longitude, notes, *_ in rows:
+        if latitude is None or longitude is None or notes or row_status != status:
+            kept.add(pk)
+        status = row_status
+    return kept
+
+
+def coordinates(rows):
+    """The ``(lat, lng)`` of the rows with both, as an (n, 2) array."""
+    points = [(float(row[2]), float(row[3])) for row in rows if row[2] is not None and row[3] is not None]
+    return np.array(points, dtype=float).reshape(-1, 2)
+
+
+def uncompacted():
+    """Updates not yet folded into their order's route."""
+    return Q(order__route__isnull=True) | Q(timestamp__gt=F('order__route__ends_at'))
+
+
+def compact_tracks(now=None, batch_size=50):
+    """
+    Fold GPS pings older than TRACK_COMPACT_AFTER_HOURS into their orders'
+    routes, a batch of orders per transaction. Orders another run holds
+    are skipped. Returns the number of pings deleted.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=settings.TRACK_COMPACT_AFTER_HOURS)
+    compacted, after = 0, 0
+    while True:
+        with transaction.atomic():
+            candidates = (
+                TrackingUpdate.objects.filter(
+                    uncompacted(), timestamp__lte=cutoff, order_id__gt=after,
+                    latitude__isnull=False, longitude__isnull=False,
+                ).order_by('order_id').values_list('order_id', flat=True).distinct()[:batch_size]
+            )
+            candidates = list(candidates)
+            if not candidates:
+                return compacted
+            after = candidates[-1]
+            order_ids = list(
+                Order.objects.filter(pk__in=candidates).order_by('pk')
+                .select_for_update(skip_locked=True).values_list('pk', flat=True)
+            )
+            compacted += compact_orders(order_ids, cutoff)
+
+
+def compact_orders(order_ids, cutoff):
+    """Fold the orders' pings up to ``cutoff`` into their routes. Returns the number deleted."""
+    routes = TrackingRoute.objects.in_bulk(order_ids, field_name='order_id')
+    window = TrackingUpdate.objects.filter(uncompacted(), order_id__in=order_ids, timestamp__lte=cutoff)
+    rows = window.order_by('order_id', 'timestamp', 'id').values_list(
+        'order_id', 'timestamp', 'id', 'status', 'latitude', 'longitude', 'notes',
+    )
+    # Each compacted order's last status, for whether its first new row changes it
+    statuses = dict(
+        TrackingUpdate.objects.filter(order_id__in=routes, timestamp__lte=F('order__route__ends_at'))
+        .order_by('order_id', 'timestamp', 'id').values_list('order_id', 'status')
+    )
+
+    kept, changed = set(), []
+    for order_id, order_rows in groupby(rows, key=lambda row: row[0]):
+        order_rows = list(order_rows)
+        updates = [row[2:] for row in order_rows]
+        kept |= timeline(updates, statuses.get(order_id))
+        points = coordinates(updates)
+        if not len(points):
+            continue
+        route = routes.get(order_id) or TrackingRoute(order_id=order_id, polyline='', points=0, pings=0)
+        stored = decode_polyline(route.polyline)
+        # Simplified on from the route's last point, so the two join up
+        joined = np.concatenate((stored[-1:], points))
+        added = joined[simplify(joined, settings.TRACK_TOLERANCE_METRES)][len(stored[-1:]):]
+        route.polyline = encode_polyline(np.concatenate((stored, added)))
+        route.points = len(stored) + len(added)
+        route.pings += len(points)
+        route.ends_at = order_rows[-1][1]
+        changed.append(route)
+
+    # Deleted before the routes move on, while the window still matches them
+    deleted, _ = window.filter(latitude__isnull=False, longitude__isnull=False).exclude(pk__in=kept).delete()
+    TrackingRoute.objects.bulk_create(
+        changed, update_conflicts=True, unique_fields=['order'], update_fields=['polyline', 'points', 'pings', 'ends_at'],
+    )
+    return deleted
+
+
+def track(order_id, resolution):
+    """
+    An order's timeline updates, oldest first, and its route as at most
+    ``resolution`` ``[lat, lng]`` points: the compacted route, then the
+    pings since.
+    """
+    route = TrackingRoute.objects.filter(order_id=order_id).first()
+    rows = list(
+        TrackingUpdate.objects.filter(order_id=order_id).order_by('timestamp', 'id')
+        .values_list('id', 'status', 'latitude', 'longitude', 'notes', 'timestamp')
+    )
+    # What is left up to the route's end is all timeline
+    split = sum(1 for row in rows if row[5] <= route.ends_at) if route else 0
+    compacted, recent = rows[:split], rows[split:]
+    kept = {row[0] for row in compacted} | timeline(recent, compacted[-1][1] if compacted else None)
+    updates = TrackingUpdate.objects.filter(pk__in=kept).select_related('updated_by').order_by('timestamp', 'id')
+
+    points = coordinates(recent)
+    if route:
+        points = np.concatenate((decode_polyline(route.polyline), points))
+    return updates, np.round(points[simplify(points, limit=resolution)], 7).tolist()
@@ -0,0 +1,60 @@
+# orders/transitions.py
+"""
+Order status changes, checked against Order.TRANSITIONS.
+
+transition() moves any number of a farmer's orders to one status. The
+orders are locked and read once. The ones whose current status may move
+to the target are changed by a single
+``UPDATE ... WHERE id IN (...) AND status IN (...)``, with the status
+guard repeated in the statement itself. Each one gets a TrackingUpdate,
+all written in one bulk insert. Stock follows the orders as it does for
+single changes: cancelling releases their reservations, anything else
+confirms them (see orders/stock.py). Once committed, the new updates are
+pushed to the orders' subscribers (see orders/push.py).
+"""
+from django.db import transaction
+from django.utils import timezone
+from . import push, stock
+from .models import Order, TrackingUpdate
+
+
+def sources(target):
+    """The statuses an order can move to ``target`` from."""
+    return [status for status, targets in Order.TRANSITIONS.items() if target in targets]
+
+
+def transition(order_ids, target, user, location=None, notes=None, now=None):
+    """
+    Move ``user``'s orders among ``order_ids`` to ``target``. Returns
+    (moved, rejected): the ids moved, and ``{id: reason}`` for the rest.
+    """
+    now = now or timezone.now()
+    allowed = sources(target)
+    with transaction.atomic():
+        current = dict(
+            Order.objects.filter(pk__in=order_ids, farm__farmer=user)
+            .select_for_update(of=('self',)).order_by('pk')
+            .values_list('pk', 'status')
+        )
+        moved = [pk for pk, status in current.items() if status in allowed]
+        rejected = {
+            pk: (f'Cannot move an order from {current[pk]} to {target}.' if pk in current else 'Order not found.')
+            for pk in order_ids if current.get(pk) not in allowed
+        }
+        if not moved:
+            return moved, rejected
+
+        changes = {'status': target, 'updated_at': now}
+        if target == 'verified':
+            changes['verified_at'] = now
+        Order.objects.filter(pk__in=moved, status__in=allowed).update(**changes)
+        updates = TrackingUpdate.objects.bulk_create([
+            TrackingUpdate(order_id=pk, status=target, location=location, notes=notes, updated_by=user)
+            for pk in moved
+        ])
+        if target == 'cancelled':
+            stock.release(moved, now)
+        else:
+            stock.confirm(moved)
+        push.push(push.tracking_messages(updates))
+    return moved, rejected
@@ -2,30 +2,99 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView, PermissionDenied
 from .models import Order, TrackingUpdate
-from .serializers import OrderSerializer, CreateOrderSerializer, TrackingUpdateSerializer
+from .serializers import (
+    OrderSerializer, OrderSummarySerializer, CreateOrderSerializer, CartCheckoutSerializer, BulkStatusSerializer,
+    TrackingUpdateSerializer,
+)
 from django.shortcuts import get_object_or_404
 from farms.models import Farm
 from accounts.models import User
 from django.utils import timezone
+from django.db import transaction
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ParseError
+from datetime import datetime, time
+from products.pagination import KeysetPagination
+from . import push, stock
+from .tracks import track
+from .transitions import transition
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderPagination(KeysetPagination):
+    """Newest orders first; ?sort=created_at for oldest first."""
+    sort_fields = ('created_at',)
+    default_sort = '-created_at'
+
+def parse_moment(param, value):
+    """A datetime from an ISO date or datetime parameter; a plain date means its midnight."""
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = day and datetime.combine(day, time.min)
+    except ValueError:  # Well formed but out of range, like 2026-02-30
+        moment = None
+    if moment is None:
+        raise ParseError(f'{param} must be an ISO date or datetime')
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+def filter_orders(queryset, params):
+    """Apply the ?status= (repeatable), ?created_after= (inclusive) and ?created_before= filters."""
+    statuses = [value for value in params.getlist('status') if value]
+    if statuses:
+        if not set(statuses) <= dict(Order.STATUS_CHOICES).keys():
+            raise ParseError(f"status must be one of: {', '.join(dict(Order.STATUS_CHOICES))}")
+        queryset = queryset.filter(status__in=statuses)
+    for param, lookup in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lt')):
+        if params.get(param):
+            queryset = queryset.filter(**{lookup: parse_moment(param, params[param])})
+    return queryset
+
+class OrderListMixin:
+    """
+    Cursor-paginated order lists with the filter_orders() filters, loaded
+    with the query plan of the serializer they use: full orders, or with
+    ?view=summary the lighter OrderSummarySerializer.
+    """
+    list_serializer_class = OrderSerializer
+    pagination_class = OrderPagination
+
+    def filter_queryset(self, queryset):
+        return filter_orders(queryset, self.request.query_params)
+
+    def get_serializer_class(self):
+        if self.request.query_params.get('view') == 'summary':
+            return OrderSummarySerializer
+        return self.list_serializer_class
+
+    def planned(self, queryset):
+        return self.get_serializer_class().plan(queryset)
+
+class OrderListCreateView(OrderListMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CreateOrderSerializer
-        return OrderSerializer
+        return super().get_serializer_class()
     
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'farmer':
-            return Order.objects.filter(farm__farmer=user)
-        return Order.objects.filter(customer=user)
+            # Farm ids up front: joining to farms would sort every order before paginating
+            farm_ids = list(Farm.objects.filter(farmer=user).values_list('pk', flat=True))
+            return self.planned(Order.objects.filter(farm__in=farm_ids))
+        return self.planned(Order.objects.filter(customer=user))
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        order = serializer.save()
+        try:
+            order = serializer.save()
+        except stock.InsufficientStock as exc:
+            return Response(
+                {'detail': 'Not enough stock for this order.', 'product_id': exc.product_id},
+                status=status.HTTP_409_CONFLICT
+            )
         
         headers = self.get_success_headers(serializer.data)
         return Response({
@@ -35,6 +104,35 @@ class OrderListCreateView(generics.ListCreateAPIView):
             'total': str(order.total)
         }, status=status.HTTP_201_CREATED, headers=headers)
 
+class CartCheckoutView(APIView):
+    """Place a cart holding products from several farms: one order per farm, all or nothing."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = CartCheckoutSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        try:
+            orders = serializer.save()
+        except stock.InsufficientStock as exc:
+            return Response(
+                {'detail': 'Not enough stock for this order.', 'product_id': exc.product_id},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({
+            'orders': [
+                {
+                    'id': order.id,
+                    'order_number': order.order_number,
+                    'farm_id': order.farm_id,
+                    'status': order.status,
+                    'total': str(order.total)
+                }
+                for order in orders
+            ],
+            'total': str(sum(order.total for order in orders))
+        }, status=status.HTTP_201_CREATED)
+
 class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderSerializer
@@ -42,12 +140,11 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'farmer':
-            return Order.objects.filter(farm__farmer=user)
-        return Order.objects.filter(customer=user)
+            return OrderSerializer.plan(Order.objects.filter(farm__farmer=user))
+        return OrderSerializer.plan(Order.objects.filter(customer=user))
 
-class FarmOrdersView(generics.ListAPIView):
+class FarmOrdersView(OrderListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = OrderSerializer
     
     def get_queryset(self):
         # Get the farmer's farm
@@ -55,15 +152,15 @@ class FarmOrdersView(generics.ListAPIView):
         if not farmer_profile or not hasattr(farmer_profile, 'farm'):
             return Order.objects.none()
         
-        return Order.objects.filter(farm=farmer_profile.farm).order_by('-created_at')
+        return self.planned(Order.objects.filter(farm=farmer_profile.farm))
 
 class UpdateOrderStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def patch(self, request, order_id):
-        order = get_object_or_404(Order, id=order_id)
+        order = get_object_or_404(Order.objects.select_related('farm'), id=order_id)
         
-        if request.user != order.farm.farmer:
+        if request.user.id != order.farm.farmer_id:
             return Response(
                 {'detail': 'You do not have permission to update this order.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -76,13 +173,40 @@ class UpdateOrderStatusView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = new_status
-        order.save()
+        _, rejected = transition([order.id], new_status, request.user)
+        if rejected:
+            return Response(
+                {'detail': rejected[order.id]},
+                status=status.HTTP_409_CONFLICT
+            )
         
         return Response(
             {'detail': f'Order status updated to {new_status}.'},
             status=status.HTTP_200_OK
         )
+
+class BulkOrderStatusView(APIView):
+    """
+    Move many of the farmer's orders to one status at once, e.g. the day's
+    verified orders to shipped. Orders that can't make the move are left
+    as they are and listed with the reason.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        moved, rejected = transition(
+            data['order_ids'], data['status'], request.user,
+            location=data.get('location'), notes=data.get('notes')
+        )
+        return Response({
+            'status': data['status'],
+            'updated': moved,
+            'rejected': [{'id': order_id, 'detail': reason} for order_id, reason in rejected.items()]
+        }, status=status.HTTP_200_OK)
     
 # Add this to your existing views.py
 class OrderDeleteView(generics.DestroyAPIView):
@@ -96,40 +220,51 @@ class OrderDeleteView(generics.DestroyAPIView):
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        self.perform_destroy(instance)
+        with transaction.atomic():
+            stock.release([instance.id])
+            self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
-class PaymentVerificationListView(generics.ListAPIView):
+class PaymentVerificationListView(OrderListMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = OrderSerializer
+    # The payments page only shows order summaries
+    list_serializer_class = OrderSummarySerializer
     
     def get_queryset(self):
         farmer_profile = self.request.user.farmer_profile
         if not farmer_profile or not hasattr(farmer_profile, 'farm'):
             return Order.objects.none()
         
-        status_filter = self.request.query_params.get('status', 'pending')
-        return Order.objects.filter(
-            farm=farmer_profile.farm,
-            status=status_filter
-        ).order_by('-created_at')
+        queryset = Order.objects.filter(farm=farmer_profile.farm)
+        # Pending payments unless ?status= (see filter_orders) asks for others
+        if not self.request.query_params.get('status'):
+            queryset = queryset.filter(status='pending')
+        return self.planned(queryset)
     
 class VerifyPaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, order_id):
-        order = get_object_or_404(Order, id=order_id)
+        order = get_object_or_404(Order.objects.select_related('farm'), id=order_id)
         
-        if request.user != order.farm.farmer:
+        if request.user.id != order.farm.farmer_id:
             return Response(
                 {'detail': 'You do not have permission to verify this payment.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Update order status and verified_at timestamp
+        # An order the reservation sweep cancelled has had its stock given back,
+        # so it can't be verified
+        now = timezone.now()
+        _, rejected = transition([order.id], 'verified', request.user, now=now)
+        if rejected:
+            return Response(
+                {'detail': 'This order was cancelled and its stock released.' if order.status == 'cancelled'
+                 else rejected[order.id]},
+                status=status.HTTP_409_CONFLICT
+            )
         order.status = 'verified'
-        order.verified_at = timezone.now()
-        order.save()
+        order.verified_at = now
         
         return Response({
             'verified': True,
@@ -149,22 +284,47 @@ class TrackingUpdateView(generics.CreateAPIView):
         if self.request.user not in [order.customer, order.farm.farmer]:
             raise PermissionDenied("You don't have permission to update tracking for this order")
             
-        serializer.save(
+        update = serializer.save(
             order=order,
             updated_by=self.request.user,
             status=order.status  # Track the current order status
         )
+        push.push(push.tracking_messages([update]))
 
 class TrackingListView(generics.ListAPIView):
+    """
+    An order's tracking updates. With ?resolution=N, its timeline and its
+    route as at most N points instead, however long the trip (see
+    orders/tracks.py); the full list leaves out pings already compacted.
+    """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = TrackingUpdateSerializer
+    max_resolution = 5000
     
-    def get_queryset(self):
-        order_id = self.kwargs['order_id']
-        order = get_object_or_404(Order, id=order_id)
+    def get_order(self):
+        order = get_object_or_404(Order.objects.select_related('farm'), id=self.kwargs['order_id'])
         
         # Verify permissions - customer or farmer can view
-        if self.request.user not in [order.customer, order.farm.farmer]:
+        if self.request.user.id not in [order.customer_id, order.farm.farmer_id]:
             raise PermissionDenied("You don't have permission to view tracking for this order")
-            
-        return TrackingUpdate.objects.filter(order=order).order_by('timestamp')
\ No newline at end of file
+        return order
+    
+    def get_queryset(self):
+        return TrackingUpdate.objects.filter(order=self.get_order()).order_by('timestamp')
+    
+    def list(self, request, *args, **kwargs):
+        resolution = request.query_params.get('resolution')
+        if resolution is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            resolution = int(resolution)
+        except ValueError:
+            resolution = 0
+        if not 2 <= resolution <= self.max_resolution:
+            raise ParseError(f'resolution must be a whole number from 2 to {self.max_resolution}.')
+        
+        updates, route = track(self.get_order().id, resolution)
+        return Response({
+            'updates': self.get_serializer(updates, many=True).data,
+            'route': route
+        })
@@ -0,0 +1,117 @@
+# products/exporter.py
+"""
+Streaming product exports.
+
+Rows come from ``values_list().iterator(chunk_size=...)``, so only one
+database chunk is held at a time. CSV is encoded and sent as it is read:
+the header goes out before the first query returns. XLSX is written with
+openpyxl's write-only workbook, which spools rows to a temporary file. The
+finished file is then streamed from disk, since the zip container can only
+be closed once every row is in.
+
+Under ASGI a plain generator would be read to the end before the first
+byte is sent (StreamingHttpResponse lists sync iterators there), so ASGI
+requests get it wrapped in an async generator that fetches one chunk per
+trip to the sync thread instead.
+
+Product and farm names are typed by farmers, so text cells that a
+spreadsheet would read as a formula are escaped for both formats (see
+escape_cell()).
+"""
+import csv
+import io
+import tempfile
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+DB_CHUNK_SIZE = 2000
+ROWS_PER_CHUNK = 500
+FILE_CHUNK_SIZE = 64 * 1024
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Same columns the inventory import reads, so an export can be edited and re-imported
+INVENTORY_COLUMNS = [('name', 'name'), ('category', 'category'), ('quantity', 'quantity'), ('unit', 'unit'), ('price', 'price')]
+CATALOG_COLUMNS = INVENTORY_COLUMNS + [('farm', 'farm__name'), ('location', 'farm__location')]
+# First characters that make Excel, LibreOffice or Sheets evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_cell(value):
+    """``value``, with a ' in front if it is text a spreadsheet would run as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_cell(text):
+    """Undo escape_cell(), so an exported file imports back unchanged."""
+    if text.startswith("'") and text[1:].startswith(FORMULA_PREFIXES):
+        return text[1:]
+    return text
+
+
+def csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def xlsx_chunks(header, rows, title):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while chunk := output.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+async def async_chunks(chunks):
+    # The thread every sync view of the request runs in, so the database cursor stays on one connection
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def export_response(queryset, columns, file_format, name, asynchronous=False):
+    """
+    StreamingHttpResponse with ``queryset`` as a CSV or XLSX attachment;
+    ``asynchronous`` for a request served over ASGI.
+    """
+    header = [title for title, _ in columns]
+    rows = queryset.values_list(*[field for _, field in columns]).iterator(chunk_size=DB_CHUNK_SIZE)
+    rows = ([escape_cell(value) for value in row] for row in rows)
+    if file_format == 'csv':
+        content = csv_chunks(header, rows)
+    else:
+        content = xlsx_chunks(header, rows, name.title())
+    if asynchronous:
+        content = async_chunks(content)
+
+    response = StreamingHttpResponse(content, content_type=FORMATS[file_format])
+    filename = f'{name}-{timezone.now():%Y-%m-%d}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
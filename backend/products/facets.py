@@ -0,0 +1,89 @@
+# products/facets.py
+"""
+Facet counts for product search.
+
+Every product falls in exactly one (category, farm location, price band,
+in stock) cell. One GROUP BY over those four columns returns the count per
+occupied cell, and each facet's counts are summed from those cells in
+Python. A facet's own selection is left out when counting it, so the
+counts show what each alternative would return.
+"""
+from collections import Counter
+from django.db.models import BooleanField, Case, CharField, Count, Q, Value, When
+
+# Lower bound inclusive, upper bound exclusive, in the catalogue currency
+PRICE_BANDS = [
+    ('under-100', 0, 100),
+    ('100-500', 100, 500),
+    ('500-1000', 500, 1000),
+    ('1000-plus', 1000, None),
+]
+
+FACETS = {
+    'category': 'category',
+    'location': 'farm__location',
+    'price_band': 'price_band',
+    'in_stock': 'in_stock',
+}
+
+
+def price_band_filter(band):
+    for name, low, high in PRICE_BANDS:
+        if name == band:
+            return Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+    raise ValueError(f'Unknown price band: {band}')
+
+
+def with_facet_columns(queryset):
+    return queryset.annotate(
+        price_band=Case(
+            *[When(price_band_filter(name), then=Value(name)) for name, _, _ in PRICE_BANDS],
+            output_field=CharField(),
+        ),
+        in_stock=Case(When(quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+    )
+
+
+def facet_filter(facet, values):
+    """Q for products having any of ``values`` for ``facet``."""
+    if facet == 'price_band':
+        q = Q(pk__in=[])
+        for band in values:
+            q |= price_band_filter(band)
+        return q
+    if facet == 'in_stock':
+        return Q(quantity__gt=0) if values[0] else Q(quantity__lte=0)
+    return Q(**{f'{FACETS[facet]}__in': values})
+
+
+def facet_counts(queryset, selected):
+    """
+    ({facet: [{'value', 'count'}, ...]}, number of products matching every
+    selection) for ``queryset`` with the ``selected`` {facet: values} filters.
+    """
+    cells = list(
+        with_facet_columns(queryset.order_by())
+        .values_list(*FACETS.values())
+        .annotate(count=Count('id'))
+    )
+    positions = {facet: position for position, facet in enumerate(FACETS)}
+
+    def matches(cell, skip=None):
+        return all(
+            cell[positions[facet]] in values
+            for facet, values in selected.items()
+            if facet != skip
+        )
+
+    facets = {}
+    for facet, position in positions.items():
+        counts = Counter()
+        for cell in cells:
+            if matches(cell, skip=facet):
+                counts[cell[position]] += cell[-1]
+        facets[facet] = [
+            {'value': value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+        ]
+    total = sum(cell[-1] for cell in cells if matches(cell))
+    return facets, total
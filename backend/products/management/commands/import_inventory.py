@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from farms.models import Farm
+from products.importer import CHUNK_SIZE, ImportFileError, import_inventory, read_rows
+
+
+class Command(BaseCommand):
+    help = "Upsert a farm's products from a CSV or XLSX file, matching on product name"
+
+    def add_arguments(self, parser):
+        parser.add_argument('farm_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            farm = Farm.objects.get(pk=options['farm_id'])
+        except Farm.DoesNotExist:
+            raise CommandError(f"Farm {options['farm_id']} does not exist")
+
+        with open(options['path'], 'rb') as file:
+            try:
+                report = import_inventory(farm, read_rows(file, options['path']), options['chunk_size'])
+            except ImportFileError as e:
+                raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {'; '.join(error['errors'])}")
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f"... and {report['error_count'] - len(report['errors'])} more rows with errors")
+        self.stdout.write(
+            f"Created {report['created']}, updated {report['updated']}, skipped {report['error_count']} rows"
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 02:50
+
+from django.db import migrations, models
+from farms.migrations._sqlite_search import restore_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_catalog_indexes'),
+    ]
+
+    restore_search_triggers = restore_triggers('products_product')
+
+    operations = [
+        restore_search_triggers[0],
+        migrations.AddField(
+            model_name='product',
+            name='image_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        restore_search_triggers[1],
+    ]
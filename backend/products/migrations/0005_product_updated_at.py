@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:24
+
+import django.utils.timezone
+from django.db import migrations, models
+from farms.migrations._sqlite_search import restore_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_image_thumbnails'),
+    ]
+
+    restore_search_triggers = restore_triggers('products_product')
+
+    operations = [
+        restore_search_triggers[0],
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        restore_search_triggers[1],
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 from farms.models import Farm
 from django.core.validators import FileExtensionValidator
 from cloudinary.models import CloudinaryField
+from django.contrib.postgres.search import SearchVectorField
 
 class Product(models.Model):
     name = models.CharField(max_length=255)
@@ -17,6 +18,24 @@ class Product(models.Model):
         null=True,
         validators=[FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp'])]
     )
+    # {width: {format: url}}, filled in after upload, see agriconnect/thumbnails.py
+    image_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+    # Maintained by a database trigger on PostgreSQL, see farms/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Conditional GET validators for listings, see agriconnect/conditional.py
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Keyset pagination keys (see products/pagination.py), alone and under
+        # the farm and category filters
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['category', 'id'], name='product_category_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            models.Index(fields=['farm', 'price', 'id'], name='product_farm_price_idx'),
+            models.Index(fields=['farm', 'name', 'id'], name='product_farm_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -0,0 +1,94 @@
+# products/pagination.py
+"""
+Keyset pagination for product lists (and, with other sort fields, orders).
+
+Pages are ordered by one of sort_fields (optionally descending) with the
+primary key as tie-breaker, and each page continues after the (value, id)
+of the previous page's last row. With the composite indexes on Product,
+that is an index range scan no matter how deep the page is.
+"""
+import base64
+import json
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+SORT_FIELDS = ('id', 'price', 'name', 'category')
+
+
+def encode_cursor(sort, value, pk):
+    payload = json.dumps([sort, str(value), pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token):
+    try:
+        sort, value, pk = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return sort, value, int(pk)
+    except (TypeError, ValueError, UnicodeError) as exc:
+        raise ParseError('Invalid cursor') from exc
+
+
+class KeysetPagination(BasePagination):
+    default_page_size = 50
+    max_page_size = 200
+    sort_fields = SORT_FIELDS
+    default_sort = 'id'
+
+    def get_sort(self, request):
+        sort = request.query_params.get('sort', self.default_sort)
+        if sort.lstrip('-') not in self.sort_fields:
+            raise ParseError(f"sort must be one of: {', '.join(self.sort_fields)} (prefix with - for descending)")
+        return sort
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get('page_size', self.default_page_size))
+        except ValueError:
+            return self.default_page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        sort = self.get_sort(request)
+        field = sort.lstrip('-')
+        descending = sort.startswith('-')
+        page_size = self.get_page_size(request)
+        self.request = request
+        self.next_cursor = None
+
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            cursor_sort, value, pk = decode_cursor(cursor)
+            if cursor_sort != sort:
+                raise ParseError('Cursor was issued for a different sort')
+            after = 'lt' if descending else 'gt'
+            if field == 'id':
+                queryset = queryset.filter(**{f'id__{after}': pk})
+            else:
+                # (field, id) past (value, pk), with a plain bound on field so the index seeks to it
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{after}e': value}),
+                    Q(**{f'{field}__{after}': value}) | Q(**{f'id__{after}': pk}),
+                )
+
+        ordering = [sort] if field == 'id' else [sort, '-id' if descending else 'id']
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            # Rows are model instances, or dicts from a values() queryset
+            if isinstance(last, dict):
+                self.next_cursor = encode_cursor(sort, last[field], last['id'])
+            else:
+                self.next_cursor = encode_cursor(sort, getattr(last, field), last.pk)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), 'cursor', self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -1,5 +1,7 @@
 # products/serializers.py
+from functools import lru_cache
 from rest_framework import serializers
+from agriconnect.thumbnails import absolute_thumbnails
 from .models import Product
 from farms.models import Farm
 
@@ -16,6 +18,7 @@ class FarmSerializer(serializers.ModelSerializer):
 class ProductSerializer(serializers.ModelSerializer):
     farm = FarmSerializer(read_only=True)
     image = serializers.ImageField(required=False)
+    thumbnails = serializers.SerializerMethodField()
     price = serializers.DecimalField(
         max_digits=10, 
         decimal_places=2, 
@@ -24,9 +27,24 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'category', 'quantity', 'unit', 'price', 'image', 'farm']
+        fields = ['id', 'name', 'category', 'quantity', 'unit', 'price', 'image', 'thumbnails', 'farm']
         read_only_fields = ['id', 'farm']
 
+    # Everything the fields above read, joined and loaded in one query
+    select_related_fields = ['farm']
+    only_fields = [
+        *(field for field in Meta.fields if field not in ('farm', 'thumbnails')),
+        'image_thumbnails',
+        *(f'farm__{field}' for field in FarmSerializer.Meta.fields),
+    ]
+
+    @classmethod
+    def plan(cls, queryset):
+        return queryset.select_related(*cls.select_related_fields).only(*cls.only_fields)
+
+    def get_thumbnails(self, obj):
+        return absolute_thumbnails(obj.image_thumbnails, self.context.get('request'))
+
     def create(self, validated_data):
         # Automatically associate the product with the farm of the logged-in farmer
         farm = self.context['request'].user.farmer_profile.farm
@@ -36,4 +54,56 @@ class ProductSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         # Ensure the farm remains the same when updating
         validated_data['farm'] = instance.farm
-        return super().update(instance, validated_data)
\ No newline at end of file
+        return super().update(instance, validated_data)
+
+
+@lru_cache(maxsize=4096)
+def image_url(stored):
+    """Cloudinary delivery URL for a stored image value; listings repeat the same images."""
+    return Product._meta.get_field('image').to_python(stored).url
+
+
+class ProductValuesSerializer:
+    """
+    Read-only fast path producing the same output as ProductSerializer
+    from ``values()`` rows, without building model instances.
+    """
+    value_fields = [
+        'id', 'name', 'category', 'quantity', 'unit', 'price', 'image',
+        'image_thumbnails', 'farm_id', 'farm__name', 'farm__location', 'farm__rating',
+    ]
+    price_field = ProductSerializer._declared_fields['price']
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @classmethod
+    def plan(cls, queryset):
+        return queryset.values(*cls.value_fields)
+
+    @property
+    def data(self):
+        request = self.context.get('request')
+        results = []
+        for row in self.rows:
+            image = image_url(row['image']) if row['image'] else None
+            if image and request is not None:
+                image = request.build_absolute_uri(image)
+            results.append({
+                'id': row['id'],
+                'name': row['name'],
+                'category': row['category'],
+                'quantity': row['quantity'],
+                'unit': row['unit'],
+                'price': self.price_field.to_representation(row['price']),
+                'image': image,
+                'thumbnails': absolute_thumbnails(row['image_thumbnails'], request),
+                'farm': {
+                    'id': row['farm_id'],
+                    'name': row['farm__name'],
+                    'location': row['farm__location'],
+                    'rating': row['farm__rating'],
+                },
+            })
+        return results
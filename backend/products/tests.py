@@ -1,3 +1,516 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import time
+import warnings
+from contextlib import aclosing
+from decimal import Decimal
+from unittest import mock
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from openpyxl import Workbook, load_workbook
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import FarmerProfile
+from accounts.models import User
+from agriconnect.thumbnails import THUMBNAIL_WIDTHS, CloudinaryThumbnailStorage, delete_thumbnails, render_thumbnails
+from farms.models import Farm
+from . import exporter
+from .models import Product
+from .serializers import ProductSerializer, ProductValuesSerializer
 
-# Create your tests here.
+
+class FarmTestMixin:
+    """
+    Creates self.farmer and their farm, self.farm ('Green Acres' in Nakuru),
+    before each test, and the FarmerProfile linking them if
+    ``farmer_profile`` is set.
+    """
+    farmer_profile = False
+    farm_fields = {}
+
+    def setUp(self):
+        super().setUp()
+        self.farmer = User.objects.create_user(username='farmer', email='farmer@example.com', password='pass12345', user_type='farmer')
+        self.farm = Farm.objects.create(
+            name='Green Acres', location='Nakuru', description='Mixed farm', farmer=self.farmer, **self.farm_fields,
+        )
+        if self.farmer_profile:
+            FarmerProfile.objects.create(user=self.farmer, location='Nakuru', specialty='Mixed', farm=self.farm)
+
+
+class FacetSearchTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.nakuru = self.farm
+        self.kiambu = Farm.objects.create(name='Sunrise Dairy', location='Kiambu', description='Dairy', farmer=self.farmer)
+        for name, category, farm, price, quantity in [
+            ('Milk', 'Dairy', self.kiambu, '60', 10),
+            ('Goat Milk', 'Dairy', self.nakuru, '150', 0),
+            ('Cheese', 'Dairy', self.kiambu, '900', 3),
+            ('Tomatoes', 'Vegetables', self.nakuru, '80', 25),
+            ('Kale', 'Vegetables', self.nakuru, '30', 0),
+            ('Honey', 'Pantry', self.kiambu, '1200', 4),
+        ]:
+            Product.objects.create(name=name, category=category, farm=farm, price=Decimal(price), quantity=quantity)
+
+    def search(self, **params):
+        return self.client.get('/api/products/search/', params).json()
+
+    def counts(self, response, facet):
+        return {entry['value']: entry['count'] for entry in response['facets'][facet]}
+
+    def test_counts_every_facet_for_the_unfiltered_catalog(self):
+        response = self.search()
+        self.assertEqual(response['count'], 6)
+        self.assertEqual(self.counts(response, 'category'), {'Dairy': 3, 'Vegetables': 2, 'Pantry': 1})
+        self.assertEqual(self.counts(response, 'location'), {'Nakuru': 3, 'Kiambu': 3})
+        self.assertEqual(self.counts(response, 'price_band'), {'under-100': 3, '100-500': 1, '500-1000': 1, '1000-plus': 1})
+        self.assertEqual(self.counts(response, 'in_stock'), {True: 4, False: 2})
+
+    def test_selections_narrow_other_facets_but_not_their_own(self):
+        response = self.search(category='Dairy', in_stock='true')
+        self.assertEqual([product['name'] for product in response['results']], ['Cheese', 'Milk'])
+        self.assertEqual(response['count'], 2)
+        # Category counts ignore the category selection, but respect in_stock
+        self.assertEqual(self.counts(response, 'category'), {'Dairy': 2, 'Vegetables': 1, 'Pantry': 1})
+        self.assertEqual(self.counts(response, 'in_stock'), {True: 2, False: 1})
+        self.assertEqual(self.counts(response, 'location'), {'Kiambu': 2})
+
+        response = self.search(price_band=['under-100', '1000-plus'], location='Kiambu')
+        self.assertEqual([product['name'] for product in response['results']], ['Honey', 'Milk'])
+
+    def test_text_query_and_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.search(q='milk')
+        self.assertEqual(sorted(product['name'] for product in response['results']), ['Goat Milk', 'Milk'])
+        self.assertEqual(self.counts(response, 'location'), {'Nakuru': 1, 'Kiambu': 1})
+
+    def test_pages_follow_next_with_the_selections(self):
+        page = self.search(category=['Dairy', 'Pantry'], page_size=2)
+        names = [product['name'] for product in page['results']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            names += [product['name'] for product in page['results']]
+            self.assertEqual(page['count'], 4)
+        self.assertEqual(names, ['Cheese', 'Goat Milk', 'Honey', 'Milk'])
+        self.assertEqual(self.client.get('/api/products/search/', {'cursor': 'nonsense'}).status_code, 400)
+
+    def test_invalid_facet_values_are_rejected(self):
+        self.assertEqual(self.client.get('/api/products/search/', {'price_band': 'cheap'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/search/', {'in_stock': 'maybe'}).status_code, 400)
+
+
+class ProductListTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        other = Farm.objects.create(name='Sunrise Dairy', location='Kiambu', description='Dairy', farmer=self.farmer)
+        Product.objects.bulk_create(
+            Product(
+                name=f'Item {i % 7}', category=['Dairy', 'Fruit', 'Grain'][i % 3], farm=self.farm if i % 4 else other,
+                price=Decimal(10 * (i % 5)), quantity=i % 2,
+            )
+            for i in range(60)
+        )
+
+    def all_pages(self, url, **params):
+        page = self.client.get(url, params).json()
+        results = page['results']
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            results += page['results']
+        return results
+
+    def test_pages_follow_each_sort_order_without_gaps(self):
+        products = list(Product.objects.all())
+        for sort in ('id', 'price', '-price', 'name', 'category', '-category'):
+            field = sort.lstrip('-')
+            expected = sorted(products, key=lambda product: (getattr(product, field), product.id), reverse=sort.startswith('-'))
+            paged = self.all_pages('/api/products/', sort=sort, page_size=7)
+            self.assertEqual([product['id'] for product in paged], [product.id for product in expected], sort)
+
+    def test_later_pages_seek_instead_of_offsetting(self):
+        first = self.client.get('/api/products/', {'sort': 'price', 'page_size': 10}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first['next'])
+        self.assertNotIn('OFFSET', queries.captured_queries[0]['sql'].upper())
+
+    def test_filters(self):
+        results = self.all_pages('/api/products/', category=['Dairy', 'Fruit'], min_price='10', max_price='30', in_stock='true')
+        expected = Product.objects.filter(category__in=['Dairy', 'Fruit'], price__gte=10, price__lte=30, quantity__gt=0)
+        self.assertCountEqual([product['id'] for product in results], expected.values_list('id', flat=True))
+
+        farm_results = self.all_pages(f'/api/farms/{self.farm.id}/products/', sort='-price', category='Grain')
+        self.assertCountEqual(
+            [product['id'] for product in farm_results],
+            Product.objects.filter(farm=self.farm, category='Grain').values_list('id', flat=True),
+        )
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/products/', {'sort': 'quantity'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/', {'min_price': 'cheap'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'bogus'}).status_code, 400)
+        cursor = self.client.get('/api/products/', {'sort': 'price', 'page_size': 5}).json()['next']
+        self.assertEqual(self.client.get(cursor.replace('sort=price', 'sort=name')).status_code, 400)
+
+
+class ProductSerializationTests(FarmTestMixin, TestCase):
+    farm_fields = {'rating': 4.5}
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cloudinary.config, cloud_name=cloudinary.config().cloud_name)
+        cloudinary.config(cloud_name='demo')
+
+    def add_products(self, count):
+        Product.objects.bulk_create(
+            Product(name=f'Item {i}', farm=self.farm, price=Decimal('12.5'), quantity=i,
+                    image=f'image/upload/v1/products/item{i}.jpg' if i % 2 else None)
+            for i in range(count)
+        )
+
+    def test_list_query_count_is_fixed(self):
+        # The conditional GET validators, then the page
+        self.add_products(5)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.client.get('/api/products/', {'page_size': 200}).json()['results']), 5)
+        self.add_products(150)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.client.get('/api/products/', {'page_size': 200}).json()['results']), 155)
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/farms/{self.farm.id}/products/', {'page_size': 200})
+
+    def test_values_serializer_matches_model_serializer(self):
+        self.add_products(4)
+        queryset = Product.objects.order_by('id')
+        with self.assertNumQueries(1):
+            expected = ProductSerializer(ProductSerializer.plan(queryset), many=True).data
+        self.assertEqual(ProductValuesSerializer(ProductValuesSerializer.plan(queryset)).data, expected)
+
+
+class ConditionalListTests(FarmTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.milk = Product.objects.create(name='Milk', category='Dairy', farm=self.farm, price=Decimal('50'), quantity=3)
+        self.kale = Product.objects.create(name='Kale', category='Vegetables', farm=self.farm, price=Decimal('30'), quantity=8)
+
+    def assertNotModified(self, url, response, **params):
+        with self.assertNumQueries(1):
+            repeat = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b'')
+        self.assertEqual(repeat['ETag'], response['ETag'])
+
+    def test_unchanged_lists_are_not_modified(self):
+        for url in ('/api/products/', f'/api/farms/{self.farm.id}/products/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotModified(url, response)
+
+    def test_validators_follow_edits_deletes_and_farms(self):
+        url = '/api/products/'
+        etags = {self.client.get(url)['ETag']}
+        filtered = self.client.get(url, {'category': 'Dairy'})
+        self.assertNotModified(url, filtered, category='Dairy')
+
+        self.kale.price = Decimal('35')
+        self.kale.save()
+        etags.add(self.client.get(url)['ETag'])
+        self.farm.name = 'Green Acres Ltd'
+        self.farm.save()  # Listings embed the farm
+        etags.add(self.client.get(url)['ETag'])
+        self.kale.delete()
+        etags.add(self.client.get(url)['ETag'])
+        self.assertEqual(len(etags), 4)
+
+    def test_if_modified_since_alone_never_hides_a_delete(self):
+        url = '/api/products/'
+        self.client.get(url)
+        self.kale.delete()  # Milk's updated_at is still the newest
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual([product['name'] for product in response.json()['results']], ['Milk'])
+
+    def test_import_changes_the_validators(self):
+        from .importer import import_inventory
+
+        etag = self.client.get('/api/products/')['ETag']
+        import_inventory(self.farm, [(2, {'name': 'Milk', 'quantity': '9'})])
+        self.assertNotEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+def image_file(size, mode='RGB', image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 80, 40, 128) if mode == 'RGBA' else (200, 80, 40)).save(buffer, image_format)
+    buffer.seek(0)
+    return buffer
+
+
+class ThumbnailTests(FarmTestMixin, TestCase):
+    farmer_profile = True
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=media_root.name, MEDIA_URL='/media/', THUMBNAIL_WORKERS=0,
+            THUMBNAIL_STORAGE='django.core.files.storage.FileSystemStorage',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media_root = media_root.name
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+        self.addCleanup(cloudinary.config, cloud_name=cloudinary.config().cloud_name)
+        cloudinary.config(cloud_name='demo')
+
+    def test_renders_each_width_and_format_without_upscaling(self):
+        thumbnails = render_thumbnails(image_file((1000, 500), 'RGBA'), 'products/abc')
+        self.assertEqual(set(thumbnails), {str(width) for width in THUMBNAIL_WIDTHS})
+        self.assertEqual(thumbnails['320']['webp'], '/media/products/abc/320.webp')
+        with Image.open(os.path.join(self.media_root, 'products/abc/320.webp')) as image:
+            self.assertEqual((image.format, image.size, image.mode), ('WEBP', (320, 160), 'RGBA'))
+        with Image.open(os.path.join(self.media_root, 'products/abc/640.jpeg')) as image:
+            self.assertEqual((image.format, image.size, image.mode), ('JPEG', (640, 320), 'RGB'))
+
+        render_thumbnails(image_file((200, 100)), 'products/small')
+        with Image.open(os.path.join(self.media_root, 'products/small/640.webp')) as image:
+            self.assertEqual(image.size, (200, 100))
+
+    def test_upload_is_rendered_after_commit(self):
+        uploaded = CloudinaryResource('products/tomatoes', format='png', version='1', type='upload', resource_type='image')
+        upload = SimpleUploadedFile('tomatoes.png', image_file((800, 800)).getvalue(), content_type='image/png')
+        with mock.patch('cloudinary.uploader.upload_resource', return_value=uploaded):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/products/', {
+                    'name': 'Tomatoes', 'category': 'Vegetables', 'quantity': 5, 'unit': 'kg',
+                    'price': '80.00', 'image': upload,
+                }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['thumbnails'], {})  # Not rendered until the transaction commits
+
+        product = Product.objects.get(name='Tomatoes')
+        self.assertEqual(product.image_thumbnails['160'], {
+            'webp': '/media/products/tomatoes/160.webp', 'jpeg': '/media/products/tomatoes/160.jpeg',
+        })
+        listed = self.client.get('/api/products/').json()['results'][0]
+        self.assertEqual(listed['thumbnails']['160']['webp'], 'http://testserver/media/products/tomatoes/160.webp')
+
+        # Clearing the image drops its thumbnails
+        product.image = None
+        product.save()
+        product.refresh_from_db()
+        self.assertEqual(product.image_thumbnails, {})
+
+    def test_rolled_back_upload_leaves_no_temporary_file(self):
+        uploaded = CloudinaryResource('products/kale', format='png', version='1', type='upload', resource_type='image')
+        upload = SimpleUploadedFile('kale.png', image_file((400, 400)).getvalue(), content_type='image/png')
+        spooled = set(os.listdir(tempfile.gettempdir()))
+        with mock.patch('cloudinary.uploader.upload_resource', return_value=uploaded), \
+                mock.patch('agriconnect.thumbnails.submit') as submit:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Product.objects.create(name='Kale', category='Vegetables', farm=self.farm, price=Decimal('20'), image=upload)
+                raise RuntimeError
+        submit.assert_not_called()
+        self.assertEqual(set(os.listdir(tempfile.gettempdir())) - spooled, set())
+
+    def test_cloudinary_storage_uploads_next_to_the_original(self):
+        storage = CloudinaryThumbnailStorage()
+        with mock.patch('cloudinary.uploader.upload') as upload, mock.patch('cloudinary.uploader.destroy') as destroy:
+            thumbnails = render_thumbnails(image_file((800, 400)), 'products/abc', storage=storage)
+            delete_thumbnails('products/abc', storage=storage)
+        self.assertEqual(thumbnails['160']['webp'], 'https://res.cloudinary.com/demo/image/upload/v1/products/abc/160.webp')
+        self.assertEqual(upload.call_count, len(THUMBNAIL_WIDTHS) * 2)
+        self.assertEqual(upload.call_args.kwargs, {
+            'public_id': 'products/abc/160', 'format': 'jpeg', 'resource_type': 'image',
+            'overwrite': True, 'invalidate': True,
+        })
+        destroy.assert_any_call('products/abc/320', resource_type='image', invalidate=True)
+        self.assertEqual(destroy.call_count, len(THUMBNAIL_WIDTHS) * 2)
+
+
+class InventoryImportTests(FarmTestMixin, TestCase):
+    farmer_profile = True
+
+    def setUp(self):
+        super().setUp()
+        self.milk = Product.objects.create(name='Milk', category='Dairy', farm=self.farm, price=Decimal('50'), quantity=3)
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def upload(self, name, content):
+        return self.client.post('/api/products/inventory/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_csv_upserts_by_name_and_reports_bad_rows(self):
+        content = (
+            'Name,Category,Quantity,Unit,Price,Notes\n'
+            'Milk,,12,litre,55.5,restocked\n'
+            'Eggs,Poultry,30,tray,420,\n'
+            ',Fruit,1,kg,10,\n'
+            'Honey,Pantry,-2,jar,abc,\n'
+            '\n'
+            'Kale,Vegetables,,bunch,20,\n'
+        ).encode()
+        self.assertEqual(self.client.get('/api/search/', {'q': 'eggs'}).json()['results'], [])
+        response = self.upload('inventory.csv', content)
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (2, 1, 2))
+        self.assertEqual(report['errors'], [
+            {'row': 4, 'errors': ['name is required']},
+            {'row': 5, 'errors': ['quantity must be a number of at least 0', 'price must be a number']},
+        ])
+
+        self.milk.refresh_from_db()
+        self.assertEqual((self.milk.category, self.milk.quantity, self.milk.unit, self.milk.price), ('Dairy', 12, 'litre', Decimal('55.50')))
+        self.assertEqual(Product.objects.get(name='Kale').quantity, 0)
+        self.assertEqual(Product.objects.filter(farm=self.farm).count(), 3)
+        # Bulk writes send no signals, so the import invalidates cached searches itself
+        self.assertEqual(self.client.get('/api/search/', {'q': 'eggs'}).json()['results'][0]['name'], 'Eggs')
+
+    def test_xlsx_import_and_chunked_query_count(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['name', 'price', 'quantity'])
+        for i in range(250):
+            sheet.append([f'Item {i}', i, 1])
+        sheet.append(['Milk', 60, 9])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        with CaptureQueriesContext(connection) as queries:
+            report = self.upload('inventory.xlsx', buffer.getvalue()).json()
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (250, 1, 0))
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.price, Decimal('60.00'))
+        # A couple of statements per 1000-row chunk, not per row
+        self.assertLess(len(queries), 15)
+
+    def test_updates_every_known_row_with_its_own_values(self):
+        Product.objects.bulk_create([
+            Product(name=f'Item {i}', category='Old', farm=self.farm, price=Decimal('1'), quantity=1) for i in range(3)
+        ])
+        content = 'name,category,price,quantity,unit\n' + ''.join(f'Item {i},New {i},{i}.5,{i * 10},kg\n' for i in range(3))
+        report = self.upload('inventory.csv', content.encode()).json()
+        self.assertEqual((report['created'], report['updated']), (0, 3))
+        self.assertEqual(
+            list(Product.objects.filter(name__startswith='Item').order_by('name').values_list('category', 'price', 'quantity', 'unit')),
+            [(f'New {i}', Decimal(f'{i}.50'), i * 10, 'kg') for i in range(3)],
+        )
+        self.milk.refresh_from_db()
+        self.assertEqual((self.milk.category, self.milk.quantity), ('Dairy', 3))
+
+    def test_rejects_unreadable_files(self):
+        self.assertEqual(self.upload('inventory.txt', b'name\nMilk\n').status_code, 400)
+        self.assertEqual(self.upload('inventory.csv', b'product,price\nMilk,1\n').status_code, 400)
+        self.assertEqual(self.upload('inventory.xlsx', b'not a workbook').status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('name,price\nMilk,70\nButter,300\n')
+        self.addCleanup(os.remove, file.name)
+        out = io.StringIO()
+        call_command('import_inventory', self.farm.id, file.name, '--chunk-size', '1', stdout=out)
+        self.assertIn('Created 1, updated 1, skipped 0 rows', out.getvalue())
+        self.assertEqual(Product.objects.get(name='Butter').price, Decimal('300.00'))
+
+
+class ExportTests(FarmTestMixin, TestCase):
+    farmer_profile = True
+
+    def setUp(self):
+        super().setUp()
+        other = Farm.objects.create(name='Sunrise Dairy', location='Kiambu', description='Dairy', farmer=self.farmer)
+        Product.objects.bulk_create(
+            Product(name=f'Item {i:04}', category='Grain', farm=self.farm, price=Decimal('9.99'), quantity=i, unit='kg')
+            for i in range(1200)
+        )
+        Product.objects.create(name='Milk', category='Dairy', farm=other, price=Decimal('60'), quantity=5)
+        self.token = str(AccessToken.for_user(self.farmer))
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def test_inventory_csv_streams_in_chunks_and_reimports(self):
+        response = self.client.get('/api/products/inventory/export/csv/')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="inventory-', response['Content-Disposition'])
+        chunks = list(response.streaming_content)
+        self.assertEqual(chunks[0], b'name,category,quantity,unit,price\r\n')
+        self.assertGreater(len(chunks), 3)
+
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), 1201)
+        self.assertEqual(lines[1], 'Item 0000,Grain,0.0,kg,9.99')
+
+        report = self.client.post(
+            '/api/products/inventory/import/',
+            {'file': SimpleUploadedFile('inventory.csv', b''.join(chunks))}, format='multipart',
+        ).json()
+        self.assertEqual((report['created'], report['updated'], report['error_count']), (0, 1200, 0))
+
+    async def test_csv_streams_through_the_asgi_handler(self):
+        produced = []
+
+        def counted_chunks(header, rows):
+            for chunk in csv_chunks(header, rows):
+                produced.append(chunk)
+                yield chunk
+
+        csv_chunks = exporter.csv_chunks
+        with mock.patch('products.exporter.csv_chunks', counted_chunks):
+            response = await self.async_client.get(
+                '/api/products/inventory/export/csv/', headers={'authorization': f'Bearer {self.token}'},
+            )
+        self.assertTrue(response.is_async)
+
+        # Read as the ASGI handler does; a sync iterator would be listed first, with a warning
+        sent = []
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            async with aclosing(aiter(response)) as content:
+                async for chunk in content:
+                    sent.append((chunk, len(produced)))
+        self.assertEqual([produced_so_far for _, produced_so_far in sent], list(range(1, len(produced) + 1)))
+        self.assertEqual(len(b''.join(chunk for chunk, _ in sent).decode().splitlines()), 1201)
+
+    def test_catalog_xlsx_with_filters(self):
+        response = self.client.get('/api/products/export/xlsx/', {'category': 'Dairy'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows, [
+            ('name', 'category', 'quantity', 'unit', 'price', 'farm', 'location'),
+            ('Milk', 'Dairy', 5, 'unit', 60, 'Sunrise Dairy', 'Kiambu'),
+        ])
+
+    def test_formulas_are_escaped_and_reimport_unchanged(self):
+        Product.objects.create(name='=HYPERLINK("http://x")', category='@Dairy', farm=self.farm, price=Decimal('1'), quantity=1)
+        response = self.client.get('/api/products/inventory/export/csv/')
+        content = b''.join(response.streaming_content)
+        self.assertIn(b'"\'=HYPERLINK(""http://x"")",\'@Dairy,1.0,unit,1.00', content)
+
+        response = self.client.get('/api/products/inventory/export/xlsx/')
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertIn(('\'=HYPERLINK("http://x")', "'@Dairy", 1, 'unit', 1), rows)
+
+        report = self.client.post(
+            '/api/products/inventory/import/',
+            {'file': SimpleUploadedFile('inventory.csv', content)}, format='multipart',
+        ).json()
+        self.assertEqual((report['created'], report['error_count']), (0, 0))
+        self.assertEqual(Product.objects.get(farm=self.farm, name='=HYPERLINK("http://x")').category, '@Dairy')
+
+    def test_unknown_format_and_anonymous_access(self):
+        self.assertEqual(self.client.get('/api/products/export/pdf/').status_code, 404)
+        self.assertEqual(APIClient().get('/api/products/inventory/export/csv/').status_code, 401)
@@ -1,9 +1,13 @@
 # products/urls.py
 from django.urls import path
-from .views import ProductListCreateView, ProductDetailView, FarmerInventoryView
+from .views import ProductListCreateView, ProductDetailView, FarmerInventoryView, ProductFacetSearchView, InventoryImportView, InventoryExportView, CatalogExportView
 
 urlpatterns = [
     path('', ProductListCreateView.as_view(), name='product-list-create'),
     path('<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('inventory/', FarmerInventoryView.as_view(), name='farmer-inventory'),
+    path('search/', ProductFacetSearchView.as_view(), name='product-facet-search'),
+    path('inventory/import/', InventoryImportView.as_view(), name='inventory-import'),
+    path('inventory/export/<str:file_format>/', InventoryExportView.as_view(), name='inventory-export'),
+    path('export/<str:file_format>/', CatalogExportView.as_view(), name='catalog-export'),
 ]
\ No newline at end of file
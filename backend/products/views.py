@@ -1,10 +1,60 @@
 # products/views.py
+import csv
+import zipfile
+from django.core.handlers.asgi import ASGIRequest
 from rest_framework import generics, permissions
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductSerializer, ProductValuesSerializer
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from farms.search import product_filter
+from .facets import FACETS, PRICE_BANDS, facet_counts, facet_filter
+from .pagination import KeysetPagination
+from decimal import Decimal, InvalidOperation
+from rest_framework.exceptions import ParseError
+from agriconnect.conditional import list_validators, not_modified, set_validators
+from .importer import ImportFileError, import_inventory, read_rows
+from .exporter import CATALOG_COLUMNS, FORMATS, INVENTORY_COLUMNS, export_response
 
-class ProductListCreateView(generics.ListCreateAPIView):
+
+def filter_products(queryset, params):
+    """Apply the ?category= (repeatable), ?min_price=, ?max_price= and ?in_stock=true filters."""
+    categories = [category for category in params.getlist('category') if category]
+    if categories:
+        queryset = queryset.filter(category__in=categories)
+    for param, lookup in (('min_price', 'price__gte'), ('max_price', 'price__lte')):
+        if params.get(param):
+            try:
+                queryset = queryset.filter(**{lookup: Decimal(params[param])})
+            except InvalidOperation:
+                raise ParseError(f'{param} must be a number')
+    if params.get('in_stock', '').lower() in ('true', '1'):
+        queryset = queryset.filter(quantity__gt=0)
+    return queryset
+
+
+class ProductListMixin:
+    """Keyset-paginated product lists with the filter_products() filters."""
+    pagination_class = KeysetPagination
+
+    def filter_queryset(self, queryset):
+        return filter_products(queryset, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Listings embed each product's farm, so farm edits change the validators too
+        etag = list_validators(queryset, related=('farm',))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        # Listings are read straight from values() rows: one query per page, no model instances
+        page = self.paginate_queryset(ProductValuesSerializer.plan(queryset))
+        response = self.get_paginated_response(ProductValuesSerializer(page, context=self.get_serializer_context()).data)
+        return set_validators(response, etag)
+
+class ProductListCreateView(ProductListMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]
@@ -31,15 +81,124 @@ class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
         if self.request.user.is_authenticated and hasattr(self.request.user, 'farmer_profile'):
             # For authenticated farmers, only show their own products
             farm = self.request.user.farmer_profile.farm
-            return Product.objects.filter(farm=farm)
+            return Product.objects.filter(farm=farm).select_related('farm')
         # For unauthenticated users or non-farmers, show all products
-        return Product.objects.all()
+        return Product.objects.select_related('farm')
     
-class FarmerInventoryView(generics.ListAPIView):
+class FarmerInventoryView(ProductListMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
         # Only return products for the logged-in farmer's farm
-        return Product.objects.filter(farm=self.request.user.farmer_profile.farm)
\ No newline at end of file
+        return Product.objects.filter(farm=self.request.user.farmer_profile.farm)
+
+class FacetSearchPagination(KeysetPagination):
+    """Search results by name, or ?sort= price or category."""
+    default_page_size = 20
+    max_page_size = 50
+    sort_fields = ('name', 'price', 'category')
+    default_sort = 'name'
+
+class ProductFacetSearchView(APIView):
+    """
+    Products matching ``q`` and any facet selections, plus counts per facet
+    value. Facets can be repeated, e.g. ?category=Dairy&category=Fruit.
+    Results are keyset paginated; follow ``next`` for the following page.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get_selected(self, params):
+        selected = {}
+        for facet in FACETS:
+            values = [value for value in params.getlist(facet) if value != '']
+            if not values:
+                continue
+            if facet == 'in_stock':
+                if values[-1].lower() not in ('true', 'false', '1', '0'):
+                    raise ValueError('in_stock must be true or false')
+                values = [values[-1].lower() in ('true', '1')]
+            elif facet == 'price_band':
+                bands = [name for name, _, _ in PRICE_BANDS]
+                if any(value not in bands for value in values):
+                    raise ValueError(f"price_band must be one of: {', '.join(bands)}")
+            selected[facet] = values
+        return selected
+
+    def get(self, request):
+        try:
+            selected = self.get_selected(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        matching = Product.objects.filter(product_filter(request.query_params.get('q', '')))
+        facets, count = facet_counts(matching, selected)
+
+        for facet, values in selected.items():
+            matching = matching.filter(facet_filter(facet, values))
+        paginator = FacetSearchPagination()
+        products = paginator.paginate_queryset(ProductSerializer.plan(matching), request, view=self)
+
+        return Response({
+            'count': count,
+            'next': paginator.get_next_link(),
+            'results': ProductSerializer(products, many=True, context={'request': request}).data,
+            'facets': facets,
+        })
+
+
+class InventoryImportView(APIView):
+    """
+    Upsert the farmer's products from an uploaded CSV or XLSX ``file`` with
+    a name column and optional category, quantity, unit and price columns.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        try:
+            farm = request.user.farmer_profile.farm
+        except AttributeError:
+            return Response({'error': 'User does not have a farmer profile.'}, status=status.HTTP_403_FORBIDDEN)
+        if farm is None:
+            return Response({'error': 'No farm associated with this user.'}, status=status.HTTP_404_NOT_FOUND)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Attach the inventory as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = import_inventory(farm, read_rows(upload.file, upload.name))
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (UnicodeDecodeError, csv.Error, zipfile.BadZipFile):
+            return Response({'error': 'The file could not be read'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+
+def is_asgi(request):
+    return isinstance(request._request, ASGIRequest)
+
+class InventoryExportView(APIView):
+    """The farmer's products as a CSV or XLSX download, in the import column layout."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, file_format):
+        if file_format not in FORMATS:
+            return Response({'error': 'Export as csv or xlsx'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            farm = request.user.farmer_profile.farm
+        except AttributeError:
+            return Response({'error': 'User does not have a farmer profile.'}, status=status.HTTP_403_FORBIDDEN)
+        products = Product.objects.filter(farm=farm).order_by('name', 'id')
+        return export_response(products, INVENTORY_COLUMNS, file_format, 'inventory', is_asgi(request))
+
+class CatalogExportView(APIView):
+    """The whole catalog, or the filter_products() subset of it, as a CSV or XLSX download."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, file_format):
+        if file_format not in FORMATS:
+            return Response({'error': 'Export as csv or xlsx'}, status=status.HTTP_404_NOT_FOUND)
+        products = filter_products(Product.objects.all(), request.query_params).order_by('id')
+        return export_response(products, CATALOG_COLUMNS, file_format, 'catalog', is_asgi(request))
@@ -30,15 +30,17 @@ const InventoryPreview: React.FC = () => {
           headers: {
             Authorization: `Bearer ${localStorage.getItem("token")}`,
           },
+          // The preview shows five, so one page of five is enough
+          params: { page_size: 5 },
         });
 
-        if (response.data.length === 0) {
+        if (response.data.results.length === 0) {
           setProducts([]);
           return;
         }
 
         // Process products to ensure image URLs are complete
-        const processedProducts = response.data.map((product: any) => ({
+        const processedProducts = response.data.results.map((product: any) => ({
           ...product,
           image: product.image
             ? product.image.startsWith("http")
@@ -47,7 +49,7 @@ const InventoryPreview: React.FC = () => {
             : null,
         }));
 
-        setProducts(processedProducts.slice(0, 5));
+        setProducts(processedProducts);
       } catch (err) {
         console.error("Error fetching products:", err);
         setError("Failed to load inventory. Please try again.");
@@ -7,9 +7,11 @@ mapboxgl.accessToken = 'YOUR_MAPBOX_ACCESS_TOKEN';
 
 interface MapboxViewProps {
   coordinates: [number, number][];
+  // Where to put markers; every coordinate if not given
+  markers?: [number, number][];
 }
 
-const MapboxView = ({ coordinates }: MapboxViewProps) => {
+const MapboxView = ({ coordinates, markers = coordinates }: MapboxViewProps) => {
   const mapContainer = useRef<HTMLDivElement>(null);
   const map = useRef<mapboxgl.Map | null>(null);
 
@@ -25,7 +27,7 @@ const MapboxView = ({ coordinates }: MapboxViewProps) => {
     });
 
     // Add markers
-    coordinates.forEach(coord => {
+    markers.forEach(coord => {
       new mapboxgl.Marker()
         .setLngLat(coord)
         .addTo(map.current!);
@@ -65,7 +67,7 @@ const MapboxView = ({ coordinates }: MapboxViewProps) => {
     return () => {
       map.current?.remove();
     };
-  }, [coordinates]);
+  }, [coordinates, markers]);
 
   return (
     <div 
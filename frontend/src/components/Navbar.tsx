@@ -58,7 +58,7 @@ const Navbar: React.FC = () => {
       const response = await axios.get('/api/search/', {
         params: { q: searchQuery },
       });
-      setSearchResults(response.data);
+      setSearchResults(response.data.results);
     } catch (error) {
       console.error('Search failed:', error);
       setSearchResults([]);
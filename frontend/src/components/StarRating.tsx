@@ -1,43 +1,31 @@
 import React, { useState, useEffect } from 'react';
 import { Star } from 'lucide-react';
 import axios from 'axios';
+import { RatingInfo } from '../utils/ratings';
 
 interface StarRatingProps {
   farmId: string;
-  initialRating: number;
-  initialTotalRatings: number;
-  onRatingSubmit: (rating: number, totalRatings: number) => void;
+  // Fetched by the page for all its farms at once, see fetchRatingInfo()
+  ratingInfo: RatingInfo;
+  onRatingSubmit: (ratingInfo: RatingInfo) => void;
 }
 
 const StarRating: React.FC<StarRatingProps> = ({ 
   farmId, 
-  initialRating, 
-  initialTotalRatings, 
+  ratingInfo, 
   onRatingSubmit 
 }) => {
-  const [averageRating, setAverageRating] = useState(initialRating);
-  const [totalRatings, setTotalRatings] = useState(initialTotalRatings);
-  const [userRating, setUserRating] = useState<number | null>(null);
+  const [averageRating, setAverageRating] = useState(ratingInfo.averageRating || 0);
+  const [totalRatings, setTotalRatings] = useState(ratingInfo.totalRatings || 0);
+  const [userRating, setUserRating] = useState<number | null>(ratingInfo.userRating || null);
   const [isLoading, setIsLoading] = useState(false);
 
-  // Fetch rating data on component mount
+  // Follow the page's rating info when it arrives or is refreshed
   useEffect(() => {
-    const fetchRatingData = async () => {
-      try {
-        const response = await axios.get(`/api/farms/${farmId}/rating-info/`);
-        setAverageRating(response.data.averageRating || 0);
-        setTotalRatings(response.data.totalRatings || 0);
-        setUserRating(response.data.userRating || null);
-      } catch (error) {
-        console.error('Failed to fetch rating data:', error);
-        // Fall back to initial props if API fails
-        setAverageRating(initialRating);
-        setTotalRatings(initialTotalRatings);
-      }
-    };
-
-    fetchRatingData();
-  }, [farmId]);
+    setAverageRating(ratingInfo.averageRating || 0);
+    setTotalRatings(ratingInfo.totalRatings || 0);
+    setUserRating(ratingInfo.userRating || null);
+  }, [ratingInfo]);
 
   const handleStarClick = async (star: number) => {
     if (isLoading) return;
@@ -52,7 +40,11 @@ const StarRating: React.FC<StarRatingProps> = ({
       setAverageRating(response.data.averageRating);
       setTotalRatings(response.data.totalRatings);
       setUserRating(isRemoving ? null : star);
-      onRatingSubmit(response.data.averageRating, response.data.totalRatings);
+      onRatingSubmit({
+        averageRating: response.data.averageRating,
+        totalRatings: response.data.totalRatings,
+        userRating: isRemoving ? null : star,
+      });
     } catch (error) {
       console.error('Failed to submit rating:', error);
       if (axios.isAxiosError(error)) {
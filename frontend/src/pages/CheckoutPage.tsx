@@ -170,15 +170,9 @@ const CheckoutPage = () => {
       return;
     }
 
-    if (!items[0].product.farm?.id) {
-      showAlert("Error", "Products must belong to a farm");
-      setIsSubmitting(false);
-      return;
-    }
-
     try {
+      // The cart may hold products from several farms; the server places one order per farm
       const orderData = {
-        farm_id: items[0].product.farm.id,
         shipping_address: JSON.stringify({
           street: shippingDetails.addressDetails.street,
           city: shippingDetails.addressDetails.city,
@@ -193,21 +187,24 @@ const CheckoutPage = () => {
         })),
       };
 
-      const response = await axios.post("/api/orders/", orderData, {
+      const response = await axios.post("/api/orders/checkout/", orderData, {
         headers: {
           "Content-Type": "application/json",
           Authorization: `Bearer ${localStorage.getItem("token")}`,
         },
       });
 
-      if (response.data && response.data.order_number) {
-        setOrderNumber(response.data.order_number);
+      if (response.data && response.data.orders?.length) {
+        const orderNumbers = response.data.orders
+          .map((order: { order_number: string }) => order.order_number)
+          .join(", ");
+        setOrderNumber(orderNumbers);
         setOrderPlaced(true);
         clearCart();
 
         const newOrder = {
-          id: response.data.id,
-          orderNumber: response.data.order_number,
+          id: response.data.orders[0].id,
+          orderNumber: orderNumbers,
           date: new Date().toISOString(),
           items: items.map((item: CartItem) => ({
             product: {
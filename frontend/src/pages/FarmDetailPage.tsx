@@ -2,8 +2,10 @@ import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
 import { Star, MapPin, Calendar, ArrowLeft, ShoppingCart } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../utils/pagination';
 import { Farm } from '../contexts/AuthContext';
 import StarRating from '../components/StarRating';
+import { fetchRatingInfo, RatingInfo } from '../utils/ratings';
 
 export interface Product {
   id: string;
@@ -26,8 +28,7 @@ const FarmDetailPage: React.FC = () => {
   const [loading, setLoading] = useState(!location.state?.farm);
   const [error, setError] = useState<string | null>(null);
   const [products, setProducts] = useState<Product[]>([]);
-  const [rating, setRating] = useState(0);
-  const [totalRatings, setTotalRatings] = useState(0);
+  const [ratingInfo, setRatingInfo] = useState<RatingInfo>({ averageRating: 0, totalRatings: 0, userRating: null });
 
   // Fetch farm details and products
   useEffect(() => {
@@ -53,12 +54,15 @@ const FarmDetailPage: React.FC = () => {
           farm_image: getImageUrl(farmData.farm_image)
         });
         
-        setRating(farmData.rating);
-        setTotalRatings(farmData.ratings?.length || 0);
-  
-        // Fetch products for the farm
-        const productsResponse = await axios.get(`/api/farms/${farmId}/products/`);
-        setProducts(productsResponse.data);
+        // Fetch the farm's rating info and products
+        const [ratings, farmProducts] = await Promise.all([
+          fetchRatingInfo([farmId!]),
+          fetchAllPages<Product>(`/api/farms/${farmId}/products/`),
+        ]);
+        if (ratings[farmId!]) {
+          setRatingInfo(ratings[farmId!]);
+        }
+        setProducts(farmProducts);
       } catch (err) {
         console.error('Error fetching farm details:', err);
         setError('Failed to fetch farm details.');
@@ -72,9 +76,8 @@ const FarmDetailPage: React.FC = () => {
     }
   }, [farmId]); 
 
-  const handleRatingSubmit = (newRating: number, newTotalRatings: number) => {
-    setRating(newRating);
-    setTotalRatings(newTotalRatings);
+  const handleRatingSubmit = (newRatingInfo: RatingInfo) => {
+    setRatingInfo(newRatingInfo);
   };
 
   const handleShopFromFarm = () => {
@@ -126,8 +129,7 @@ const FarmDetailPage: React.FC = () => {
             </div>
             <StarRating
               farmId={farmId!}
-              initialRating={rating}
-              initialTotalRatings={totalRatings}
+              ratingInfo={ratingInfo}
               onRatingSubmit={handleRatingSubmit}
             />
           </div>
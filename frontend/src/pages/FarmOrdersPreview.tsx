@@ -40,14 +40,16 @@ const FarmOrdersPreview: React.FC = () => {
     const fetchOrders = async () => {
       try {
         setLoading(true);
+        // Newest first, so the first page of five is the whole preview
         const response = await axios.get('/api/orders/farm/', {
           headers: { 
             Authorization: `Bearer ${localStorage.getItem('token')}` 
-          }
+          },
+          params: { page_size: 5 }
         });
 
         // Process orders to ensure image URLs are complete
-        const processedOrders = response.data.map((order: any) => ({
+        const processedOrders = response.data.results.map((order: any) => ({
           ...order,
           items: order.items.map((item: any) => ({
             ...item,
@@ -62,7 +64,7 @@ const FarmOrdersPreview: React.FC = () => {
           }))
         }));
 
-        setOrders(processedOrders.slice(0, 5)); // Get first 5 orders
+        setOrders(processedOrders);
       } catch (err) {
         console.error('Error fetching orders:', err);
         setError('Failed to load orders. Please try again.');
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { fetchAllPages } from '../utils/pagination';
 import {
   ShoppingBag, PlusCircle, Filter, Edit, Trash2, 
   X, ArrowLeft, Search, Image as ImageIcon
@@ -60,10 +61,10 @@ const FarmProducts: React.FC = () => {
         setFarmId(farmResponse.data.id);
 
         // Fetch products for the farm
-        const productsResponse = await axios.get(`/api/farms/${farmResponse.data.id}/products/`);
+        const results = await fetchAllPages<Product>(`/api/farms/${farmResponse.data.id}/products/`);
 
         // Ensure price is a number
-        const products = productsResponse.data.map((product: Product) => ({
+        const products = results.map((product: Product) => ({
           ...product,
           price: typeof product.price === 'string' ? parseFloat(product.price) : product.price, // Convert string to number
         }));
@@ -1,11 +1,14 @@
 import React, { useEffect, useState } from 'react';
-import { Star, MapPin, ArrowRight } from 'lucide-react';
+import { MapPin, ArrowRight } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
 import { Farm } from '../contexts/AuthContext';
+import StarRating from '../components/StarRating';
+import { fetchRatingInfo, RatingInfo } from '../utils/ratings';
 
 const FarmsPage: React.FC = () => {
   const [farms, setFarms] = useState<Farm[]>([]);
+  const [ratings, setRatings] = useState<Record<string, RatingInfo>>({});
   const [loading, setLoading] = useState<boolean>(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -25,6 +28,10 @@ const FarmsPage: React.FC = () => {
         }));
 
         setFarms(transformedFarms);
+        // One request for every card's rating rather than one per card
+        fetchRatingInfo(transformedFarms.map((farm: Farm) => farm.id))
+          .then(setRatings)
+          .catch((err) => console.error('Error fetching farm ratings:', err));
       } catch (err) {
         console.error('Error fetching farms:', err);
         setError('Failed to fetch farms. Please try again later.');
@@ -36,8 +43,8 @@ const FarmsPage: React.FC = () => {
     fetchFarms();
   }, []);
 
-  const formatRating = (rating: number): string => {
-    return rating > 0 ? rating.toFixed(1) : 'Not rated';
+  const handleRatingSubmit = (farmId: string, ratingInfo: RatingInfo) => {
+    setRatings((current) => ({ ...current, [farmId]: ratingInfo }));
   };
 
   if (loading) {
@@ -76,14 +83,13 @@ const FarmsPage: React.FC = () => {
                   />
                 </div>
                 <div className="p-6">
-                  <div className="flex items-center justify-between mb-2">
+                  <div className="mb-2">
                     <h2 className="text-xl font-semibold text-gray-900">{farm.name}</h2>
-                    <div className="flex items-center">
-                      <Star className="w-4 h-4 text-yellow-400 fill-yellow-400 mr-1" />
-                      <span className="text-sm text-gray-600">
-                        {formatRating(farm.rating || 0)}
-                      </span>
-                    </div>
+                    <StarRating
+                      farmId={farm.id}
+                      ratingInfo={ratings[farm.id] || { averageRating: farm.rating || 0, totalRatings: 0, userRating: null }}
+                      onRatingSubmit={(ratingInfo) => handleRatingSubmit(farm.id, ratingInfo)}
+                    />
                   </div>
                   <div className="flex items-center text-gray-600 mb-3">
                     <MapPin className="w-4 h-4 mr-1" />
@@ -1,7 +1,7 @@
 // pages/Inventory.tsx
 import React, { useState, useEffect } from "react";
 import { useAuth } from "../contexts/AuthContext";
-import axios from "axios";
+import { fetchAllPages } from "../utils/pagination";
 import { Package } from "lucide-react";
 
 interface Product {
@@ -24,19 +24,19 @@ const Inventory: React.FC = () => {
     const fetchProducts = async () => {
       try {
         setLoading(true);
-        const response = await axios.get("/api/products/inventory/", {
+        const results = await fetchAllPages<any>("/api/products/inventory/", {
           headers: {
             Authorization: `Bearer ${localStorage.getItem("token")}`,
           },
         });
 
-        if (response.data.length === 0) {
+        if (results.length === 0) {
           setProducts([]);
           return;
         }
 
         // Process products to ensure image URLs are complete
-        const processedProducts = response.data.map((product: any) => ({
+        const processedProducts = results.map((product: any) => ({
           ...product,
           image: product.image
             ? product.image.startsWith("http")
@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Check, ChevronRight, Truck, CreditCard, Calendar, Hash } from 'lucide-react';
 import { useAuth } from '../contexts/AuthContext';
 import axios from '../contexts/axioConfig';
+import { Page, nextCursor } from '../utils/pagination';
 
 interface Product {
   id: string;
@@ -48,45 +49,55 @@ const OrderHistory = () => {
   const [orders, setOrders] = useState<TransformedOrder[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
   const { user } = useAuth();
 
+  const transformOrder = (order: Order): TransformedOrder => {
+    // Convert all numeric fields to numbers
+    const subtotal = typeof order.subtotal === 'string' ? parseFloat(order.subtotal) : order.subtotal;
+    const shippingCost = typeof order.shipping_cost === 'string' ? parseFloat(order.shipping_cost) : order.shipping_cost;
+    const tax = typeof order.tax === 'string' ? parseFloat(order.tax) : order.tax;
+    const total = typeof order.total === 'string' ? parseFloat(order.total) : order.total;
+
+    return {
+      ...order,
+      orderNumber: order.order_number,
+      date: order.created_at,
+      shipping: shippingCost,
+      shippingAddress: order.shipping_address,
+      paymentMethod: order.payment_method,
+      subtotal,
+      tax,
+      total,
+      status: order.status.charAt(0).toUpperCase() + order.status.slice(1),
+      items: order.items.map(item => ({
+        ...item,
+        product: {
+          ...item.product,
+          price: typeof item.product.price === 'string' ? parseFloat(item.product.price) : item.product.price
+        },
+        price: typeof item.price === 'string' ? parseFloat(item.price) : item.price
+      }))
+    };
+  };
+
+  // A page of orders; without a cursor it replaces the list, with one it is added to the end
+  const fetchOrders = async (after: string | null = null) => {
+    const response = await axios.get<Page<Order>>('/api/orders/', {
+      params: { cursor: after ?? undefined }
+    });
+    const transformedOrders = response.data.results.map(transformOrder);
+    setOrders(current => after ? [...current, ...transformedOrders] : transformedOrders);
+    setCursor(nextCursor(response.data));
+  };
+
   useEffect(() => {
-    const fetchOrders = async () => {
+    const loadOrders = async () => {
       try {
         setLoading(true);
-        const response = await axios.get<Order[]>('/api/orders/');
-        
-        const transformedOrders = response.data.map((order): TransformedOrder => {
-          // Convert all numeric fields to numbers
-          const subtotal = typeof order.subtotal === 'string' ? parseFloat(order.subtotal) : order.subtotal;
-          const shippingCost = typeof order.shipping_cost === 'string' ? parseFloat(order.shipping_cost) : order.shipping_cost;
-          const tax = typeof order.tax === 'string' ? parseFloat(order.tax) : order.tax;
-          const total = typeof order.total === 'string' ? parseFloat(order.total) : order.total;
-
-          return {
-            ...order,
-            orderNumber: order.order_number,
-            date: order.created_at,
-            shipping: shippingCost,
-            shippingAddress: order.shipping_address,
-            paymentMethod: order.payment_method,
-            subtotal,
-            tax,
-            total,
-            status: order.status.charAt(0).toUpperCase() + order.status.slice(1),
-            items: order.items.map(item => ({
-              ...item,
-              product: {
-                ...item.product,
-                price: typeof item.product.price === 'string' ? parseFloat(item.product.price) : item.product.price
-              },
-              price: typeof item.price === 'string' ? parseFloat(item.price) : item.price
-            }))
-          };
-        });
-        
-        setOrders(transformedOrders);
+        await fetchOrders();
       } catch (err) {
         console.error('Error fetching orders:', err);
         setError('Failed to load order history. Please try again later.');
@@ -96,12 +107,24 @@ const OrderHistory = () => {
     };
 
     if (user) {
-      fetchOrders();
+      loadOrders();
     } else {
       navigate('/login');
     }
   }, [user, navigate]);
 
+  const loadMoreOrders = async () => {
+    try {
+      setLoadingMore(true);
+      await fetchOrders(cursor);
+    } catch (err) {
+      console.error('Error fetching orders:', err);
+      setError('Failed to load order history. Please try again later.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateString: string) => {
     const options: Intl.DateTimeFormatOptions = { 
       year: 'numeric', 
@@ -271,6 +294,18 @@ const OrderHistory = () => {
             </div>
           ))}
         </div>
+
+        {cursor && (
+          <div className="mt-8 text-center">
+            <button
+              onClick={loadMoreOrders}
+              disabled={loadingMore}
+              className="inline-flex items-center px-6 py-3 border border-gray-300 shadow-sm text-base font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load more orders'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
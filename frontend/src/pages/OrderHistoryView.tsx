@@ -41,7 +41,7 @@ const OrderHistoryView: React.FC = () => {
         setLoading(true);
         const response = await axios.get('/api/orders/');
         // Get the first 5 most recent orders
-        const recentOrders = response.data.slice(0, 5);
+        const recentOrders = response.data.results.slice(0, 5);
         setOrders(recentOrders);
       } catch (err) {
         console.error('Error fetching recent orders:', err);
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useMemo } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import { MapPin, Truck, Check, Clock, ArrowLeft, Loader2 } from "lucide-react";
 import axios from "../contexts/axioConfig";
@@ -15,10 +15,15 @@ interface TrackingUpdate {
   updated_by: string;
 }
 
+// Most points of the route to draw, however long the trip
+const ROUTE_RESOLUTION = 500;
+
 const OrderTracking = () => {
   const { id } = useParams<{ id: string }>();
   const navigate = useNavigate();
   const [trackingUpdates, setTrackingUpdates] = useState<TrackingUpdate[]>([]);
+  // [latitude, longitude] points
+  const [route, setRoute] = useState<[number, number][]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -26,15 +31,13 @@ const OrderTracking = () => {
     const fetchTrackingUpdates = async () => {
       try {
         setLoading(true);
-        const response = await axios.get(`/api/orders/${id}/tracking/`);
-
-        // Sort tracking updates by timestamp
-        const sortedUpdates = response.data.sort(
-          (a: TrackingUpdate, b: TrackingUpdate) =>
-            new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime()
-        );
+        // The timeline, oldest first, and the route simplified to a bounded number of points
+        const response = await axios.get(`/api/orders/${id}/tracking/`, {
+          params: { resolution: ROUTE_RESOLUTION },
+        });
 
-        setTrackingUpdates(sortedUpdates);
+        setTrackingUpdates(response.data.updates);
+        setRoute(response.data.route);
       } catch (err) {
         console.error("Error fetching tracking updates:", err);
         setError(
@@ -48,6 +51,50 @@ const OrderTracking = () => {
     fetchTrackingUpdates();
   }, [id]);
 
+  // New updates are pushed over a socket while the page is open
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!id || !token) return;
+
+    // Sockets are served apart from the API in production, see render.yaml
+    const socketBase =
+      import.meta.env.VITE_SOCKETS_URL || import.meta.env.VITE_API_URL;
+    const socketUrl = `${socketBase.replace(
+      /^http/,
+      "ws"
+    )}/ws/orders/${id}/tracking/?token=${encodeURIComponent(token)}`;
+    const socket = new WebSocket(socketUrl);
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === "snapshot") {
+        setTrackingUpdates(message.updates);
+        setRoute(message.route);
+      } else if (message.type === "tracking") {
+        const update: TrackingUpdate = message.update;
+        if (update.latitude && update.longitude) {
+          setRoute((points) => [
+            ...points,
+            [Number(update.latitude), Number(update.longitude)],
+          ]);
+        }
+        // GPS pings only move the route; updates that say something join the timeline.
+        // An update can arrive twice around connecting
+        setTrackingUpdates((updates) => {
+          const last = updates[updates.length - 1];
+          const isPing =
+            update.latitude && !update.notes && last?.status === update.status;
+          return isPing ||
+            updates.some((existing) => String(existing.id) === String(update.id))
+            ? updates
+            : [...updates, update];
+        });
+      }
+    };
+
+    return () => socket.close();
+  }, [id]);
+
   const formatDate = (dateString: string) => {
     const options: Intl.DateTimeFormatOptions = {
       month: "short",
@@ -58,10 +105,21 @@ const OrderTracking = () => {
     return new Date(dateString).toLocaleDateString(undefined, options);
   };
 
-  // Extract coordinates for mapping
-  const trackingCoordinates = trackingUpdates
-    .filter((update) => update.latitude && update.longitude)
-    .map((update) => [update.longitude, update.latitude] as [number, number]);
+  // Mapbox takes [longitude, latitude]: the route as the line, the timeline as markers
+  const trackingCoordinates = useMemo(
+    () => route.map(([lat, lng]) => [lng, lat] as [number, number]),
+    [route]
+  );
+  const timelineMarkers = useMemo(
+    () =>
+      trackingUpdates
+        .filter((update) => update.latitude && update.longitude)
+        .map(
+          (update) =>
+            [Number(update.longitude), Number(update.latitude)] as [number, number]
+        ),
+    [trackingUpdates]
+  );
 
   if (loading) {
     return (
@@ -182,7 +240,10 @@ const OrderTracking = () => {
               </h2>
 
               {trackingCoordinates.length > 0 ? (
-                <MapboxView coordinates={trackingCoordinates} />
+                <MapboxView
+                  coordinates={trackingCoordinates}
+                  markers={timelineMarkers}
+                />
               ) : (
                 <div className="text-center text-gray-500 py-8">
                   No route information available
@@ -18,6 +18,7 @@ import {
 } from "lucide-react";
 import { useAuth } from "../contexts/AuthContext";
 import NotificationButton from "../components/NotificationButton";
+import { Page, nextCursor } from "../utils/pagination";
 
 interface Order {
   id: string;
@@ -69,25 +70,36 @@ const OrdersPage: React.FC = () => {
   const [searchTerm, setSearchTerm] = useState("");
   const [statusFilter, setStatusFilter] = useState<string | null>(null);
   const [showFilters, setShowFilters] = useState(false);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
-  useEffect(() => {
-    const fetchOrders = async () => {
-      try {
-        setLoading(true);
-        const response = await axios.get("/api/orders/farm/", {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem("token")}`,
-          },
-        });
+  // One page of orders, filtered by status on the server; without a cursor it
+  // replaces the list, with one it is added to the end
+  const fetchOrders = async (after: string | null = null) => {
+    const response = await axios.get<Page<any>>("/api/orders/farm/", {
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem("token")}`,
+      },
+      params: { status: statusFilter ?? undefined, cursor: after ?? undefined },
+    });
+
+    // Validate the status of each order
+    const validatedOrders = response.data.results.map((order: any) => ({
+      ...order,
+      status: isOrderStatus(order.status) ? order.status : "pending", // default to pending if invalid
+    }));
 
-        // Validate the status of each order
-        const validatedOrders = response.data.map((order: any) => ({
-          ...order,
-          status: isOrderStatus(order.status) ? order.status : "pending", // default to pending if invalid
-        }));
+    setOrders((current) =>
+      after ? [...current, ...validatedOrders] : validatedOrders
+    );
+    setCursor(nextCursor(response.data));
+  };
 
-        setOrders(validatedOrders);
+  useEffect(() => {
+    const loadOrders = async () => {
+      try {
+        await fetchOrders();
       } catch (err) {
         console.error("Error fetching orders:", err);
         setError("Failed to load orders. Please try again.");
@@ -97,9 +109,21 @@ const OrdersPage: React.FC = () => {
     };
 
     if (user?.farmer_profile) {
-      fetchOrders();
+      loadOrders();
     }
-  }, [user]);
+  }, [user, statusFilter]);
+
+  const loadMoreOrders = async () => {
+    try {
+      setLoadingMore(true);
+      await fetchOrders(cursor);
+    } catch (err) {
+      console.error("Error fetching orders:", err);
+      setError("Failed to load orders. Please try again.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const filteredOrders = orders.filter((order) => {
     // Search filter
@@ -441,11 +465,22 @@ const OrdersPage: React.FC = () => {
             </div>
           ) : (
             <div className="p-6 text-center text-gray-500">
-              {orders.length === 0
+              {orders.length === 0 && !statusFilter
                 ? "You have no orders yet"
                 : "No orders match your filters"}
             </div>
           )}
+          {cursor && (
+            <div className="p-4 text-center border-t border-gray-200">
+              <button
+                onClick={loadMoreOrders}
+                disabled={loadingMore}
+                className="px-4 py-2 border border-green-300 rounded-lg hover:bg-gray-50 disabled:opacity-50"
+              >
+                {loadingMore ? "Loading..." : "Load more orders"}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
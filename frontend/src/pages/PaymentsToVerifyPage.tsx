@@ -3,6 +3,7 @@ import React, { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 import axios from "../contexts/axioConfig";
 import { DollarSign, CreditCard, Check, Clock, List } from "lucide-react";
+import { Page, nextCursor } from "../utils/pagination";
 
 interface Order {
   id: string;
@@ -31,20 +32,30 @@ const PaymentsToVerifyPage = () => {
   }>({ pending: [], verified: [] });
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState<"pending" | "verified">("pending");
+  // Where each tab's next page starts, or null once it is all loaded
+  const [cursors, setCursors] = useState<{
+    pending: string | null;
+    verified: string | null;
+  }>({ pending: null, verified: null });
+  const [loadingMore, setLoadingMore] = useState(false);
   const navigate = useNavigate();
 
-  const fetchPayments = async (status: "pending" | "verified") => {
+  const fetchPayments = async (
+    status: "pending" | "verified",
+    after: string | null = null
+  ): Promise<Page<Order>> => {
     try {
-      const response = await axios.get(
-        `/api/orders/payments-to-verify/?status=${status}`,
+      const response = await axios.get<Page<Order>>(
+        "/api/orders/payments-to-verify/",
         {
           headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+          params: { status, cursor: after ?? undefined },
         }
       );
       return response.data;
     } catch (error) {
       console.error("Error fetching payments:", error);
-      return [];
+      return { next: null, results: [] };
     }
   };
 
@@ -56,7 +67,11 @@ const PaymentsToVerifyPage = () => {
           fetchPayments("pending"),
           fetchPayments("verified"),
         ]);
-        setOrders({ pending, verified });
+        setOrders({ pending: pending.results, verified: verified.results });
+        setCursors({
+          pending: nextCursor(pending),
+          verified: nextCursor(verified),
+        });
       } catch (error) {
         console.error("Error loading payments:", error);
       } finally {
@@ -67,6 +82,18 @@ const PaymentsToVerifyPage = () => {
     loadPayments();
   }, []);
 
+  const loadMorePayments = async () => {
+    const tab = activeTab;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPayments(tab, cursors[tab]);
+      setOrders((prev) => ({ ...prev, [tab]: [...prev[tab], ...page.results] }));
+      setCursors((prev) => ({ ...prev, [tab]: nextCursor(page) }));
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handlePaymentVerified = (result: VerificationResult) => {
     setOrders((prev) => {
       // Find and remove the verified order from pending
@@ -133,6 +160,7 @@ const PaymentsToVerifyPage = () => {
             {orders.pending.length > 0 && (
               <span className="ml-2 bg-yellow-100 text-yellow-800 text-xs font-medium px-2 py-0.5 rounded-full">
                 {orders.pending.length}
+                {cursors.pending && "+"}
               </span>
             )}
           </div>
@@ -151,6 +179,7 @@ const PaymentsToVerifyPage = () => {
             {orders.verified.length > 0 && (
               <span className="ml-2 bg-green-100 text-green-800 text-xs font-medium px-2 py-0.5 rounded-full">
                 {orders.verified.length}
+                {cursors.verified && "+"}
               </span>
             )}
           </div>
@@ -235,6 +264,18 @@ const PaymentsToVerifyPage = () => {
           ))}
         </div>
       )}
+
+      {cursors[activeTab] && (
+        <div className="mt-6 text-center">
+          <button
+            onClick={loadMorePayments}
+            disabled={loadingMore}
+            className="px-4 py-2 border border-gray-300 rounded-md hover:bg-gray-50 disabled:opacity-50"
+          >
+            {loadingMore ? "Loading..." : "Load more payments"}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
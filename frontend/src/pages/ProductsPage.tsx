@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import axios from 'axios';
+import { fetchAllPages } from '../utils/pagination';
 import { Product } from '../contexts/AuthContext';
 import ProductCard from '../pages/ProductCard';
 import { useCart } from '../contexts/CartContext';
@@ -30,8 +30,9 @@ const ProductsPage: React.FC = () => {
   useEffect(() => {
     const fetchProducts = async () => {
       try {
-        const response = await axios.get('/api/products/');
-        const formattedProducts = response.data.map((product: any) => ({
+        // Sections are picked from the whole catalog, so every page is read
+        const results = await fetchAllPages<any>('/api/products/');
+        const formattedProducts = results.map((product: any) => ({
           ...product,
           price: typeof product.price === 'string' ? parseFloat(product.price) : product.price,
           farm: {
@@ -0,0 +1,40 @@
+// pagination.ts
+import { AxiosRequestConfig } from "axios";
+import axios from "../contexts/axioConfig";
+
+// Order and product lists come a page at a time, with a link to the next page
+// (null on the last one)
+export interface Page<T> {
+  next: string | null;
+  results: T[];
+}
+
+// Largest page the product and order lists serve
+const MAX_PAGE_SIZE = 200;
+
+// The ?cursor= for the page after this one. Only the cursor is taken from `next`,
+// since its host is how the API sees itself, which can differ behind a proxy
+export const nextCursor = (page: Page<unknown>): string | null =>
+  page.next ? new URL(page.next).searchParams.get("cursor") : null;
+
+// Every page of a list, for screens that group or filter the whole of it
+export const fetchAllPages = async <T>(
+  url: string,
+  config: AxiosRequestConfig = {}
+): Promise<T[]> => {
+  const results: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const response: { data: Page<T> } = await axios.get<Page<T>>(url, {
+      ...config,
+      params: {
+        page_size: MAX_PAGE_SIZE,
+        ...config.params,
+        cursor: cursor ?? undefined,
+      },
+    });
+    results.push(...response.data.results);
+    cursor = nextCursor(response.data);
+  } while (cursor);
+  return results;
+};
@@ -0,0 +1,26 @@
+// ratings.ts
+import axios from "../contexts/axioConfig";
+
+export interface RatingInfo {
+  averageRating: number;
+  totalRatings: number;
+  userRating: number | null;
+}
+
+// Most farms the batch rating-info endpoint answers for in one request
+const MAX_FARMS = 100;
+
+// Rating info for every farm on a page, keyed by farm id, so each card doesn't
+// ask for its own
+export const fetchRatingInfo = async (
+  farmIds: (string | number)[]
+): Promise<Record<string, RatingInfo>> => {
+  const ratings: Record<string, RatingInfo> = {};
+  for (let start = 0; start < farmIds.length; start += MAX_FARMS) {
+    const response = await axios.get<Record<string, RatingInfo>>("/api/farms/rating-info/", {
+      params: { ids: farmIds.slice(start, start + MAX_FARMS).join(",") },
+    });
+    Object.assign(ratings, response.data);
+  }
+  return ratings;
+};
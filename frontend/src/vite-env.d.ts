@@ -10,6 +10,7 @@ interface ImportMeta {
 // src/env.d.ts
 interface ImportMetaEnv {
   VITE_API_URL: string;
+  VITE_SOCKETS_URL?: string;
 }
 
 interface ImportMetaEnv {